@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def query_key(query):
+    """Queries that differ only in case and spacing are asked once."""
+    return " ".join(query.lower().split())
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel: same generate_content() call, canned text after `delay` seconds.
+
+    Queries containing `fail_on` raise, to exercise per-item errors.
+    """
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, delay=0.2, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        question = prompt.strip().splitlines()[-1]
+        if self.fail_on and self.fail_on in question:
+            raise RuntimeError(f"Fake model failure for: {question}")
+        return self.Response(f"[fake answer] {question}")
+
+
+class BatchAsker:
+    """Answers a list of questions concurrently on a shared, bounded thread pool.
+
+    Duplicates are asked once. Every item gets its own result or error,
+    so one failure doesn't fail the batch, and anything not finished
+    `timeout` seconds after the batch started comes back as a timeout.
+    The pool is shared by all batches, so `max_workers` also caps the
+    total number of model calls in flight.
+    """
+
+    def __init__(self, answer, max_workers=8):
+        self.answer = answer   # query -> dict (e.g. {'response', 'answered_by'}); raises on failure
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ask-batch")
+
+    def timed_answer(self, query):
+        started = time.perf_counter()
+        result = self.answer(query)
+        return dict(result, ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def stream(self, queries, timeout=60.0):
+        """Yield {index, query, ...result or error} for every query, in completion order."""
+        indices = {}
+        for i, query in enumerate(queries):
+            indices.setdefault(query_key(query), []).append(i)
+        futures = {self.pool.submit(self.timed_answer, queries[positions[0]]): positions
+                   for positions in indices.values()}
+        deadline = time.monotonic() + timeout
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        outcome = {'error': str(e)}
+                    for i in futures[future]:
+                        yield dict(outcome, index=i, query=queries[i])
+            for future in pending:
+                future.cancel()
+                for i in futures[future]:
+                    yield {'index': i, 'query': queries[i], 'error': f"Timed out after {timeout:g}s"}
+        finally:
+            # Also reached when a streaming client goes away: drop what hasn't started
+            for future in pending:
+                future.cancel()
+
+    def run(self, queries, timeout=60.0):
+        """All results, in the order the queries were given."""
+        results = [None] * len(queries)
+        for item in self.stream(queries, timeout):
+            results[item['index']] = item
+        return results
@@ -0,0 +1,141 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+CHARS_PER_TOKEN = 4   # Rough average for English; good enough for budgeting, no tokenizer needed
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def clip(text, tokens):
+    """`text` cut to about `tokens` tokens."""
+    limit = tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+def gist(text, chars=80):
+    """First sentence of a turn, shortened: what it was about, for the summary line."""
+    sentence = re.split(r"(?<=[.?!])\s", text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= chars else sentence[:chars - 3].rstrip() + "..."
+
+
+class ChatSession:
+    """One conversation: recent turns verbatim, older ones folded into a short summary."""
+
+    def __init__(self, session_id, now):
+        self.id = session_id
+        self.turns = deque()     # (role, text, tokens)
+        self.tokens = 0
+        self.summary = []        # Gists of trimmed user turns, oldest first
+        self.summary_tokens = 0
+        self.last_used = now
+
+    @property
+    def size(self):
+        """Characters held, for the store's memory cap."""
+        return sum(len(text) for _, text, _ in self.turns) + sum(len(line) for line in self.summary)
+
+    def context(self):
+        """The conversation so far as prompt text ("" for a new session)."""
+        lines = []
+        if self.summary:
+            lines.append("Earlier the patient asked about: " + "; ".join(self.summary))
+        for role, text, _ in self.turns:
+            lines.append(f"{'Patient' if role == 'user' else 'Assistant'}: {text}")
+        return "\n".join(lines)
+
+
+class ChatSessions:
+    """Server-side /ask conversations with a bounded prompt and bounded memory.
+
+    Each turn is clipped to `turn_tokens`. A session keeps its latest turns
+    verbatim while they fit in `history_tokens`. Older turns are trimmed
+    into one summary line made of the gist of each question the patient
+    asked; the line is capped at `summary_tokens` and keeps the newest
+    gists. The prompt a session adds is therefore never more than
+    history_tokens + summary_tokens.
+
+    Sessions live in LRU order. Sessions idle for longer than `ttl` seconds
+    expire. The least recently used sessions are evicted whenever there
+    are more than `max_sessions` or all of them together hold more than
+    `max_chars`.
+    """
+
+    def __init__(self, history_tokens=1200, summary_tokens=150, turn_tokens=400, ttl=1800,
+                 max_sessions=1000, max_chars=4_000_000):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.turn_tokens = turn_tokens
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self.sessions = OrderedDict()   # id -> ChatSession, least recently used first
+        self.chars = 0
+        self.evicted = {'expired': 0, 'capacity': 0}
+        self.lock = threading.Lock()
+
+    def get(self, session_id=None, now=None):
+        """The session for `session_id`, or a new one if it's missing, unknown or expired."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.expire(now)
+            session = self.sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(uuid.uuid4().hex, now)
+                self.sessions[session.id] = session
+            else:
+                self.sessions.move_to_end(session.id)
+            session.last_used = now
+            self.evict()
+            return session
+
+    def add(self, session, role, text):
+        """Append a turn ("user" or "assistant") and trim the session back under its budgets."""
+        text = clip(text.strip(), self.turn_tokens)
+        with self.lock:
+            before = session.size
+            tokens = estimate_tokens(text)
+            session.turns.append((role, text, tokens))
+            session.tokens += tokens
+            while session.tokens > self.history_tokens and len(session.turns) > 1:
+                old_role, old_text, old_tokens = session.turns.popleft()
+                session.tokens -= old_tokens
+                if old_role == 'user':
+                    line = gist(old_text)
+                    session.summary.append(line)
+                    session.summary_tokens += estimate_tokens(line) + 1
+            while session.summary_tokens > self.summary_tokens and session.summary:
+                session.summary_tokens -= estimate_tokens(session.summary.pop(0)) + 1
+            if session.id in self.sessions:
+                self.chars += session.size - before
+                self.evict()
+
+    def end(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self.chars -= session.size
+            return session is not None
+
+    def expire(self, now):
+        # Oldest first, so stop at the first session that is still fresh
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if now - session.last_used <= self.ttl:
+                break
+            self.remove(session, 'expired')
+
+    def evict(self):
+        # Never evict the session just used (the last one)
+        while len(self.sessions) > 1 and (len(self.sessions) > self.max_sessions or self.chars > self.max_chars):
+            self.remove(next(iter(self.sessions.values())), 'capacity')
+
+    def remove(self, session, reason):
+        del self.sessions[session.id]
+        self.chars -= session.size
+        self.evicted[reason] += 1
+
+    def stats(self):
+        with self.lock:
+            return {'sessions': len(self.sessions), 'chars': self.chars, 'evicted': dict(self.evicted)}
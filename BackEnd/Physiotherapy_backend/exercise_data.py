@@ -39,6 +39,7 @@ EXERCISE_LIBRARY = {
         "target_joints": [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28],
         "variations": ["left_leg_raised", "right_leg_raised"],
         "key_alignment_points": [23, 24, 25, 26, 27, 28],  # Focus primarily on leg positioning
+        "required_landmarks": ["pose"],  # Landmark sets scored: "pose", "hands", "face" (missing = full Holistic)
         "steps": [
             "Stand sideways to the camera with a comfortable posture",
             "Keep your arms relaxed for balance and support",
@@ -56,6 +57,42 @@ EXERCISE_LIBRARY = {
         ],
         "difficulty": "Beginner/Rehabilitation",
         "muscle_groups": ["Hip flexors", "Quadriceps", "Core stabilizers"],
+        # Ordered positions, one per step image; joints not listed come from reference_pose.
+        # The app tracks which of these the patient is in and scores against it.
+        "keyframes": [
+            {"name": "Stand with both legs down", "image": "straight_leg_raises_step1.png",
+             "pose": {25: [0.70, 0.75, 0], 27: [0.70, 0.90, 0]}},
+            {"name": "Raise the leg halfway", "image": "straight_leg_raises_step2.png",
+             "pose": {25: [0.70, 0.60, 0], 27: [0.70, 0.62, 0]}},
+            {"name": "Leg raised - hold", "image": "straight_leg_raises_step3.png",
+             "pose": {}}
+        ],
+        # One repetition as keyframes ({time in seconds, pose}); joints not listed come from
+        # reference_pose. Scored as a whole movement with streaming DTW (TrajectoryScorer).
+        "reference_trajectory": [
+            {"time": 0.0, "pose": {25: [0.70, 0.75, 0], 27: [0.70, 0.90, 0]}},  # Both legs down
+            {"time": 1.5, "pose": {}},                                          # Leg raised (reference_pose)
+            {"time": 3.5, "pose": {}},                                          # Hold for min_hold_time
+            {"time": 5.0, "pose": {25: [0.70, 0.75, 0], 27: [0.70, 0.90, 0]}}   # Lowered under control
+        ],
+        # Measured once per frame as features: angle at the middle landmark (180 = straight)
+        # and segment inclination from vertical
+        "angles": {"left_knee": [23, 25, 27], "right_knee": [24, 26, 28],
+                   "left_hip": [11, 23, 25], "right_hip": [12, 24, 26]},
+        "segments": {"trunk": [23, 11]},
+        # Spoken corrections: landmarks in priority order (the first misaligned one is said),
+        # their spoken names and the wording. Compiled into lookup tables when the library loads.
+        "feedback": {
+            "priority": [25, 27, 23, 26, 28, 24, 11, 12],
+            "names": {23: "hip", 24: "hip", 25: "knee", 26: "knee", 27: "ankle", 28: "ankle",
+                      11: "shoulder", 12: "shoulder"},
+            "phrase": "Move your {joint} {direction}",
+            # Angle-based checks on those features, spoken even while the position matches
+            "angle_limits": {"left_knee": {"min": 150, "phrase": "Try to keep your leg straight"},
+                             "right_knee": {"min": 150, "phrase": "Try to keep your leg straight"}},
+            "segment_limits": {"trunk": {"max": 25, "phrase": "Don't lean back, stay upright"}}
+        },
+        "alignment_threshold": 70.0,  # Score that counts as holding the position
         "min_hold_time": 2.0,  # Seconds to hold the correct pose (reduced from 3.0)
         "reps_required": 3     # Number of successful holds required
     }
@@ -0,0 +1,166 @@
+import math
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from phase_tracker import exercise_keyframes
+from pose_engine import landmarks_to_dict
+from trajectory_dtw import normalize_poses
+from variations import flip_facing, swap_sides
+
+try:
+    from scipy.spatial import cKDTree  # Optional: sublinear lookups for large libraries
+except ImportError:
+    cKDTree = None
+
+# Joints every reference pose in the library is expected to define
+EMBEDDING_JOINTS = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+AXIS_SCALE = np.array([1.0, 1.0, 0.5])  # Depth counts half, as in the scorers
+# Neutral standing, the pose people are in between exercises. It never votes for an exercise,
+# and neither do keyframes close to it (e.g. "Stand with both legs down")
+REST_POSES = {
+    "standing, facing the camera": {
+        11: [0.55, 0.30, 0], 12: [0.45, 0.30, 0], 13: [0.57, 0.42, 0], 14: [0.43, 0.42, 0],
+        15: [0.58, 0.54, 0], 16: [0.42, 0.54, 0], 23: [0.53, 0.55, 0], 24: [0.47, 0.55, 0],
+        25: [0.53, 0.72, 0], 26: [0.47, 0.72, 0], 27: [0.53, 0.88, 0], 28: [0.47, 0.88, 0]},
+    "standing side-on": {
+        11: [0.50, 0.30, 0], 12: [0.50, 0.30, 0.05], 13: [0.50, 0.42, 0], 14: [0.50, 0.42, 0.05],
+        15: [0.50, 0.54, 0], 16: [0.50, 0.54, 0.05], 23: [0.50, 0.55, 0], 24: [0.50, 0.55, 0.05],
+        25: [0.50, 0.72, 0], 26: [0.50, 0.72, 0.05], 27: [0.50, 0.88, 0], 28: [0.50, 0.88, 0.05]},
+}
+
+def pose_embedding(pose, joints=EMBEDDING_JOINTS):
+    """Flattened, hip-centred, torso-scaled vector for {index: [x, y, z]} (None if a joint is missing)."""
+    if not all(j in pose for j in joints):
+        return None
+    points = np.array([pose[j][:3] for j in joints], dtype=np.float64)
+    return (normalize_poses(points, joints) * AXIS_SCALE).ravel().astype(np.float32)
+
+
+class ExerciseIndex:
+    """Nearest-neighbour index over every keyframe of every exercise.
+
+    Each keyframe is added together with its left/right mirror and its
+    facing-the-other-way copies, so recognition doesn't depend on which
+    side the patient uses. Lookups use a KD-tree when scipy is installed
+    and a batched brute-force search (one matrix product) otherwise.
+
+    `rest_poses` are indexed too, under no exercise. Keyframes within
+    `rest_distance` of one of them are start/rest positions that every
+    exercise shares; they are listed in `rest_keyframes` and shouldn't
+    count as evidence for their exercise.
+    """
+
+    def __init__(self, library, joints=EMBEDDING_JOINTS, mirrored=True, rest_poses=REST_POSES, rest_distance=1.25):
+        self.joints = list(joints)
+        vectors, exercises, keyframes = [], [], []
+        rest = [pose_embedding(variant, self.joints) for pose in (rest_poses or {}).values()
+                for variant in ([pose, flip_facing(pose)] if mirrored else [pose])]
+        rest = [vector for vector in rest if vector is not None]
+        self.rest_keyframes = set()
+        for name, exercise in library.items():
+            for k, keyframe in enumerate(exercise_keyframes(exercise)):
+                pose = keyframe["pose"]
+                variants = [pose, swap_sides(pose)] if mirrored else [pose]
+                if mirrored:
+                    variants += [flip_facing(v) for v in variants]
+                for variant in variants:
+                    vector = pose_embedding(variant, self.joints)
+                    if vector is None:
+                        print(f"Skipping {name} keyframe {k} in the exercise index: missing joints")
+                        break
+                    if any(np.linalg.norm(vector - r) <= rest_distance for r in rest):
+                        self.rest_keyframes.add((name, k))
+                    vectors.append(vector)
+                    exercises.append(name)
+                    keyframes.append(k)
+        self.names = sorted(set(exercises))
+        # Rest poses are entries labelled -1
+        vectors += rest
+        labels = [self.names.index(name) for name in exercises] + [-1] * len(rest)
+        keyframes += [-1] * len(rest)
+        self.vectors = np.array(vectors, dtype=np.float32).reshape(len(vectors), len(self.joints) * 3)
+        self.labels = np.array(labels)
+        self.keyframes = np.array(keyframes)
+        self.squared_norms = (self.vectors ** 2).sum(axis=1)
+        self.tree = cKDTree(self.vectors) if cKDTree is not None and len(self.vectors) else None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def query(self, embeddings):
+        """Nearest entry for each row of a (B, D) array: (distances, entry indices)."""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if self.tree is not None:
+            distances, indices = self.tree.query(embeddings, k=1)
+            return np.asarray(distances), np.asarray(indices)
+        # |a - b|^2 = |a|^2 - 2ab + |b|^2 for all pairs at once
+        squared = (embeddings ** 2).sum(axis=1)[:, None] - 2 * embeddings @ self.vectors.T + self.squared_norms
+        indices = squared.argmin(axis=1)
+        distances = np.sqrt(np.maximum(squared[np.arange(len(indices)), indices], 0))
+        return distances, indices
+
+    def nearest(self, pose):
+        """(exercise name, keyframe index, distance) closest to one {index: [x, y, z]} pose, or None.
+
+        A rest pose comes back as (None, None, distance).
+        """
+        vector = pose_embedding(pose, self.joints)
+        if vector is None or not len(self):
+            return None
+        distances, indices = self.query(vector)
+        entry = int(indices[0])
+        if self.labels[entry] < 0:
+            return None, None, float(distances[0])
+        return self.names[self.labels[entry]], int(self.keyframes[entry]), float(distances[0])
+
+
+class ExerciseRecognizer:
+    """Suggests the exercise the patient is doing from a window of nearest-neighbour votes.
+
+    Lookups are spread out to stay within `time_budget` seconds per frame
+    on average: if one takes longer, the following frames are skipped in
+    proportion. Frames further than `max_distance` from every keyframe,
+    or closest to a rest pose or rest keyframe, vote for nothing.
+    """
+
+    def __init__(self, index, window=20, min_share=0.6, max_distance=1.0, time_budget=0.002):
+        self.index = index
+        self.votes = deque(maxlen=window)
+        self.min_share = min_share
+        self.max_distance = max_distance
+        self.time_budget = time_budget
+        self.skip = 0
+        self.stats = {'frames': 0, 'lookups': 0, 'lookup_seconds': 0.0}
+
+    def reset(self):
+        self.votes.clear()
+        self.skip = 0
+
+    def update(self, landmarks):
+        """Feed one frame's landmarks; returns (suggested exercise or None, confidence 0-1)."""
+        self.stats['frames'] += 1
+        if landmarks is not None:
+            if self.skip > 0:
+                self.skip -= 1
+            else:
+                started = time.perf_counter()
+                match = self.index.nearest(landmarks_to_dict(landmarks))
+                elapsed = time.perf_counter() - started
+                self.stats['lookups'] += 1
+                self.stats['lookup_seconds'] += elapsed
+                self.skip = max(0, math.ceil(elapsed / self.time_budget) - 1)
+                if match is not None:
+                    name, keyframe, distance = match
+                    distinctive = name is not None and (name, keyframe) not in self.index.rest_keyframes
+                    self.votes.append(name if distinctive and distance <= self.max_distance else None)
+        return self.suggestion()
+
+    def suggestion(self):
+        counts = Counter(vote for vote in self.votes if vote is not None)
+        if not counts or len(self.votes) < self.votes.maxlen // 2:
+            return None, 0.0
+        name, count = counts.most_common(1)[0]
+        share = count / len(self.votes)
+        return (name, share) if share >= self.min_share else (None, share)
@@ -0,0 +1,240 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+from exercise_data import EXERCISE_LIBRARY
+from feedback_rules import FeedbackRules
+from joint_features import POSE_ANGLES, POSE_SEGMENTS, FeatureSet
+from phase_tracker import exercise_keyframes
+from pipeline_types import POSE, HANDS, FACE
+
+# Clinicians drop one JSON file per exercise (or several per file) in here
+EXERCISES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exercises")
+NUM_POSE_LANDMARKS = 33
+
+def exercise_slug(name):
+    """"Straight Leg Raises" and "straight_leg_raises" both become "straight_leg_raises"."""
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+def int_keys(pose):
+    return {int(i): list(p) for i, p in pose.items()}
+
+def normalize_exercise(exercise):
+    """Copy of a JSON exercise with landmark indices as ints, as in EXERCISE_LIBRARY."""
+    exercise = dict(exercise)
+    if "reference_pose" in exercise:
+        exercise["reference_pose"] = int_keys(exercise["reference_pose"])
+    for key in ("keyframes", "reference_trajectory"):
+        if key in exercise:
+            exercise[key] = [dict(item, pose=int_keys(item.get("pose", {}))) for item in exercise[key]]
+    if "variation_poses" in exercise:
+        exercise["variation_poses"] = {name: int_keys(pose) for name, pose in exercise["variation_poses"].items()}
+    if "names" in exercise.get("feedback", {}):
+        names = {int(i): name for i, name in exercise["feedback"]["names"].items()}
+        exercise["feedback"] = dict(exercise["feedback"], names=names)
+    return exercise
+
+def validate_pose(pose, where, problems):
+    for index, point in pose.items():
+        if not 0 <= index < NUM_POSE_LANDMARKS:
+            problems.append(f"{where}: landmark {index} out of range")
+        elif len(point) != 3 or not all(isinstance(v, (int, float)) for v in point):
+            problems.append(f"{where}: landmark {index} should be [x, y, z]")
+
+def validate_exercise(exercise):
+    """List of problems with an exercise definition (empty when it can be used)."""
+    problems = []
+    reference = exercise.get("reference_pose")
+    if not isinstance(reference, dict) or not reference:
+        return ["reference_pose is missing or empty"]
+    validate_pose(reference, "reference_pose", problems)
+    missing = [j for j in exercise.get("target_joints", []) if j not in reference]
+    if missing:
+        problems.append(f"target_joints not in reference_pose: {missing}")
+    for n, keyframe in enumerate(exercise.get("keyframes", [])):
+        validate_pose(keyframe.get("pose", {}), f"keyframes[{n}]", problems)
+    times = [item.get("time") for item in exercise.get("reference_trajectory", [])]
+    if times and (None in times or any(b <= a for a, b in zip(times, times[1:]))):
+        problems.append("reference_trajectory times must be present and increasing")
+    for key, size in (("angles", 3), ("segments", 2)):
+        for name, points in exercise.get(key, {}).items():
+            if len(points) != size or not all(isinstance(i, int) and 0 <= i < NUM_POSE_LANDMARKS for i in points):
+                problems.append(f"{key}['{name}'] should list {size} landmark indices")
+    feedback = exercise.get("feedback", {})
+    for key, names in (("angle_limits", exercise.get("angles") or POSE_ANGLES),
+                       ("segment_limits", exercise.get("segments") or POSE_SEGMENTS)):
+        unknown = set(feedback.get(key, {})) - set(names)
+        if unknown:
+            problems.append(f"feedback {key} for undefined features: {sorted(unknown)}")
+    if any(not isinstance(i, int) or not 0 <= i < NUM_POSE_LANDMARKS for i in feedback.get("priority", [])):
+        problems.append("feedback priority must list landmark indices")
+    try:
+        feedback.get("phrase", "").format(joint="knee", direction="higher")
+    except (KeyError, IndexError, ValueError):
+        problems.append("feedback phrase may only use {joint} and {direction}")
+    unknown = set(exercise.get("required_landmarks") or []) - {POSE, HANDS, FACE}
+    if unknown:
+        problems.append(f"unknown required_landmarks: {sorted(unknown)}")
+    hold = exercise.get("min_hold_time", 1)
+    if not isinstance(hold, (int, float)) or hold <= 0:
+        problems.append("min_hold_time must be positive")
+    if not isinstance(exercise.get("reps_required", 1), int) or exercise.get("reps_required", 1) < 1:
+        problems.append("reps_required must be a positive integer")
+    return problems
+
+def frozen(array):
+    array = np.array(array, dtype=np.float64)
+    array.flags.writeable = False
+    return array
+
+
+class CompiledExercise:
+    """Array form of one exercise, built once when the library is loaded.
+
+    `reference` is the (N, K, 3) stack of keyframe poses over `joints`,
+    `weights` the per-joint weights (key alignment points count double),
+    `mask` marks which of the 33 pose landmarks the exercise uses and
+    `thresholds` holds the scoring limits, `features` the angle/segment
+    definitions measured each frame and `feedback` the compiled correction
+    tables. All arrays are read-only.
+    """
+
+    def __init__(self, name, exercise):
+        self.name = name
+        self.exercise = exercise
+        self.joints = tuple(exercise.get("target_joints") or sorted(exercise["reference_pose"]))
+        self.keyframes = exercise_keyframes(exercise)
+        self.reference = frozen([[kf["pose"].get(j, [0, 0, 0]) for j in self.joints] for kf in self.keyframes])
+        key_points = set(exercise.get("key_alignment_points", []))
+        self.weights = frozen([2.0 if j in key_points else 1.0 for j in self.joints])
+        mask = np.zeros(NUM_POSE_LANDMARKS, dtype=bool)
+        mask[list(self.joints)] = True
+        mask.flags.writeable = False
+        self.mask = mask
+        self.thresholds = MappingProxyType({
+            'alignment_threshold': float(exercise.get("alignment_threshold", 70.0)),
+            'min_hold_time': float(exercise.get("min_hold_time", 3.0)),
+            'reps_required': int(exercise.get("reps_required", 3)),
+        })
+        self.features = FeatureSet.from_exercise(exercise)
+        self.feedback = FeedbackRules(exercise.get("feedback"), self.features)
+
+
+class LibrarySnapshot:
+    """One consistent version of the library; replaced as a whole, never modified."""
+
+    def __init__(self, version, exercises, compiled):
+        self.version = version
+        self.exercises = MappingProxyType(exercises)
+        self.compiled = MappingProxyType(compiled)
+
+
+class ExerciseLibrary:
+    """Built-in exercises plus every *.json file in `directory`, compiled and hot-reloaded.
+
+    Each JSON file maps exercise names to definitions in the EXERCISE_LIBRARY
+    format (landmark indices may be strings). An entry whose name matches a
+    built-in exercise (ignoring case and spacing) overrides the fields it
+    lists. `poll()` checks the files' modification times at most every
+    `poll_interval` seconds; when something changed the whole library is
+    reloaded, validated and compiled off to the side, then swapped in with a
+    single assignment. Readers holding the previous snapshot (or scorers
+    built from it) carry on undisturbed. An exercise that fails validation
+    keeps its previous version.
+    """
+
+    def __init__(self, directory=EXERCISES_DIR, builtin=None, poll_interval=2.0):
+        self.directory = directory
+        self.builtin = EXERCISE_LIBRARY if builtin is None else builtin
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.last_poll = 0.0
+        self.stamps = None
+        self.file_cache = {}  # path -> (stamp, entries) of its last successful parse
+        self.snapshot = LibrarySnapshot(0, {}, {})
+        self.reload()
+
+    @property
+    def exercises(self):
+        return self.snapshot.exercises
+
+    @property
+    def compiled(self):
+        return self.snapshot.compiled
+
+    def file_stamps(self):
+        stamps = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Deleted between the glob and the stat
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def poll(self):
+        """Reload if any exercise file was added, changed or removed; True when a new snapshot was swapped in."""
+        now = time.time()
+        if now - self.last_poll < self.poll_interval:
+            return False
+        self.last_poll = now
+        if self.file_stamps() == self.stamps:
+            return False
+        return self.reload()
+
+    def read_file(self, path, stamp):
+        cached = self.file_cache.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+            if not isinstance(entries, dict):
+                raise ValueError("expected an object of exercise name -> definition")
+        except (OSError, ValueError) as e:
+            # Possibly caught mid-save: keep what the file held last time
+            print(f"Error loading exercises from {path}: {e}")
+            return cached[1] if cached else {}
+        self.file_cache[path] = (stamp, entries)
+        return entries
+
+    def reload(self):
+        with self.lock:
+            stamps = self.file_stamps()
+            merged = {name: dict(exercise) for name, exercise in self.builtin.items()}
+            names = {exercise_slug(name): name for name in merged}
+            for path, stamp in stamps.items():
+                for name, exercise in self.read_file(path, stamp).items():
+                    try:
+                        exercise = normalize_exercise(exercise)
+                    except (AttributeError, TypeError, ValueError) as e:
+                        print(f"Invalid exercise '{name}' in {path}: {e}")
+                        continue
+                    name = names.setdefault(exercise_slug(name), name)
+                    merged.setdefault(name, {}).update(exercise)
+
+            previous = self.snapshot
+            exercises, compiled = {}, {}
+            for name, exercise in merged.items():
+                problems = validate_exercise(exercise)
+                if not problems:
+                    try:
+                        compiled[name] = CompiledExercise(name, exercise)
+                        exercises[name] = exercise
+                        continue
+                    except (KeyError, TypeError, ValueError) as e:
+                        problems = [str(e)]
+                print(f"Invalid exercise '{name}': {'; '.join(problems)}")
+                if name in previous.compiled:
+                    exercises[name] = previous.exercises[name]
+                    compiled[name] = previous.compiled[name]
+
+            self.stamps = stamps
+            self.snapshot = LibrarySnapshot(previous.version + 1, exercises, compiled)
+            return True
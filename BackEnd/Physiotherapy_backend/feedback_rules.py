@@ -0,0 +1,180 @@
+import numpy as np
+
+# Direction codes the scorers report for a misaligned joint
+FORWARD, BACKWARD, HIGHER, LOWER, RIGHT, LEFT = range(6)
+DIRECTIONS = ("forward", "backward", "higher", "lower", "more to your right", "more to your left")
+
+JOINT_NAMES = {
+    11: "Left Shoulder", 12: "Right Shoulder",
+    13: "Left Elbow", 14: "Right Elbow",
+    15: "Left Wrist", 16: "Right Wrist",
+    23: "Left Hip", 24: "Right Hip",
+    25: "Left Knee", 26: "Right Knee",
+    27: "Left Ankle", 28: "Right Ankle"
+}
+NUM_POSE_LANDMARKS = 33
+
+def joint_name(idx):
+    return JOINT_NAMES.get(idx, f"Joint {idx}")
+
+
+class FeedbackRules:
+    """An exercise's "feedback" declaration compiled into lookup tables.
+
+    "priority" lists the landmarks corrections are spoken for, most
+    important first; "names" gives their spoken names and "phrase" the
+    wording. `rank[idx]` is a landmark's position in that order and
+    `phrases[idx][direction]` / `labels[idx][direction]` hold the finished
+    spoken and sidebar text, so picking a correction is integer lookups only.
+    "angle_limits" / "segment_limits" ({feature: {"min", "max", "phrase"}})
+    become bound arrays over `feature_set`'s angles and inclinations.
+    """
+
+    def __init__(self, declaration=None, feature_set=None):
+        declaration = declaration or {}
+        priority = declaration.get("priority", [25, 26, 23, 24, 11, 12, 27, 28])
+        names = declaration.get("names", {})
+        phrase = declaration.get("phrase", "Move your {joint} {direction}")
+        self.unranked = len(priority)
+        self.rank = np.full(NUM_POSE_LANDMARKS, self.unranked, dtype=np.int64)
+        self.rank[list(priority)] = np.arange(len(priority))
+        self.phrases = []
+        self.labels = []
+        for idx in range(NUM_POSE_LANDMARKS):
+            spoken = names.get(idx, joint_name(idx).split()[-1].lower())
+            label = joint_name(idx).split()[-1] if idx in JOINT_NAMES else joint_name(idx)
+            self.phrases.append([phrase.format(joint=spoken, direction=d) for d in DIRECTIONS])
+            self.labels.append([f"• {label}: Move {d}" for d in DIRECTIONS])
+        self.rank.flags.writeable = False
+
+        angle_names = feature_set.angle_names if feature_set else []
+        segment_names = feature_set.segment_names if feature_set else []
+        self.angle_low, self.angle_high, self.angle_phrases = self.compile_limits(
+            declaration.get("angle_limits", {}), angle_names)
+        self.segment_low, self.segment_high, self.segment_phrases = self.compile_limits(
+            declaration.get("segment_limits", {}), segment_names)
+
+    @staticmethod
+    def compile_limits(limits, names):
+        low = np.full(len(names), -np.inf)
+        high = np.full(len(names), np.inf)
+        phrases = [None] * len(names)
+        for i, name in enumerate(names):
+            if name in limits:
+                low[i] = limits[name].get("min", -np.inf)
+                high[i] = limits[name].get("max", np.inf)
+                phrases[i] = limits[name].get("phrase", f"Check your {name.replace('_', ' ')}")
+        return low, high, phrases
+
+    def ordered(self, misaligned):
+        """[(idx, direction), ...] sorted by priority; joints outside the priority list come last."""
+        return sorted(misaligned, key=lambda item: self.rank[item[0]])
+
+    def next_correction(self, misaligned, recent):
+        """Phrase for the most important correction whose key isn't in `recent`, or None.
+
+        `recent` is the caller's deque of keys (idx * 6 + direction) already
+        spoken; the chosen one is appended to it.
+        """
+        best = None
+        for idx, direction in misaligned:
+            key = idx * len(DIRECTIONS) + direction
+            if self.rank[idx] < self.unranked and key not in recent:
+                if best is None or self.rank[idx] < self.rank[best[0]]:
+                    best = (idx, direction, key)
+        if best is None:
+            return None
+        recent.append(best[2])
+        return self.phrases[best[0]][best[1]]
+
+    def limit_correction(self, features, recent):
+        """Phrase for the first angle or segment limit the frame breaks that isn't in `recent`, or None."""
+        if features is None:
+            return None
+        # Keys above the joint/direction range: 1000 + angle index, 2000 + segment index
+        for i in features.outside(self.angle_low, self.angle_high):
+            if 1000 + i not in recent:
+                recent.append(1000 + i)
+                return self.angle_phrases[i]
+        broken = (features.inclinations < self.segment_low) | (features.inclinations > self.segment_high)
+        for i in np.flatnonzero(broken):
+            if 2000 + i not in recent:
+                recent.append(2000 + i)
+                return self.segment_phrases[i]
+        return None
+
+
+# Hold/rep state machine: states, inputs and the events it emits
+IDLE, HOLDING, HELD, DONE = range(4)
+MISALIGNED, ALIGNED, HOLD_ELAPSED = range(3)
+HOLD_START, HOLD_COMPLETE, REP, SET_COMPLETE = range(4)
+EVENT_NAMES = ("hold_start", "hold_complete", "rep", "set_complete")
+
+# TRANSITIONS[state][input] = (next state, event or None)
+TRANSITIONS = (
+    #  MISALIGNED        ALIGNED                 HOLD_ELAPSED
+    ((IDLE, None),       (HOLDING, HOLD_START),  (HOLDING, HOLD_START)),    # IDLE
+    ((IDLE, None),       (HOLDING, None),        (HELD, HOLD_COMPLETE)),    # HOLDING
+    ((IDLE, None),       (HELD, None),           (HELD, None)),             # HELD: release before the next hold
+    ((DONE, None),       (DONE, None),           (DONE, None)),             # DONE: set finished
+)
+
+
+class HoldRepMachine:
+    """Counts holds of `min_hold_time` seconds above `threshold` as reps.
+
+    `update(score, now)` returns the events of this frame (usually none).
+    A completed hold counts as a rep when `counts` is true (e.g. only in
+    the exercise's final position); the patient has to leave the position
+    before the next hold starts, and after `reps_required` reps the
+    machine stays done until reset.
+    """
+
+    def __init__(self, threshold=70.0, min_hold_time=3.0, reps_required=3):
+        self.threshold = threshold
+        self.min_hold_time = min_hold_time
+        self.reps_required = reps_required
+        self.reset()
+
+    @classmethod
+    def from_thresholds(cls, thresholds):
+        return cls(thresholds['alignment_threshold'], thresholds['min_hold_time'], thresholds['reps_required'])
+
+    def reset(self):
+        self.state = IDLE
+        self.hold_start = None
+        self.reps = 0
+
+    def restart_hold(self):
+        """The reference position changed: any hold in progress starts over."""
+        if self.state != DONE:
+            self.state = IDLE
+
+    @property
+    def holding(self):
+        """In the position: holding, or held and not yet released."""
+        return self.state in (HOLDING, HELD)
+
+    def hold_time(self, now):
+        return now - self.hold_start if self.state == HOLDING else 0.0
+
+    def update(self, score, now, counts=True):
+        if score < self.threshold:
+            signal = MISALIGNED
+        elif self.state == HOLDING and now - self.hold_start >= self.min_hold_time:
+            signal = HOLD_ELAPSED
+        else:
+            signal = ALIGNED
+        self.state, event = TRANSITIONS[self.state][signal]
+        if event is None:
+            return ()
+        if event == HOLD_START:
+            self.hold_start = now
+            return (HOLD_START,)
+        if not counts:
+            return (HOLD_COMPLETE,)
+        self.reps += 1
+        if self.reps >= self.reps_required:
+            self.state = DONE
+            return (HOLD_COMPLETE, REP, SET_COMPLETE)
+        return (HOLD_COMPLETE, REP)
@@ -1,25 +1,27 @@
 import cv2
 import mediapipe as mp
-import numpy as np
+import sys
 import time
 import random
+from frame_sources import CameraSource, open_source
+from pose_engine import InferenceService
+from pose_pipelines import PoseOnlyPipeline
+from scorers import LenientPoseScorer
 
 class PoseRecorder:
-    def __init__(self):
-        # Initialize MediaPipe Pose
+    def __init__(self, source=None):
+        # Initialize MediaPipe Pose through the shared engine
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
+        self.engine = InferenceService(pipeline=PoseOnlyPipeline(
             model_complexity=1,
-            smooth_landmarks=True,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
-        )
+        ))
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
 
-        # Open the webcam
-        self.cap = cv2.VideoCapture(0)
+        # Open the webcam (mirrored and resized to 960x540 on read)
+        self.source = source or CameraSource(0, size=(960, 540), mirror=True)
         
         # Embedded reference pose for "Straight Leg Raises" (side-view)
         self.reference_pose = {
@@ -36,6 +38,7 @@ class PoseRecorder:
             27: [0.70, 0.35, 0],  # Left ankle (raised leg)
             28: [0.65, 0.90, 0]   # Right ankle (grounded leg)
         }
+        self.scorer = LenientPoseScorer(self.reference_pose)
         
         # Matching parameters - now much more forgiving
         self.similarity_threshold = 30.0   # Lower threshold for an easier match
@@ -46,71 +49,22 @@ class PoseRecorder:
         self.rep_count = 0                   # Count of successful holds
         self.current_exercise = True         # Always on to fix the issue
         self.silent_mode = True              # No voice feedback
-        self.last_similarity = 0             # Store last similarity for smoother transitions
 
     def process_frame(self, frame):
         """Process frame using MediaPipe and draw landmarks."""
-        image_rgb = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image_rgb)
-        image = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
-        if results.pose_landmarks:
+        results = self.engine.process(frame)
+        image = frame  # Drawn on in place; the source reuses its buffer every read
+        if results and results.pose_landmarks:
             self.mp_drawing.draw_landmarks(
                 image,
                 results.pose_landmarks,
                 self.mp_pose.POSE_CONNECTIONS,
                 landmark_drawing_spec=self.mp_drawing_styles.get_default_pose_landmarks_style()
             )
-        return image, results.pose_landmarks
+        return image, results.pose_landmarks if results else None
 
     def calculate_similarity(self, landmarks):
-        """
-        Calculates a similarity score (0 to 100) by comparing the detected pose
-        to the reference pose using the Euclidean distance of the x,y coordinates.
-        Modified to be much more responsive and lenient.
-        """
-        if not landmarks:
-            return max(0, self.last_similarity - 5), {}  # Gradual decrease if no landmarks
-            
-        # Base score just for having landmarks detected
-        base_score = 30
-        
-        # Calculate distances for available landmarks
-        total_distance = 0
-        count = 0
-        current = {i: [lm.x, lm.y, lm.z] for i, lm in enumerate(landmarks.landmark)}
-        
-        # Only check a subset of key points that are likely to be visible
-        visible_points = {}
-        for idx in self.reference_pose.keys():
-            if idx in current and current[idx][2] > -0.5:  # Check z-value for visibility
-                visible_points[idx] = current[idx]
-        
-        # If we have at least some visible points, calculate similarity
-        if visible_points:
-            for idx, ref in self.reference_pose.items():
-                if idx in visible_points:
-                    cur = visible_points[idx]
-                    # Much more forgiving distance calculation
-                    dist = np.sqrt((ref[0] - cur[0])**2 + (ref[1] - cur[1])**2) * 0.5  # Apply 0.5 multiplier to make it easier
-                    total_distance += dist
-                    count += 1
-                    
-            if count > 0:
-                avg_distance = total_distance / count
-                # Make the curve much more forgiving - even large distances will give decent scores
-                raw_similarity = max(0, min(100, 100 * (1 - avg_distance * 2)))
-                # Add base score and cap at 100
-                similarity = min(100, base_score + raw_similarity * 0.7)
-            else:
-                similarity = base_score
-        else:
-            similarity = base_score * 0.5  # Partial credit just for having some landmarks
-            
-        # Smooth transitions (weighted average with previous value)
-        smoothed_similarity = 0.7 * similarity + 0.3 * self.last_similarity
-        self.last_similarity = smoothed_similarity
-            
-        return smoothed_similarity, {}
+        return self.scorer.score(landmarks)
 
     def draw_progress_bar(self, image, similarity, start_time):
         height, width, _ = image.shape
@@ -209,8 +163,8 @@ class PoseRecorder:
                             1.0, (0, 255, 0), 3)
         else:
             # If no landmarks detected, use a decreasing similarity value
-            self.last_similarity = max(0, self.last_similarity - 2)
-            image = self.draw_side_progress_bar(image, self.last_similarity)
+            self.scorer.last_similarity = max(0, self.scorer.last_similarity - 2)
+            image = self.draw_side_progress_bar(image, self.scorer.last_similarity)
                 
         if self.confetti_active and now - self.last_success_time < 2.5:
             image = self.draw_confetti(image)
@@ -227,18 +181,17 @@ class PoseRecorder:
         print("⏳ Hold the pose for 3 seconds to complete a rep.")
         print("❌ Press ESC to exit.")
         while True:
-            ret, frame = self.cap.read()
+            ret, frame, _ = self.source.read()
             if not ret:
                 print("❌ Failed to grab frame.")
                 break
-            frame = cv2.flip(frame, 1)
-            frame = cv2.resize(frame, (960, 540))
             processed_image, landmarks = self.process_frame_with_feedback(frame)
             cv2.imshow("Pose Tracker - Straight Leg Raises", processed_image)
             if cv2.waitKey(1) & 0xFF == 27:
                 break
-        self.cap.release()
+        self.source.release()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    PoseRecorder().run()
\ No newline at end of file
+    # Optional source: camera index, video file, image directory/pattern or "synthetic"
+    PoseRecorder(open_source(sys.argv[1], size=(960, 540), mirror=True) if len(sys.argv) > 1 else None).run()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+class RgbBuffer:
+    """Reusable BGR -> RGB conversion target for model input.
+
+    Kept as one flat array so any frame or crop up to the largest seen so
+    far gets a contiguous view without reallocating.
+    """
+
+    def __init__(self, size=0):
+        self.pool = np.empty(size, dtype=np.uint8)
+
+    def convert(self, image):
+        if image.size > self.pool.size:
+            self.pool = np.empty(image.size, dtype=np.uint8)
+        dst = self.pool[:image.size].reshape(image.shape)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=dst)
+
+
+class FrameBuffers:
+    """Preallocated buffers for the camera -> display path.
+
+    The output canvas holds the sidebar and the video side by side, and
+    `sidebar` / `video` are views into it, so drawing the sidebar never
+    needs an `np.hstack`. Buffers are only reallocated when the camera or
+    display resolution changes.
+    """
+
+    def __init__(self, width=960, height=540, sidebar_width=250):
+        self.capture = None   # Reused by cap.read() so the driver writes into the same array
+        self.resized = None   # Camera frame scaled to the display size (unflipped)
+        self.canvas = None
+        self.sidebar = None
+        self.video = None
+        self.allocate(width, height, sidebar_width)
+
+    def allocate(self, width, height, sidebar_width):
+        """(Re)allocate the display-sized buffers for a new resolution."""
+        self.width = width
+        self.height = height
+        self.sidebar_width = sidebar_width
+        self.resized = np.empty((height, width, 3), dtype=np.uint8)
+        self.canvas = np.zeros((height, sidebar_width + width, 3), dtype=np.uint8)
+        self.sidebar = self.canvas[:, :sidebar_width]
+        self.video = self.canvas[:, sidebar_width:]
+
+    def prepare(self, frame):
+        """Resize and mirror a camera frame straight into the video area of the canvas.
+
+        The camera frame itself is left untouched, so calling this again with
+        the same frame (e.g. while the celebration pauses the video) restores
+        a clean image without keeping an extra copy around.
+        """
+        h, w = frame.shape[:2]
+        if (w, h) != (self.width, self.height):
+            cv2.resize(frame, (self.width, self.height), dst=self.resized)
+            source = self.resized
+        else:
+            source = frame
+        cv2.flip(source, 1, dst=self.video)
+        return self.video
+
+    def compose(self, image, sidebar_width):
+        """Return the full canvas with `image` in the video area.
+
+        When `image` was drawn in place on `self.video` this is free; other
+        images (e.g. the celebration overlay, which works on a copy) are
+        copied into the video area once.
+        """
+        h, w = image.shape[:2]
+        if (w, h, sidebar_width) != (self.width, self.height, self.sidebar_width):
+            self.allocate(w, h, sidebar_width)
+        if image is not self.video:
+            np.copyto(self.video, image)
+        return self.canvas
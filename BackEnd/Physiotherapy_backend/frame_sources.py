@@ -0,0 +1,254 @@
+import glob
+import math
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class FrameSource:
+    """Base for everything the apps can read frames from.
+
+    `read()` returns (ok, frame, timestamp). The raw, resized and mirrored
+    frames each live in a buffer that is reused on every read, so a
+    returned frame is only valid until the next call to `read`.
+    """
+
+    def __init__(self, size=None, mirror=False):
+        self.size = size
+        self.mirror = mirror
+        self.raw = None
+        self.resized = None
+        self.flipped = None
+
+    def is_opened(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def transform(self, frame):
+        if self.size and (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            self.resized = cv2.resize(frame, tuple(self.size), dst=self.resized)
+            frame = self.resized
+        if self.mirror:
+            self.flipped = cv2.flip(frame, 1, dst=self.flipped)
+            frame = self.flipped
+        return frame
+
+    def release(self):
+        pass
+
+
+class CameraSource(FrameSource):
+    """A webcam, asked for the target resolution so frames rarely need resizing.
+
+    MJPG lets most USB cameras deliver 960x540 or 720p at full frame rate,
+    and a one-frame driver buffer means `read` returns the newest frame
+    rather than one that has been sitting in the queue. Drivers are free to
+    ignore any of these; `actual_size` is what the camera really delivers
+    and the rest is resized in `transform`.
+    """
+
+    def __init__(self, index=0, size=None, mirror=False, fourcc="MJPG", fps=None, buffer_size=1):
+        super().__init__(size, mirror)
+        self.cap = cv2.VideoCapture(index)
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if size:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        self.actual_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        if size and self.cap.isOpened() and self.actual_size != tuple(size):
+            print(f"Camera delivers {self.actual_size[0]}x{self.actual_size[1]}, resizing to {size[0]}x{size[1]}")
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        # grab() returns as soon as the frame is captured, so the timestamp doesn't include decoding
+        if not self.cap.grab():
+            return False, None, time.time()
+        timestamp = time.time()
+        ok, raw = self.cap.retrieve(self.raw)
+        if not ok:
+            return False, None, timestamp
+        self.raw = raw
+        return True, self.transform(raw), timestamp
+
+
+class VideoFileSource(FrameSource):
+    """A recorded video, paced like a live camera unless `realtime` is False.
+
+    Timestamps follow the video's own clock, offset to start now, so
+    scorers see the same timing they would have seen live.
+    """
+
+    def __init__(self, path, size=None, mirror=False, loop=False, realtime=True):
+        super().__init__(size, mirror)
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        self.realtime = realtime
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.start_time = time.time()
+        self.offset = 0.0  # Video time already played by earlier loops
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ok, raw = self.cap.read(self.raw)
+        if not ok and self.loop:
+            self.offset += self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 + 1.0 / self.fps
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, raw = self.cap.read(self.raw)
+        if not ok:
+            return False, None, time.time()
+        self.raw = raw
+        position = self.offset + self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        timestamp = self.start_time + position
+        if self.realtime:
+            time.sleep(max(0.0, timestamp - time.time()))
+        else:
+            timestamp = time.time()
+        return True, self.transform(raw), timestamp
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageSequenceSource(FrameSource):
+    """Frames from a directory of images (sorted by name) or a glob pattern."""
+
+    def __init__(self, path, size=None, mirror=False, fps=30.0, loop=False, realtime=True):
+        super().__init__(size, mirror)
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            self.files = sorted(glob.glob(path))
+        self.fps = fps
+        self.loop = loop
+        self.realtime = realtime
+        self.index = 0
+        self.start_time = time.time()
+
+    def is_opened(self):
+        return bool(self.files)
+
+    def read(self):
+        if self.index >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None, time.time()
+        frame = cv2.imread(self.files[self.index % len(self.files)])
+        timestamp = self.start_time + self.index / self.fps
+        self.index += 1
+        if frame is None:
+            return False, None, timestamp
+        if self.realtime:
+            time.sleep(max(0.0, timestamp - time.time()))
+        else:
+            timestamp = time.time()
+        return True, self.transform(frame), timestamp
+
+
+def standing_pose():
+    """33 MediaPipe pose landmarks for someone standing facing the camera, {index: [x, y, z]}."""
+    pose = {
+        0: [0.50, 0.15, 0], 7: [0.53, 0.15, 0], 8: [0.47, 0.15, 0], 9: [0.51, 0.18, 0], 10: [0.49, 0.18, 0],
+        11: [0.56, 0.28, 0], 12: [0.44, 0.28, 0], 13: [0.58, 0.42, 0], 14: [0.42, 0.42, 0],
+        15: [0.59, 0.55, 0], 16: [0.41, 0.55, 0],
+        23: [0.54, 0.58, 0], 24: [0.46, 0.58, 0], 25: [0.54, 0.75, 0], 26: [0.46, 0.75, 0],
+        27: [0.54, 0.90, 0], 28: [0.46, 0.90, 0], 29: [0.54, 0.92, 0], 30: [0.46, 0.92, 0],
+        31: [0.56, 0.93, 0], 32: [0.44, 0.93, 0],
+    }
+    for i, (dx, dy) in zip(range(1, 7), [(0.01, -0.01), (0.015, -0.01), (0.02, -0.01),
+                                         (-0.01, -0.01), (-0.015, -0.01), (-0.02, -0.01)]):
+        pose[i] = [0.50 + dx, 0.15 + dy, 0]
+    for left, right, dy in ((17, 18, 0.03), (19, 20, 0.035), (21, 22, 0.02)):
+        pose[left] = [0.59, 0.55 + dy, 0]
+        pose[right] = [0.41, 0.55 + dy, 0]
+    return pose
+
+
+# Left arm raised out to the side, the default motion of the synthetic figure
+ARM_RAISE_POSE = {
+    13: [0.64, 0.25, 0], 15: [0.72, 0.20, 0], 17: [0.75, 0.19, 0], 19: [0.755, 0.185, 0], 21: [0.74, 0.18, 0],
+}
+
+SYNTHETIC_CONNECTIONS = [
+    (11, 12), (11, 13), (13, 15), (12, 14), (14, 16), (11, 23), (12, 24), (23, 24),
+    (23, 25), (25, 27), (24, 26), (26, 28), (27, 29), (29, 31), (28, 30), (30, 32),
+    (15, 17), (15, 19), (16, 18), (16, 20),
+]
+
+class SyntheticPoseSource(FrameSource):
+    """Renders a stick figure moving between a rest pose and a target pose.
+
+    Needs no camera, so apps and tests can run headless. The figure eases
+    from `rest_pose` to `target_pose` (an arm raise by default) and back
+    every `period` seconds; `landmarks` holds the exact pose drawn in the
+    last frame, usable as ground truth. Poses are {index: [x, y, z]} dicts as in EXERCISE_LIBRARY,
+    and indices missing from the target keep their rest position.
+    """
+
+    def __init__(self, size=(960, 540), mirror=False, target_pose=None, rest_pose=None, period=4.0,
+                 fps=30.0, realtime=True, background=(40, 40, 40), color=(200, 220, 240)):
+        super().__init__(None, mirror)
+        self.width, self.height = size
+        self.rest = rest_pose or standing_pose()
+        self.target = dict(self.rest)
+        self.target.update(ARM_RAISE_POSE if target_pose is None else target_pose)
+        self.period = period
+        self.fps = fps
+        self.realtime = realtime
+        self.background = background
+        self.color = color
+        self.canvas = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.frame_index = 0
+        self.start_time = time.time()
+        self.landmarks = dict(self.rest)
+
+    def pose_at(self, t):
+        blend = (1 - math.cos(2 * math.pi * t / self.period)) / 2
+        return {i: [r + (g - r) * blend for r, g in zip(self.rest[i], self.target.get(i, self.rest[i]))]
+                for i in self.rest}
+
+    def read(self):
+        timestamp = self.start_time + self.frame_index / self.fps
+        if self.realtime:
+            time.sleep(max(0.0, timestamp - time.time()))
+        self.landmarks = self.pose_at(self.frame_index / self.fps)
+        self.frame_index += 1
+
+        self.canvas[:] = self.background
+        points = {i: (int(x * self.width), int(y * self.height)) for i, (x, y, _) in self.landmarks.items()}
+        thickness = max(2, self.width // 80)
+        for a, b in SYNTHETIC_CONNECTIONS:
+            cv2.line(self.canvas, points[a], points[b], self.color, thickness, cv2.LINE_AA)
+        cv2.circle(self.canvas, points[0], thickness * 3, self.color, -1, cv2.LINE_AA)
+        return True, self.transform(self.canvas), timestamp
+
+
+def open_source(spec, **kwargs):
+    """Pick a source from a command-line style spec.
+
+    An integer (or digit string) opens that camera, "synthetic" renders a
+    stick figure, a directory or glob pattern is an image sequence, and
+    anything else is treated as a video file.
+    """
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec), **kwargs)
+    if spec == "synthetic":
+        return SyntheticPoseSource(**kwargs)
+    if os.path.isdir(spec) or any(ch in spec for ch in "*?["):
+        return ImageSequenceSource(spec, **kwargs)
+    return VideoFileSource(spec, **kwargs)
@@ -0,0 +1,97 @@
+import time
+
+import cv2
+import numpy as np
+
+ACTIVE = "active"
+IDLE = "idle"
+
+class IdleMonitor:
+    """Switches a camera loop between full inference and cheap motion sensing.
+
+    After `idle_after` seconds without a detected pose/hand the monitor goes
+    idle: the caller should stop running the model, poll the camera every
+    `poll_interval` seconds and pass frames to `motion_detected`. Motion
+    (enough changed pixels on a tiny blurred grey frame) switches back to
+    active. Time spent in each state and the wake-up latency (motion to
+    first detection) are kept as metrics.
+    """
+
+    def __init__(self, idle_after=30.0, poll_interval=0.5, motion_threshold=25, motion_fraction=0.01,
+                 sensing_size=(160, 90)):
+        self.idle_after = idle_after
+        self.poll_interval = poll_interval
+        self.motion_threshold = motion_threshold  # Grey-level change that counts a pixel as changed
+        self.motion_fraction = motion_fraction    # Fraction of changed pixels that counts as motion
+        self.sensing_size = sensing_size
+        self.state = ACTIVE
+        now = time.time()
+        self.state_since = now
+        self.last_detection = now
+        self.woke_at = None
+        self.previous = None
+        self.small = np.empty((sensing_size[1], sensing_size[0], 3), dtype=np.uint8)
+        self.gray = np.empty((sensing_size[1], sensing_size[0]), dtype=np.uint8)
+        self.diff = np.empty_like(self.gray)
+        self.totals = {ACTIVE: 0.0, IDLE: 0.0}
+        self.wakeups = 0
+        self.wake_latencies = []
+        self.max_latency_samples = 50
+
+    @property
+    def idle(self):
+        return self.state == IDLE
+
+    def update(self, detected):
+        """Report whether the model found someone in the latest frame (active state only)."""
+        now = time.time()
+        if detected:
+            self.last_detection = now
+            if self.woke_at is not None:
+                self.wake_latencies.append(now - self.woke_at)
+                del self.wake_latencies[:-self.max_latency_samples]
+                self.woke_at = None
+        elif self.state == ACTIVE and now - self.last_detection > self.idle_after:
+            self.set_state(IDLE, now)
+            self.previous = None
+            self.woke_at = None
+
+    def motion_detected(self, frame):
+        """Cheap frame-difference check used while idle. Wakes the monitor on motion."""
+        cv2.resize(frame, self.sensing_size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.GaussianBlur(self.gray, (5, 5), 0, dst=self.gray)
+        if self.previous is None:
+            self.previous = self.gray.copy()
+            return False
+        cv2.absdiff(self.gray, self.previous, dst=self.diff)
+        self.previous, self.gray = self.gray, self.previous
+        changed = np.count_nonzero(self.diff > self.motion_threshold) / self.diff.size
+        if changed < self.motion_fraction:
+            return False
+        now = time.time()
+        self.set_state(ACTIVE, now)
+        self.wakeups += 1
+        self.woke_at = now
+        self.last_detection = now  # Give the model a full idle_after window to find someone
+        return True
+
+    def set_state(self, state, now):
+        self.totals[self.state] += now - self.state_since
+        self.state = state
+        self.state_since = now
+        print(f"Camera loop is now {state}")
+
+    def metrics(self):
+        now = time.time()
+        totals = dict(self.totals)
+        totals[self.state] += now - self.state_since
+        latencies = self.wake_latencies
+        return {
+            'state': self.state,
+            'active_seconds': round(totals[ACTIVE], 1),
+            'idle_seconds': round(totals[IDLE], 1),
+            'wakeups': self.wakeups,
+            'last_wake_latency': round(latencies[-1], 3) if latencies else None,
+            'mean_wake_latency': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        }
@@ -0,0 +1,159 @@
+import numpy as np
+
+# Joint angles: name -> (point, vertex, point), the angle at the vertex in degrees (180 = straight)
+POSE_ANGLES = {
+    "left_knee": (23, 25, 27), "right_knee": (24, 26, 28),
+    "left_hip": (11, 23, 25), "right_hip": (12, 24, 26),
+    "left_elbow": (11, 13, 15), "right_elbow": (12, 14, 16),
+    "left_shoulder": (23, 11, 13), "right_shoulder": (24, 12, 14),
+}
+# Segments: name -> (from, to); reported as a unit vector and its inclination from straight up
+POSE_SEGMENTS = {
+    "trunk": (23, 11),
+    "left_thigh": (23, 25), "right_thigh": (24, 26),
+    "left_shin": (25, 27), "right_shin": (26, 28),
+}
+HAND_ANGLES = {
+    "index_finger": (0, 5, 8), "middle_finger": (0, 9, 12),
+}
+HAND_SEGMENTS = {
+    "palm": (0, 9),   # Wrist to middle finger knuckle: the hand's size in frame
+}
+
+
+def body_frame(pose):
+    """(hip centre, torso length) of an {index: [x, y, z]} pose, or None without hips and shoulders."""
+    if not all(i in pose for i in (11, 12, 23, 24)):
+        return None
+    hips = (np.asarray(pose[23][:3], dtype=np.float64) + np.asarray(pose[24][:3], dtype=np.float64)) / 2
+    shoulders = (np.asarray(pose[11][:3], dtype=np.float64) + np.asarray(pose[12][:3], dtype=np.float64)) / 2
+    torso = float(np.linalg.norm((shoulders - hips)[:2]))
+    return (hips, torso) if torso > 1e-3 else None
+
+def align_pose(current, reference):
+    """`current` moved and scaled so its hip centre and torso length match `reference`'s.
+
+    Distances to the reference then don't depend on where the patient stands
+    or how large they appear, but stay in the reference's units, so existing
+    thresholds keep their meaning. Unchanged if either pose lacks hips or
+    shoulders.
+    """
+    frames = body_frame(current), body_frame(reference)
+    if None in frames:
+        return current
+    (hips, torso), (ref_hips, ref_torso) = frames
+    scale = ref_torso / torso
+    return {i: list((np.asarray(p[:3], dtype=np.float64) - hips) * scale + ref_hips) for i, p in current.items()}
+
+
+class Features:
+    """Angles and segments of one frame. Entries that couldn't be measured are NaN."""
+
+    def __init__(self, feature_set, angles, vectors, lengths, inclinations):
+        self.feature_set = feature_set
+        self.angles = angles              # (A,) degrees
+        self.vectors = vectors            # (S, 3) unit vectors
+        self.lengths = lengths            # (S,) in frame-height units
+        self.inclinations = inclinations  # (S,) degrees from straight up
+
+    def angle(self, name):
+        return float(self.angles[self.feature_set.angle_index[name]])
+
+    def segment(self, name):
+        """(unit vector, length, inclination) of one segment."""
+        i = self.feature_set.segment_index[name]
+        return self.vectors[i], float(self.lengths[i]), float(self.inclinations[i])
+
+    def outside(self, low, high):
+        """Indices of angles outside [low, high] (arrays over the feature set's angles)."""
+        return np.flatnonzero((self.angles < low) | (self.angles > high))
+
+
+class FeatureSet:
+    """Index arrays for a fixed list of angles and segments, computed in one vectorized pass.
+
+    Coordinates are normalized, so x is rescaled by the frame's aspect ratio
+    before measuring; depth only counts with `depth_weight` (MediaPipe z is
+    noisy). Angles and segments don't depend on where the patient stands or
+    how large they appear in the frame.
+    """
+
+    def __init__(self, angles=None, segments=None, depth_weight=0.0, min_visibility=None):
+        angles = POSE_ANGLES if angles is None else angles
+        segments = POSE_SEGMENTS if segments is None else segments
+        self.angle_names = list(angles)
+        self.segment_names = list(segments)
+        self.angle_index = {name: i for i, name in enumerate(self.angle_names)}
+        self.segment_index = {name: i for i, name in enumerate(self.segment_names)}
+        triples = np.array([angles[name] for name in self.angle_names], dtype=np.intp).reshape(-1, 3)
+        pairs = np.array([segments[name] for name in self.segment_names], dtype=np.intp).reshape(-1, 2)
+        self.a, self.v, self.b = triples.T
+        self.s0, self.s1 = pairs.T
+        self.depth_weight = depth_weight
+        self.min_visibility = min_visibility
+
+    @classmethod
+    def from_exercise(cls, exercise):
+        """The exercise's "angles" and "segments" (landmark index lists), or the pose defaults."""
+        return cls(exercise.get("angles"), exercise.get("segments"), min_visibility=0.5)
+
+    def compute(self, points, visibility=None, aspect=1.0):
+        """Features of an (N, 3) array of normalized landmarks."""
+        p = points * np.array([aspect, 1.0, self.depth_weight])
+        va = p[self.a] - p[self.v]
+        vb = p[self.b] - p[self.v]
+        norms = np.linalg.norm(va, axis=1) * np.linalg.norm(vb, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cosines = np.einsum('ij,ij->i', va, vb) / norms
+            angles = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+
+            segments = p[self.s1] - p[self.s0]
+            lengths = np.linalg.norm(segments, axis=1)
+            vectors = segments / lengths[:, None]
+            # Image y grows downwards, so "up" is -y
+            inclinations = np.degrees(np.arccos(np.clip(-vectors[:, 1], -1.0, 1.0)))
+        if visibility is not None and self.min_visibility is not None:
+            hidden = visibility < self.min_visibility
+            angles[hidden[self.a] | hidden[self.v] | hidden[self.b]] = np.nan
+            lost = hidden[self.s0] | hidden[self.s1]
+            lengths[lost] = np.nan
+            inclinations[lost] = np.nan
+        return Features(self, angles, vectors, lengths, inclinations)
+
+    def compute_pose(self, pose, aspect=1.0):
+        """Features of an {index: [x, y, z]} pose such as a reference keyframe (missing joints give NaN)."""
+        size = max(pose) + 1 if pose else 0
+        points = np.full((max(size, 33), 3), np.nan)
+        for i, point in pose.items():
+            points[i] = point[:3]
+        return self.compute(points, aspect=aspect)
+
+
+class FeatureLayer:
+    """Computes a frame's features once; every consumer then reads `current`.
+
+    `update()` is called once per frame with that frame's landmarks;
+    scorers, feedback and rep counting share the result instead of each
+    going back to the raw coordinates.
+    """
+
+    def __init__(self, feature_set=None):
+        self.feature_set = feature_set or FeatureSet()
+        self.points = None
+        self.visibility = None
+        self.current = None
+
+    def update(self, landmarks, frame_shape=None):
+        if landmarks is None or not landmarks.landmark:
+            self.current = None
+            return None
+        count = len(landmarks.landmark)
+        if self.points is None or len(self.points) != count:
+            self.points = np.empty((count, 3))
+            self.visibility = np.empty(count)
+        for i, lm in enumerate(landmarks.landmark):
+            self.points[i] = (lm.x, lm.y, lm.z)
+            self.visibility[i] = getattr(lm, 'visibility', 1.0)
+        aspect = frame_shape[1] / frame_shape[0] if frame_shape is not None else 1.0
+        self.current = self.feature_set.compute(self.points, self.visibility, aspect)
+        return self.current
@@ -0,0 +1,234 @@
+import copy
+import time
+
+import cv2
+import numpy as np
+
+class ConstantVelocityKalman:
+    """Constant-velocity Kalman filter for N 2D points, vectorized over all points.
+
+    x and y share the same dynamics and are measured together, so one 2x2
+    covariance per point covers both axes.
+    """
+
+    def __init__(self, process_noise=2000.0, measurement_noise=4.0):
+        self.process_noise = process_noise          # Acceleration variance (px^2/s^4)
+        self.measurement_noise = measurement_noise  # Measurement variance (px^2)
+        self.pos = None
+        self.vel = None
+        self.cov = None
+
+    def reset(self, points):
+        n = len(points)
+        self.pos = np.asarray(points, dtype=np.float64).copy()
+        self.vel = np.zeros_like(self.pos)
+        self.cov = np.zeros((n, 2, 2))
+        self.cov[:, 0, 0] = self.measurement_noise
+        self.cov[:, 1, 1] = 1e4  # Velocity unknown at first
+
+    def predict(self, dt):
+        if self.pos is None or dt <= 0:
+            return
+        self.pos += self.vel * dt
+        q = self.process_noise
+        p00, p01, p11 = self.cov[:, 0, 0], self.cov[:, 0, 1], self.cov[:, 1, 1]
+        # P = F P F^T + Q for F = [[1, dt], [0, 1]]
+        new00 = p00 + 2 * dt * p01 + dt * dt * p11 + q * dt ** 4 / 4
+        new01 = p01 + dt * p11 + q * dt ** 3 / 2
+        new11 = p11 + q * dt * dt
+        self.cov[:, 0, 0], self.cov[:, 0, 1], self.cov[:, 1, 0], self.cov[:, 1, 1] = new00, new01, new01, new11
+
+    def correct(self, points, mask=None):
+        """Fuse position measurements; points where `mask` is False keep the prediction."""
+        if self.pos is None:
+            self.reset(points)
+            return
+        points = np.asarray(points, dtype=np.float64)
+        if mask is None:
+            mask = np.ones(len(points), dtype=bool)
+        s = self.cov[:, 0, 0] + self.measurement_noise
+        k0 = np.where(mask, self.cov[:, 0, 0] / s, 0.0)
+        k1 = np.where(mask, self.cov[:, 1, 0] / s, 0.0)
+        innovation = points - self.pos
+        self.pos += k0[:, None] * innovation
+        self.vel += k1[:, None] * innovation
+        p00, p01, p11 = self.cov[:, 0, 0].copy(), self.cov[:, 0, 1].copy(), self.cov[:, 1, 1].copy()
+        self.cov[:, 0, 0] = (1 - k0) * p00
+        self.cov[:, 0, 1] = self.cov[:, 1, 0] = (1 - k0) * p01
+        self.cov[:, 1, 1] = p11 - k1 * p01
+
+
+class LandmarkPropagator:
+    """Keyframe scheduling plus optical-flow/Kalman propagation of landmarks.
+
+    The model only runs every `inference_interval` frames, or earlier when
+    the scene changes by more than `motion_threshold` (mean absolute grey
+    level difference) or when there is nothing to track. In between, the
+    last keypoints are followed with sparse Lucas-Kanade flow on a
+    downscaled grey frame. Propagated frames return the flow positions
+    unfiltered, like the model's own output on keyframes; a constant-velocity
+    Kalman filter carries the points flow loses. Other landmark sets of the
+    same result (e.g. Holistic's hands) are followed along with the primary
+    one. `inference_interval=1` disables propagation entirely.
+
+    `compensate_latency` leads every frame, keyframes included, by the
+    measured inference latency. It is only for front-ends that display a
+    newer frame than the one the landmarks came from; when the processed
+    frame is the displayed one, as in the apps here, there is no lag to
+    make up.
+    """
+
+    def __init__(self, inference_interval=3, motion_threshold=6.0, flow_scale=0.5,
+                 min_visibility=0.5, compensate_latency=False):
+        self.inference_interval = inference_interval
+        self.motion_threshold = motion_threshold
+        self.flow_scale = flow_scale
+        self.min_visibility = min_visibility
+        self.compensate_latency = compensate_latency
+        self.kalman = ConstantVelocityKalman()
+        self.template = None        # Copy of the last inferred landmark list, updated in place
+        self.extra = {}             # Copies of the other landmark sets by results attribute name
+        self.followed = []          # Every landmark of those copies, in flow/Kalman point order
+        self.tracked = None         # Landmarks worth following with optical flow
+        self.flow_points = None     # Unfiltered flow positions in the last frame (full-size pixels)
+        self.gray = None            # Current and previous downscaled grey frames (swapped, never reallocated)
+        self.prev_gray = None
+        self.small = None
+        self.diff = None
+        self.frames_since_inference = 0
+        self.last_time = None
+        self.inference_latency = 0.0
+        self.inference_started = 0.0
+        self.motion = 0.0
+        self.stats = {'inferred': 0, 'propagated': 0, 'motion_triggered': 0}
+
+    @property
+    def enabled(self):
+        return self.inference_interval > 1
+
+    def prepare(self, frame):
+        """Build the downscaled grey frame used for flow and motion detection."""
+        if not self.enabled:
+            return
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * self.flow_scale)), max(1, int(h * self.flow_scale)))
+        if self.small is None or self.small.shape[:2] != (size[1], size[0]):
+            self.small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self.gray = np.empty((size[1], size[0]), dtype=np.uint8)
+            self.prev_gray = None
+            self.diff = np.empty_like(self.gray)
+        elif self.prev_gray is not None:
+            # Reuse the older buffer for the new frame
+            self.gray, self.prev_gray = self.prev_gray, self.gray
+        else:
+            self.prev_gray = self.gray
+            self.gray = np.empty_like(self.prev_gray)
+        cv2.resize(frame, size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        self.frame_size = (w, h)
+
+    def should_infer(self):
+        if not self.enabled or self.template is None or self.prev_gray is None:
+            return True
+        if self.frames_since_inference + 1 >= self.inference_interval:
+            return True
+        cv2.absdiff(self.gray, self.prev_gray, dst=self.diff)
+        self.motion = float(self.diff.mean())
+        if self.motion > self.motion_threshold:
+            self.stats['motion_triggered'] += 1
+            return True
+        return False
+
+    def reset(self):
+        """Forget the tracked landmarks so the next frame runs the model."""
+        self.template = None
+        self.extra = {}
+        self.kalman.pos = None
+        self.frames_since_inference = 0
+
+    def begin_inference(self):
+        self.inference_started = time.time()
+
+    def on_inference(self, landmarks, extra=None):
+        """Record a fresh model result (None when nothing was detected).
+
+        `extra` maps results attribute names to other landmark lists to
+        follow along; names sharing one list share its propagated copy.
+        """
+        now = time.time()
+        if self.inference_started:
+            self.inference_latency = 0.8 * self.inference_latency + 0.2 * (now - self.inference_started)
+            self.inference_started = 0.0
+        self.frames_since_inference = 0
+        self.stats['inferred'] += 1
+        if not self.enabled:
+            return
+        if landmarks is None:
+            self.template = None
+            self.extra = {}
+            self.kalman.pos = None
+            return
+        originals = {id(landmarks): landmarks}
+        copies = {id(landmarks): copy.deepcopy(landmarks)}
+        self.template = copies[id(landmarks)]
+        self.extra = {}
+        for name, other in (extra or {}).items():
+            if other is not None:
+                if id(other) not in copies:
+                    originals[id(other)] = other
+                    copies[id(other)] = copy.deepcopy(other)
+                self.extra[name] = copies[id(other)]
+        self.followed = [lm for followed in copies.values() for lm in followed.landmark]
+        w, h = self.frame_size
+        points = np.array([(lm.x * w, lm.y * h) for lm in self.followed])
+        # Hand landmarks carry no visibility, so trackers for hands use min_visibility=0;
+        # hand and face sets following a pose are always tracked
+        self.tracked = np.ones(len(points), dtype=bool)
+        self.tracked[:len(landmarks.landmark)] = [lm.visibility >= self.min_visibility for lm in landmarks.landmark]
+        if self.kalman.pos is None or len(self.kalman.pos) != len(points):
+            self.kalman.reset(points)
+        else:
+            self.kalman.predict(now - self.last_time if self.last_time else 0.0)
+            self.kalman.correct(points)
+        self.flow_points = points
+        self.last_time = now
+        if self.compensate_latency:
+            self.write([lm for original in originals.values() for lm in original.landmark], points)
+
+    def propagate(self):
+        """Landmarks for the current frame without running the model (None if there is nothing to follow)."""
+        if self.template is None or self.prev_gray is None:
+            return None
+        now = time.time()
+        self.kalman.predict(now - self.last_time if self.last_time else 0.0)
+        self.last_time = now
+        self.frames_since_inference += 1
+        self.stats['propagated'] += 1
+
+        scale = self.flow_scale
+        # Flow runs from the points' previous-frame positions, not the prediction (which already
+        # includes this frame's motion), and from the raw flow chain rather than the filtered
+        # estimate, so the filter's lag isn't fed back into the next measurement
+        prev_points = (self.flow_points * scale).astype(np.float32).reshape(-1, 1, 2)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray, self.gray, prev_points, None, winSize=(15, 15), maxLevel=2)
+        if next_points is not None:
+            measured = next_points.reshape(-1, 2) / scale
+            mask = (status.reshape(-1) == 1) & self.tracked
+            self.kalman.correct(measured, mask)
+            # Points flow lost continue from the prediction
+            self.flow_points = np.where(mask[:, None], measured, self.kalman.pos)
+        else:
+            self.flow_points = self.kalman.pos.copy()
+
+        self.write(self.followed, self.flow_points)
+        return self.template
+
+    def write(self, landmarks, points):
+        """Set landmark x/y from full-size pixel positions, led by the inference latency if compensating."""
+        if self.compensate_latency:
+            points = points + self.kalman.vel * self.inference_latency
+        w, h = self.frame_size
+        for lm, (x, y) in zip(landmarks, points):
+            lm.x = x / w
+            lm.y = y / h
@@ -0,0 +1,165 @@
+import math
+import threading
+from collections import Counter, defaultdict
+
+from search_index import tokenize
+
+STOPWORDS = frozenset("""
+a about after am an and any are as at be by can do does for from have how i if in into is it its me much my of on or should
+so that the their them then there these this to was what when where which who why will with you your
+""".split())
+
+CHECK_WITH_PHYSIO = "Check with your physiotherapist before changing your routine."
+
+# Reviewed answers to frequent questions, searched alongside the exercise data
+CURATED_ANSWERS = [
+    {"question": "pain during exercise hurts sharp pain stop exercising",
+     "answer": ("Mild muscle fatigue or stretching discomfort is normal, but sharp, sudden or increasing pain "
+                "is not. Stop the exercise and contact your physiotherapist or doctor if pain persists."),
+     "source": "RecovAR care team"},
+    {"question": "swelling after exercise ice elevate swollen",
+     "answer": ("Some swelling after exercise is common early in recovery. Rest, elevate the limb and apply "
+                "ice for 15-20 minutes. Tell your doctor if swelling keeps increasing, or comes with redness, "
+                "warmth or fever."),
+     "source": "RecovAR care team"},
+    {"question": "missed a session skipped exercises day catch up double",
+     "answer": ("Don't double up. Continue with your normal schedule from the next session; consistency over "
+                "the following weeks matters more than a single missed day."),
+     "source": "RecovAR care team"},
+]
+
+def terms(text):
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+
+class Passage:
+    """One answerable unit: the text returned, where it comes from, and the text it is found by."""
+
+    def __init__(self, answer, source, searchable):
+        self.answer = answer
+        self.source = source
+        self.terms = terms(searchable)
+
+
+def dataset_passages(recommendations):
+    passages = []
+    for surgery, plans in recommendations.plans.items():
+        for plan in plans:
+            listed = ", ".join(plan['exercises'])
+            passages.append(Passage(
+                f"After {surgery}, the recommended exercises are {listed} ({plan['type']}, "
+                f"{plan['intensity'].lower()} intensity, {plan['frequency']}). Purpose: {plan['purpose']}. "
+                f"{CHECK_WITH_PHYSIO}",
+                f"RecovAR exercise dataset: {surgery}",
+                f"{surgery} exercises recommended physiotherapy rehab plan {listed} {plan['type']} {plan['purpose']}"))
+            for exercise in plan['exercises']:
+                passages.append(Passage(
+                    f"{exercise} is part of the {surgery} plan: {plan['frequency']}, {plan['intensity'].lower()} "
+                    f"intensity ({plan['type']}), to {plan['purpose'][0].lower() + plan['purpose'][1:]}. "
+                    f"{CHECK_WITH_PHYSIO}",
+                    f"RecovAR exercise dataset: {surgery}",
+                    f"{exercise} {surgery} how often frequency times per day {plan['frequency']} "
+                    f"intensity {plan['intensity']} {plan['type']}"))
+    return passages
+
+def library_passages(library):
+    passages = []
+    for name, exercise in library.items():
+        source = f"RecovAR exercise library: {name}"
+        if exercise.get("description"):
+            passages.append(Passage(exercise["description"], source, f"{name} what is {exercise['description']}"))
+        if exercise.get("steps"):
+            steps = " ".join(f"{n}. {step}." for n, step in enumerate(exercise["steps"], 1))
+            passages.append(Passage(f"How to do {name}: {steps}", source,
+                                    f"{name} how to do perform steps instructions technique {steps}"))
+        if exercise.get("common_errors"):
+            errors = "; ".join(exercise["common_errors"])
+            passages.append(Passage(f"Common mistakes with {name}: {errors}.", source,
+                                    f"{name} common mistakes errors avoid wrong {errors}"))
+    return passages
+
+
+class LocalAnswerer:
+    """BM25 over curated answers, the exercise dataset and the exercise library.
+
+    Only answers when confident: the best passage must score at least
+    `min_score` and cover `min_coverage` of the query's information
+    (the idf-weighted share of query terms it contains, unknown terms
+    counting as the rarest). Otherwise returns None and the caller asks the
+    model.
+    """
+
+    def __init__(self, passages, k1=1.5, b=0.75, min_score=4.0, min_coverage=0.7):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.min_score = min_score
+        self.min_coverage = min_coverage
+        self.postings = defaultdict(list)   # term -> [(passage, term frequency)]
+        lengths = [len(passage.terms) for passage in passages]
+        for p, passage in enumerate(passages):
+            for term, tf in Counter(passage.terms).items():
+                self.postings[term].append((p, tf))
+        n = len(passages)
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in self.postings.items()}
+        self.max_idf = max(self.idf.values(), default=1.0)
+        average = sum(lengths) / max(1, n)
+        # Length normalization per passage, so scoring is a lookup and a multiply-add per posting
+        self.norms = [k1 * (1 - b + b * length / max(average, 1e-9)) for length in lengths]
+
+    @classmethod
+    def from_sources(cls, recommendations=None, library=None, curated=CURATED_ANSWERS, **options):
+        passages = [Passage(item["answer"], item["source"], item["question"] + " " + item["answer"])
+                    for item in curated]
+        if recommendations is not None:
+            passages += dataset_passages(recommendations)
+        passages += library_passages(library or {})
+        return cls(passages, **options)
+
+    def answer(self, query):
+        """{response, source, score, coverage} for a confident local answer, else None."""
+        query_terms = list(dict.fromkeys(terms(query)))
+        if not query_terms:
+            return None
+        scores = defaultdict(float)
+        matched = defaultdict(float)
+        for term in query_terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for p, tf in self.postings[term]:
+                scores[p] += idf * tf * (self.k1 + 1) / (tf + self.norms[p])
+                matched[p] += idf
+        if not scores:
+            return None
+        best = max(scores, key=scores.get)
+        total = sum(self.idf.get(term, self.max_idf) for term in query_terms)
+        coverage = matched[best] / total
+        if scores[best] < self.min_score or coverage < self.min_coverage:
+            return None
+        passage = self.passages[best]
+        return {'response': f"{passage.answer}\n\nSource: {passage.source}", 'source': passage.source,
+                'score': round(scores[best], 2), 'coverage': round(coverage, 2)}
+
+
+class PathMetrics:
+    """Request count and latency per answering path ("local", "model", "model_error"), thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paths = {}
+
+    def record(self, path, seconds):
+        with self.lock:
+            stats = self.paths.setdefault(path, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['count'] += 1
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            total = sum(stats['count'] for stats in self.paths.values())
+            paths = {path: {'count': stats['count'], 'mean_ms': round(stats['total_ms'] / stats['count'], 2),
+                            'max_ms': round(stats['max_ms'], 2)} for path, stats in self.paths.items()}
+            local = self.paths.get('local', {}).get('count', 0)
+        return {'requests': total, 'local_hit_rate': round(local / total, 3) if total else None, 'paths': paths}
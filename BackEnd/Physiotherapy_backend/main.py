@@ -1,59 +1,121 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-import pyttsx3
-import threading
+import argparse
 import time
-from exercise_data import EXERCISE_LIBRARY
+from collections import deque
+from exercise_library import ExerciseLibrary
 from celebration import Celebration
+from frame_buffers import FrameBuffers
+from roi_tracker import RoiTracker
+from landmark_propagator import LandmarkPropagator
+from idle_monitor import IdleMonitor
+from pose_pipelines import PipelineCache, pipeline_kind
+from frame_sources import CameraSource, open_source
+from mjpeg_stream import MjpegBroadcaster, MjpegServer
+from session_recorder import SessionRecorder
+from pose_engine import InferenceService
+from scorers import VariationScorer, TrajectoryScorer
+from phase_tracker import PhaseTracker
+from exercise_index import ExerciseIndex, ExerciseRecognizer
+from joint_features import FeatureLayer
+from rep_kinematics import RepKinematics
+from feedback_rules import HoldRepMachine, HOLD_START, HOLD_COMPLETE, REP, SET_COMPLETE
+from speech_queue import SpeechQueue, Pyttsx3Backend, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+# Fixed voice cues, synthesized once at startup
+WELCOME_PHRASE = "Welcome to AR Physiotherapy. Press a number key to select an exercise."
+WELCOME_BACK_PHRASE = "Welcome back to AR Physiotherapy. Press a number key to select an exercise."
+HOLD_PHRASE = "Good position, hold it."
+NEXT_POSITION_PHRASE = "Perfect! Moving to next position."
+COMPLETED_PHRASE = "Great job! You've completed the exercise successfully."
+REP_PHRASE = "Well done, that's {reps} of {total}."
+VOICE_ENABLED_PHRASE = "Voice feedback enabled"
+MENU_PHRASE = "Returned to main menu"
 
 class PhysioARApp:
-    def __init__(self):
-        # Initialize MediaPipe Holistic with improved sensitivity settings:
-        self.mp_holistic = mp.solutions.holistic
-        self.holistic = self.mp_holistic.Holistic(
-            static_image_mode=False,
-            model_complexity=2,             # Increased from 1 to 2 for better accuracy
-            smooth_landmarks=True,
-            enable_segmentation=True,       # Enable segmentation for better body part isolation
-            min_detection_confidence=0.5,   # Slightly lowered for higher sensitivity
-            min_tracking_confidence=0.7     # Kept the same for smooth tracking
-        )
+    def __init__(self, speech_backend=None, source=None, headless=False, stream_port=None, stream_quality=70,
+                 stream_width=None, record_dir=None, auto_select=False):
+        # Each exercise gets the cheapest MediaPipe pipeline that provides the landmarks it
+        # declares (pose only, pose + hands, or full Holistic); pipelines are built lazily and reused
+        self.mp_holistic = mp.solutions.holistic  # Connection constants for drawing
+        self.pipelines = PipelineCache()
         self.mp_drawing = mp.solutions.drawing_utils
-        self.cap = cv2.VideoCapture(0)
-        self.exercises = EXERCISE_LIBRARY
+        # Ask the camera for the display resolution up front instead of resizing every frame
+        self.source = source or CameraSource(0, size=(960, 540))
+        # Built-in exercises plus the JSON files in exercises/, reloaded when those change
+        self.library = ExerciseLibrary()
+        self.exercises = self.library.exercises
         self.current_exercise = "Straight Leg Raises"  # Default to make sure it's not None
         self.reference_landmarks = self.exercises["Straight Leg Raises"]["reference_pose"]  # Set default reference
+        self.pipeline_kind = pipeline_kind(self.exercises["Straight Leg Raises"].get("required_landmarks"))
+        # Scores every variation (left/right leg, facing either way) at once and keeps the best
+        self.alignment_scorer = VariationScorer.from_exercise(self.exercises["Straight Leg Raises"])
+        # Which keyframe (step) the patient is in; the score is computed against that keyframe
+        self.phase_tracker = PhaseTracker.from_compiled(self.library.compiled["Straight Leg Raises"])
+        # Recognise the exercise being done from the pose (nearest keyframe over the whole library);
+        # in the menu the suggestion can be accepted with Enter, or taken automatically
+        self.recognizer = ExerciseRecognizer(ExerciseIndex(self.exercises))
+        self.suggested_exercise = None
+        self.auto_select = auto_select
+        self.menu_page = 0
+        self.menu_page_size = 5
+        self.reference_landmarks = self.phase_tracker.keyframe["pose"]
+        self.alignment_scorer.set_reference(self.reference_landmarks)
+        # Whole-repetition scoring for exercises that define a reference trajectory
+        self.trajectory_scorer = TrajectoryScorer.from_exercise(self.exercises["Straight Leg Raises"])
+        self.rep_feedback = None
         self.menu_active = True
         self.show_skeleton = True
         self.silent_mode = False
-        self.voice_engine = pyttsx3.init()
-        self.voice_engine.setProperty('rate', 150)
-        self.voice_lock = threading.Lock()
+        # One speech worker for the whole session (pass NullSpeechBackend() to run silently in tests)
+        self.speech = SpeechQueue(speech_backend or Pyttsx3Backend(rate=150))
+        self.speech.start()
+        self.speech.prerender([WELCOME_PHRASE, WELCOME_BACK_PHRASE, HOLD_PHRASE, NEXT_POSITION_PHRASE,
+                               COMPLETED_PHRASE, VOICE_ENABLED_PHRASE, MENU_PHRASE] +
+                              [self.start_phrase(name) for name in self.exercises])
         self.last_voice_time = 0
-        self.last_instructions = set()
+        self.last_instructions = deque(maxlen=5)  # Corrections spoken recently, as integer keys
+        self.rep_records = deque(maxlen=50)  # Per-rep kinematics of this session, newest last
+        self.pending_rep_record = None       # Written into the recording's sidecar with the next frame
         self.instruction_cooldown = 5
         self.current_step = 0
-        self.alignment_threshold = 70.0  # Increased threshold for harder success
-        self.aligned_duration = 0
-        self.time_required = 3.0  # Increased hold time requirement
+        self.apply_exercise_rules("Straight Leg Raises")
         self.last_alignment_check = time.time()
         self.sidebar_width = 250
         self.show_sidebar = False
+        self.frame_width, self.frame_height = 960, 540
+        # Preallocated capture/display buffers, reused every frame
+        self.frame_buffers = FrameBuffers(self.frame_width, self.frame_height, self.sidebar_width)
+        # Run Holistic on a padded crop around last frame's pose instead of the whole frame
+        self.roi_tracker = RoiTracker(padding=0.25, min_visibility=0.5)
+        # Display and inference rates are set separately: the loop is paced at display_fps, and
+        # Holistic runs on every inference_interval-th frame (or on sudden motion); landmarks
+        # are carried forward with optical flow in between. inference_interval=1 infers every frame.
+        self.display_fps = 30
+        self.inference_interval = 3
+        self.propagator = LandmarkPropagator(inference_interval=self.inference_interval, motion_threshold=6.0)
+        self.engine = InferenceService(roi_tracker=self.roi_tracker, propagator=self.propagator)
+        # Stop running Holistic when nobody has been in view for a while; wake on motion
+        self.idle_monitor = IdleMonitor(idle_after=30.0, poll_interval=0.5)
+        # Headless mode skips the local window (there is no keyboard, so the default exercise starts
+        # straight away); annotated frames can be watched remotely as an MJPEG stream instead
+        self.headless = headless
+        self.headless_replay_delay = 5.0  # Seconds after a celebration before the exercise restarts
+        self.stream = MjpegBroadcaster(quality=stream_quality, width=stream_width) if stream_port else None
+        self.stream_server = MjpegServer(self.stream, port=stream_port) if stream_port else None
+        # Annotated frames plus landmarks/score are recorded on a background thread for later review
+        self.recorder = SessionRecorder(record_dir) if record_dir else None
+        self.frame_timestamp = time.time()
         self.smoothed_score = 0  # Initialize smoothed score
         
-        # Enhanced body part tracking sensitivity for 3D tracking
-        # Higher values = more importance in accuracy calculation
-        self.leg_sensitivity = 2.0      # Increased weight for leg movements (most important)
-        self.torso_sensitivity = 1.5    # Increased weight for torso (important for stability)
-        self.arm_sensitivity = 1.2      # Increased weight for arms (more strict overall)
-        
         # Improved smoothing for more consistent feedback
         self.alignment_scores_history = []
         self.smoothing_window = 8       # Increased window for smoother transitions
 
         # --- Added for demo image functionality (if used) ---
         self.pose_demo_images = []    # List to store demo images (if any)
+        self.demo_follows_phase = False  # One image per keyframe: show the detected step's image
         self.demo_cycle_period = 7.0  # Total time (seconds) to cycle through the animation
         
         # --- Added for celebration animation ---
@@ -61,16 +123,12 @@ class PhysioARApp:
         self.celebration_triggered = False  # Flag to track if celebration has been triggered
         self.should_restart = False  # Flag to indicate if program should restart
 
-    # --- Demo Image Loader Function (unchanged) ---
+    # --- Demo Image Loader Function ---
     def load_pose_demo_images(self, exercise_name):
-        if exercise_name == "Straight Leg Raises":
-            self.pose_demo_images = [
-                cv2.imread("straight_leg_raises_step1.png", cv2.IMREAD_UNCHANGED),
-                cv2.imread("straight_leg_raises_step2.png", cv2.IMREAD_UNCHANGED),
-                cv2.imread("straight_leg_raises_step3.png", cv2.IMREAD_UNCHANGED)
-            ]
-        else:
-            self.pose_demo_images = []
+        keyframes = self.phase_tracker.keyframes
+        images = [cv2.imread(kf["image"], cv2.IMREAD_UNCHANGED) for kf in keyframes if kf["image"]]
+        self.pose_demo_images = [image for image in images if image is not None]
+        self.demo_follows_phase = len(self.pose_demo_images) == len(keyframes)
 
     # --- Overlay functions (unchanged) ---
     def overlay_transparent(self, background, overlay, x, y):
@@ -114,52 +172,112 @@ class PhysioARApp:
         cv2.putText(menu_frame, "Select Exercise:", (width//2 - 100, 130),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
 
-        y_pos = 180
-        for i, exercise in enumerate(self.exercises.keys()):
+        names = list(self.exercises.keys())
+        pages = max(1, -(-len(names) // self.menu_page_size))
+        first = self.menu_page * self.menu_page_size
+        y_pos = 170
+        for i, exercise in enumerate(names[first:first + self.menu_page_size]):
             cv2.putText(menu_frame, f"{i+1}. {exercise}",
                         (width//2 - 150, y_pos), cv2.FONT_HERSHEY_SIMPLEX,
                         0.7, (255, 255, 255), 2)
-            y_pos += 40
+            y_pos += 30
+        if pages > 1:
+            cv2.putText(menu_frame, f"Page {self.menu_page + 1}/{pages}", (width//2 - 150, y_pos),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+
+        if self.suggested_exercise:
+            cv2.putText(menu_frame, f"Looks like: {self.suggested_exercise} (Enter to start)",
+                        (width//2 - 150, height - 200), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
 
         controls = ["ESC: Exit", "H: Toggle skeleton", "V: Toggle voice", "S: Toggle sidebar", "M: Return to menu"]
-        y_pos = height - 180
+        if pages > 1:
+            controls.append("N/P: Next/previous page")
+        y_pos = height - 170
         for control in controls:
             cv2.putText(menu_frame, control, (width//2 - 150, y_pos),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1)
-            y_pos += 30
+            y_pos += 26
 
         return menu_frame
 
+    def refresh_library(self):
+        """Pick up a reloaded exercise library; the exercise in progress keeps its scorers."""
+        self.exercises = self.library.exercises
+        self.recognizer = ExerciseRecognizer(ExerciseIndex(self.exercises))
+        self.suggested_exercise = None
+        self.menu_page = min(self.menu_page, (len(self.exercises) - 1) // self.menu_page_size)
+        self.speech.prerender([self.start_phrase(name) for name in self.exercises])
+        print(f"Exercise library reloaded: {len(self.exercises)} exercises")
+
+    def recognize_exercise(self, frame):
+        """Run pose detection in the menu and update the suggested exercise; returns the pose landmarks."""
+        if self.engine.pipeline is None:
+            self.engine.set_pipeline(self.pipelines.get(self.pipeline_kind))
+        results = self.engine.process(frame)
+        landmarks = results.pose_landmarks if results else None
+        self.suggested_exercise, _ = self.recognizer.update(landmarks)
+        if self.auto_select and self.suggested_exercise:
+            print(f"Recognised exercise: {self.suggested_exercise}")
+            self.load_exercise(self.suggested_exercise)
+        return landmarks
+
     def load_exercise(self, exercise_name):
         if exercise_name in self.exercises:
             self.current_exercise = exercise_name
-            self.reference_landmarks = self.exercises[exercise_name]["reference_pose"]
+            self.phase_tracker = PhaseTracker.from_compiled(self.library.compiled[exercise_name])
+            self.reference_landmarks = self.phase_tracker.keyframe["pose"]
+            self.alignment_scorer = VariationScorer.from_exercise(self.exercises[exercise_name],
+                                                                  self.reference_landmarks)
+            self.trajectory_scorer = TrajectoryScorer.from_exercise(self.exercises[exercise_name])
+            self.rep_feedback = None
+            self.pipeline_kind = pipeline_kind(self.exercises[exercise_name].get("required_landmarks"))
+            # Build now rather than on the first exercise frame
+            self.engine.set_pipeline(self.pipelines.get(self.pipeline_kind))
             self.menu_active = False
             self.current_step = 0
-            self.speak(f"Starting {exercise_name}. Get ready.")
+            self.speak(self.start_phrase(exercise_name), priority=PRIORITY_HIGH)
             self.load_pose_demo_images(exercise_name)
             self.alignment_scores_history = []  # Reset score history
+            self.apply_exercise_rules(exercise_name)
+            self.engine.reset_tracking()
+            self.recognizer.reset()
+            self.suggested_exercise = None
             return True
         return False
 
+    def apply_exercise_rules(self, exercise_name):
+        """Feedback tables and hold/rep rules compiled for this exercise when the library loaded."""
+        compiled = self.library.compiled[exercise_name]
+        self.feedback_rules = compiled.feedback
+        # Angles and segments measured once per frame and shared by feedback and the sidebar
+        self.feature_layer = FeatureLayer(compiled.features)
+        # Range of motion, speed and hold stability per rep, from the same angles
+        self.rep_kinematics = RepKinematics(compiled.features.angle_names)
+        self.hold_machine = HoldRepMachine.from_thresholds(compiled.thresholds)
+        self.alignment_threshold = self.hold_machine.threshold
+        self.last_instructions.clear()
+        self.speech.prerender([REP_PHRASE.format(reps=n, total=self.hold_machine.reps_required)
+                               for n in range(1, self.hold_machine.reps_required)])
+
+    def start_phrase(self, exercise_name):
+        return f"Starting {exercise_name}. Get ready."
+
     def process_frame(self, frame):
-        # Create a copy to avoid modifying the original frame
-        image_rgb = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe Holistic - add try/except to handle potential errors
-        try:
-            results = self.holistic.process(image_rgb)
-        except Exception as e:
-            print(f"Error processing frame: {e}")
-            results = None
-            
-        image = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        if self.engine.pipeline is None:
+            self.engine.set_pipeline(self.pipelines.get(self.pipeline_kind))
+        # Inferred on keyframes, propagated in between; always in full-frame coordinates
+        results = self.engine.process(frame)
+        # Annotations are drawn directly on `frame` (the video area of the preallocated canvas)
+        image = frame
 
         # Overlay the repeating demo image animation (if any) in the top left corner.
         if self.pose_demo_images:
-            elapsed = time.time() % self.demo_cycle_period
-            frame_index = int((elapsed / self.demo_cycle_period) * len(self.pose_demo_images))
-            frame_index = min(frame_index, len(self.pose_demo_images) - 1)
+            if self.demo_follows_phase:
+                frame_index = self.current_step
+            else:
+                elapsed = time.time() % self.demo_cycle_period
+                frame_index = int((elapsed / self.demo_cycle_period) * len(self.pose_demo_images))
+                frame_index = min(frame_index, len(self.pose_demo_images) - 1)
             demo_overlay = self.pose_demo_images[frame_index]
             image = self.overlay_image_top_left(image, demo_overlay)
 
@@ -168,8 +286,21 @@ class PhysioARApp:
             # Debug visualization - draw a green box to indicate pose is detected
             cv2.rectangle(image, (10, 10), (30, 30), (0, 255, 0), -1)
             
+            # Keep suggesting in case the patient has moved on to another exercise
+            self.suggested_exercise, _ = self.recognizer.update(results.pose_landmarks)
+
+            # Follow the patient to the nearest neighbouring keyframe and score against it
+            phase = self.phase_tracker.update(results.pose_landmarks)
+            if phase != self.current_step:
+                self.current_step = phase
+                self.hold_machine.restart_hold()
+                self.reference_landmarks = self.phase_tracker.keyframe["pose"]
+                self.alignment_scorer.set_reference(self.reference_landmarks)
+                self.alignment_scores_history = []  # Don't blend scores against different keyframes
+
             # Extract landmarks and calculate alignment
-            alignment_score, misaligned_joints = self.calculate_alignment(results.pose_landmarks)
+            features = self.feature_layer.update(results.pose_landmarks, image.shape)
+            alignment_score, _ = self.calculate_alignment(results.pose_landmarks)
             
             # Apply smoothing to alignment score
             self.alignment_scores_history.append(alignment_score)
@@ -183,7 +314,17 @@ class PhysioARApp:
                 self.smoothed_score = 0
             
             # Process feedback based on alignment
-            self.process_feedback(self.smoothed_score, misaligned_joints)
+            self.process_feedback(self.smoothed_score, self.alignment_scorer.misaligned, features)
+
+            if self.trajectory_scorer:
+                _, rep_feedback = self.trajectory_scorer.score(results.pose_landmarks, timestamp=self.frame_timestamp)
+                if rep_feedback["rep"]:
+                    self.rep_feedback = rep_feedback
+                    print(f"Repetition {rep_feedback['reps']}: {rep_feedback['rep_score']}% "
+                          f"(tempo x{rep_feedback['tempo']})")
+                if self.rep_feedback:
+                    cv2.putText(image, f"Reps: {self.rep_feedback['reps']}  Last rep: {self.rep_feedback['rep_score']:.0f}%",
+                                (30, image.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
             
             # Display the accuracy score with high visibility
 
@@ -238,135 +379,12 @@ class PhysioARApp:
             
             # Show detailed sidebar if enabled
             if self.show_sidebar:
-                image = self.add_sidebar(image, self.smoothed_score, misaligned_joints)
+                image = self.add_sidebar(image, self.smoothed_score, self.alignment_scorer.misaligned)
         
         return image, results.pose_landmarks if results else None
 
     def calculate_alignment(self, detected_landmarks):
-        if not self.reference_landmarks:
-            return 0, {}
-        
-        misaligned_joints = {}
-        total_distance = 0
-        total_weight = 0
-        
-        # Ensure we have valid landmarks before processing
-        if not detected_landmarks or not detected_landmarks.landmark:
-            print("Warning: No valid landmarks detected")
-            return 0, {}
-            
-        # Extract current landmarks with error handling
-        try:
-            current_landmarks = {i: [lm.x, lm.y, lm.z] for i, lm in enumerate(detected_landmarks.landmark)}
-        except Exception as e:
-            print(f"Error extracting landmarks: {e}")
-            return 0, {}
-        
-        # Body part indices for different sensitivity levels
-        # Legs (higher sensitivity) - most important for straight leg raises
-        leg_indices = [23, 24, 25, 26, 27, 28, 29, 30, 31, 32]
-        # Torso (medium sensitivity)
-        torso_indices = [11, 12, 13, 14, 23, 24]
-        # Arms (normal sensitivity)
-        arm_indices = [15, 16, 17, 18, 19, 20, 21, 22]
-        
-        # Specific key joints for straight leg raises (based on user-provided coordinates)
-        key_straight_leg_joints = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
-        
-        # Slightly decreased weights for an easier challenge
-        self.leg_sensitivity = 4.5      # Decreased for easier leg movement matching
-        self.torso_sensitivity = 4.0    # Decreased for more forgiving torso stability
-        self.arm_sensitivity = 3.5      # Decreased for easier arm positioning
-        
-        # Calculate the position differences with appropriate weighting
-        for idx, ref_pos in self.reference_landmarks.items():
-            if idx in current_landmarks:
-                cur = current_landmarks[idx]
-                
-                # Full 3D Euclidean distance calculation (using all x, y, z coordinates)
-                # Note: Z-coordinate is depth from camera (important for 3D accuracy)
-                dist_3d = np.sqrt((ref_pos[0] - cur[0])**2 + 
-                                  (ref_pos[1] - cur[1])**2 + 
-                                  (ref_pos[2] - cur[2])**2 * 0.7)  # Z-coordinate weighted at 70%
-                
-                # Also calculate 2D distance for directional feedback
-                dist_2d = np.sqrt((ref_pos[0] - cur[0])**2 + (ref_pos[1] - cur[1])**2)
-                
-                # Use the 3D distance for accuracy calculation
-                dist = dist_3d * 0.35  # Make matching slightly easier (65% more forgiving)
-                
-                # Apply appropriate weights based on body part with stricter thresholds
-                if idx in leg_indices:
-                    weight = self.leg_sensitivity * 1.5  # Increased weight for legs
-                    # Give extra importance to the raised leg (left leg in our reference)
-                    if idx in [25, 27]:  # Left knee and ankle (raised leg)
-                        weight *= 1.5  # 50% more importance for key raised leg joints
-                elif idx in torso_indices:
-                    weight = self.torso_sensitivity * 1.3  # Increased weight for torso
-                elif idx in arm_indices:
-                    weight = self.arm_sensitivity * 1.2  # Increased weight for arms
-                else:
-                    weight = 1.2
-                
-                # Give extra importance to all key joints for straight leg raises
-                if idx in key_straight_leg_joints:
-                    weight *= 1.35  # 35% boost for all key joints
-                
-                total_distance += weight * dist
-                total_weight += weight
-                
-                # Track misalignments for feedback (using appropriate threshold)
-                # More specific feedback for straight leg raises
-                if dist_2d > 0.06:  # Slightly more forgiving threshold
-                    # Map joint indices to human-readable names
-                    joint_names = {
-                        11: "Left Shoulder", 12: "Right Shoulder",
-                        13: "Left Elbow", 14: "Right Elbow",
-                        15: "Left Wrist", 16: "Right Wrist",
-                        23: "Left Hip", 24: "Right Hip",
-                        25: "Left Knee", 26: "Right Knee",
-                        27: "Left Ankle", 28: "Right Ankle"
-                    }
-                    
-                    joint_name = joint_names.get(idx, f"Joint {idx}")
-                    
-                    # Enhanced 3D directional feedback
-                    if abs(ref_pos[2] - cur[2]) > 0.1:  # Significant depth difference
-                        if ref_pos[2] < cur[2]:
-                            direction = "forward"
-                        else:
-                            direction = "backward"
-                    elif ref_pos[1] < cur[1]:
-                        direction = "higher"
-                    elif ref_pos[1] > cur[1]:
-                        direction = "lower"
-                    elif ref_pos[0] < cur[0]:
-                        direction = "more to your right"
-                    else:
-                        direction = "more to your left"
-                    
-                    misaligned_joints[joint_name] = direction
-        
-        if total_weight == 0:
-            print("Warning: No matching landmarks found between reference and current pose")
-            return 40, {}  # Return a baseline score of 40% instead of 0
-            
-        avg_distance = total_distance / total_weight
-        
-        # Convert to a similarity percentage (inversely related to distance)
-        # Using a stricter scale factor for more challenge
-        similarity = max(0, min(100, 100 * (1 - avg_distance * 2.3)))  # More forgiving scale
-        
-        # No baseline minimum score - make users work from 0%
-        similarity = max(similarity, 0)
-        
-        # Cap at 100% without any boost
-        similarity = min(similarity, 100)
-        
-        # Print debug info
-        print(f"3D Alignment score: {similarity:.2f}%, Avg distance: {avg_distance:.4f}, Misaligned joints: {len(misaligned_joints)}")
-        
-        return similarity, misaligned_joints
+        return self.alignment_scorer.score(detected_landmarks)
 
     def draw_side_progress_bar(self, image, accuracy):
         """Draw an enhanced vertical progress bar showing real-time 3D accuracy %."""
@@ -415,16 +433,6 @@ class PhysioARApp:
                      (bar_x + bar_width, bar_y + bar_height), 
                      color, -1)
                      
-        # Check if accuracy is above 70% and trigger celebration if not already triggered
-        if accuracy > 70 and not self.celebration_triggered:
-            self.celebration.start_celebration()
-            self.celebration_triggered = True
-            self.speak("Great job! You've completed the exercise successfully.")
-            print("Exercise completed successfully! Press 1 to play again or 2 to exit.")
-        # Reset celebration trigger if accuracy drops below 65% (with a buffer)
-        elif accuracy < 65 and self.celebration_triggered:
-            self.celebration_triggered = False
-        
         # Highlight edge for 3D effect
         highlight_color = (min(color[0] + 50, 255), min(color[1] + 50, 255), min(color[2] + 50, 255))
         cv2.rectangle(image, 
@@ -469,58 +477,52 @@ class PhysioARApp:
                    
         return image
 
-    def process_feedback(self, alignment_score, misaligned_joints):
+    def process_feedback(self, alignment_score, misaligned, features=None):
         current_time = time.time()
-        if alignment_score >= self.alignment_threshold:
-            if self.aligned_duration == 0:
-                self.aligned_duration = current_time
-                self.speak("Good position, hold it.")
-            elif (current_time - self.aligned_duration) >= self.time_required:
-                self.current_step += 1
-                self.aligned_duration = 0
-                self.speak("Perfect! Moving to next position.")
-        else:
-            self.aligned_duration = 0
-            if (current_time - self.last_voice_time) > self.instruction_cooldown and misaligned_joints:
-                priority_joints = [
-                    "left tibiofemoral joint (knee)", "right tibiofemoral joint",
-                    "left sacroiliac joint (hip)", "right sacroiliac joint",
-                    "left acromioclavicular joint (shoulder)", "right acromioclavicular joint",
-                    # Added more specific joint names for better feedback
-                    "Joint 23", "Joint 24", "Joint 25", "Joint 26", "Joint 27", "Joint 28",
-                    "Joint 29", "Joint 30", "Joint 31", "Joint 32"
-                ]
-                for joint in priority_joints:
-                    if joint in misaligned_joints:
-                        if "Joint" in joint:
-                            # For numerical joints, provide more descriptive feedback
-                            if joint in ["Joint 23", "Joint 24"]:
-                                simple_name = "hip"
-                            elif joint in ["Joint 25", "Joint 26"]:
-                                simple_name = "knee"
-                            elif joint in ["Joint 27", "Joint 28"]:
-                                simple_name = "ankle"
-                            elif joint in ["Joint 29", "Joint 30", "Joint 31", "Joint 32"]:
-                                simple_name = "foot"
-                            else:
-                                simple_name = "body position"
-                        else:
-                            simple_name = joint.split('(')[-1].replace(')', '')  # e.g., "knee"
-                            
-                        instruction = f"Move your {simple_name} {misaligned_joints[joint]}"
-                        instruction_key = f"{joint}_{misaligned_joints[joint]}"
-                        if instruction_key not in self.last_instructions:
-                            self.speak(instruction)
-                            self.last_instructions.add(instruction_key)
-                            self.last_instructions = set(list(self.last_instructions)[-5:])
-                            break
-
-    def add_sidebar(self, image, accuracy, misaligned_joints):
+        # Only holds of the final position count as repetitions
+        final_step = self.current_step == len(self.phase_tracker) - 1
+        events = self.hold_machine.update(alignment_score, current_time, counts=final_step)
+        if features is not None:
+            self.rep_kinematics.update(features.angles, current_time, self.hold_machine.holding)
+        for event in events:
+            if event == HOLD_START:
+                self.speak(HOLD_PHRASE, channel="feedback")
+            elif event == HOLD_COMPLETE and not final_step:
+                # The step itself follows the detected keyframe; this only prompts the next one
+                self.speak(NEXT_POSITION_PHRASE, channel="feedback")
+            elif event == REP:
+                self.record_rep(current_time, alignment_score)
+                if self.hold_machine.reps < self.hold_machine.reps_required:
+                    self.speak(REP_PHRASE.format(reps=self.hold_machine.reps, total=self.hold_machine.reps_required),
+                               channel="feedback")
+            elif event == SET_COMPLETE and not self.celebration_triggered:
+                self.celebration.start_celebration()
+                self.celebration_triggered = True
+                self.speak(COMPLETED_PHRASE, priority=PRIORITY_HIGH, channel="feedback")
+                print("Exercise completed successfully! Press 1 to play again or 2 to exit.")
+
+        if (current_time - self.last_voice_time) > self.instruction_cooldown:
+            # Angle limits apply even in position; joint corrections only when out of it
+            instruction = self.feedback_rules.limit_correction(features, self.last_instructions)
+            if instruction is None and alignment_score < self.alignment_threshold and misaligned:
+                instruction = self.feedback_rules.next_correction(misaligned, self.last_instructions)
+            if instruction:
+                # Corrections go stale quickly; a newer one replaces any still waiting
+                self.speak(instruction, priority=PRIORITY_LOW, channel="feedback", max_age=2.0)
+
+    def record_rep(self, timestamp, score):
+        record = self.rep_kinematics.finish_rep(timestamp, exercise=self.current_exercise, score=round(score, 1))
+        self.rep_records.append(record)
+        self.pending_rep_record = record
+        print(f"Rep {record['rep']}: {record}")
+
+    def add_sidebar(self, image, accuracy, misaligned):
         """Add a detailed sidebar with exercise information and feedback."""
         height, width, _ = image.shape
         
-        # Create sidebar background
-        sidebar = np.zeros((height, self.sidebar_width, 3), dtype=np.uint8)
+        # The sidebar is a view into the same canvas as the video area
+        combined = self.frame_buffers.compose(image, self.sidebar_width)
+        sidebar = self.frame_buffers.sidebar
         sidebar[:, :] = (30, 30, 30)  # Dark gray background
         
         # Add exercise name
@@ -537,8 +539,14 @@ class PhysioARApp:
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
         
         # Add step counter
-        cv2.putText(sidebar, f"Step: {self.current_step + 1}", (10, 140), 
+        cv2.putText(sidebar, f"Step: {self.current_step + 1}/{len(self.phase_tracker)}   "
+                             f"Reps: {self.hold_machine.reps}/{self.hold_machine.reps_required}", (10, 140), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1)
+        cv2.putText(sidebar, self.phase_tracker.keyframe["name"][:28], (10, 162),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
+        if self.alignment_scorer.variation:
+            cv2.putText(sidebar, self.alignment_scorer.variation.replace("_", " ")[:28], (10, 180),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
         
         # Show misaligned joints feedback
         y_pos = 190
@@ -549,37 +557,25 @@ class PhysioARApp:
         if accuracy >= 90:
             cv2.putText(sidebar, "Perfect position!", (10, y_pos), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 1)
-        elif misaligned_joints:
+        elif misaligned:
             max_joints = 3  # Limit the number of feedback items
-            count = 0
-            for joint, direction in misaligned_joints.items():
-                if count >= max_joints:
-                    break
-                    
-                # Convert joint number to readable name
-                if "Joint" in joint:
-                    if joint in ["Joint 23", "Joint 24"]:
-                        joint_name = "Hip"
-                    elif joint in ["Joint 25", "Joint 26"]:
-                        joint_name = "Knee"
-                    elif joint in ["Joint 27", "Joint 28"]:
-                        joint_name = "Ankle"
-                    elif joint in ["Joint 29", "Joint 30", "Joint 31", "Joint 32"]:
-                        joint_name = "Foot"
-                    else:
-                        joint_name = joint
-                else:
-                    joint_name = joint.split('(')[-1].replace(')', '').title()
-                
-                feedback = f"• {joint_name}: Move {direction}"
-                cv2.putText(sidebar, feedback, (10, y_pos), 
+            # Most important corrections first, text precompiled per joint and direction
+            for idx, direction in self.feedback_rules.ordered(misaligned)[:max_joints]:
+                cv2.putText(sidebar, self.feedback_rules.labels[idx][direction], (10, y_pos),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 200, 100), 1)
                 y_pos += 25
-                count += 1
         else:
             cv2.putText(sidebar, "Move to match pose", (10, y_pos), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 200, 100), 1)
         
+        # Angles measured this frame (the same features the feedback checks)
+        features = self.feature_layer.current
+        if features is not None:
+            names = features.feature_set.angle_names[:2]
+            text = "  ".join(f"{name.replace('_', ' ')} {features.angles[i]:.0f}" for i, name in enumerate(names)
+                             if not np.isnan(features.angles[i]))
+            cv2.putText(sidebar, text, (10, 318), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (180, 180, 180), 1)
+
         # Add mini progress bar in sidebar
         y_pos = 340
         cv2.putText(sidebar, "Progress:", (10, y_pos), 
@@ -591,28 +587,51 @@ class PhysioARApp:
         fill_width = int((accuracy / 100.0) * progress_width)
         cv2.rectangle(sidebar, (10, y_pos), (10 + fill_width, y_pos + 15), color, -1)
         
+        # Suggest switching when the pose looks like another exercise
+        if self.suggested_exercise and self.suggested_exercise != self.current_exercise:
+            cv2.putText(sidebar, f"Looks like: {self.suggested_exercise}"[:30], (10, height - 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+
         # Add timestamp
         time_str = time.strftime("%H:%M:%S", time.localtime())
         cv2.putText(sidebar, time_str, (10, height - 20), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (150, 150, 150), 1)
         
-        # Combine sidebar with main image
-        combined = np.hstack((sidebar, image))
         return combined
 
-    def speak(self, text):
+    def draw_standby(self, image):
+        """Dimmed frame shown while the idle monitor is only sensing motion."""
+        cv2.convertScaleAbs(image, dst=image, alpha=0.4)
+        height, width, _ = image.shape
+        cv2.putText(image, "Standby - step into view to continue", (width//2 - 260, height//2),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2)
+        return image
+
+    def speak(self, text, priority=PRIORITY_NORMAL, channel=None, max_age=None):
         if self.silent_mode:
             return
         self.last_voice_time = time.time()
-        def speak_thread():
-            with self.voice_lock:
-                self.voice_engine.say(text)
-                self.voice_engine.runAndWait()
-        threading.Thread(target=speak_thread).start()
+        self.speech.say(text, priority=priority, max_age=max_age, channel=channel)
+
+    def headless_key(self):
+        """Stand-in for a key press when there is no window: replay after a celebration."""
+        celebration = self.celebration
+        if (celebration.is_celebrating and celebration.video_paused and
+                time.time() - celebration.celebration_start_time >
+                celebration.celebration_duration + self.headless_replay_delay):
+            return ord('1')
+        return 0xFF
 
     def run(self):
-        self.speak("Welcome to AR Physiotherapy. Press a number key to select an exercise.")
+        self.speak(WELCOME_PHRASE, priority=PRIORITY_HIGH)
+        if self.stream_server:
+            self.stream_server.start()
+        if self.headless:
+            self.load_exercise(self.current_exercise)
+        if self.recorder:
+            self.recorder.start()
         while True:
+            loop_start = time.time()
             try:
                 # Check if we should restart the program
                 if self.should_restart:
@@ -620,27 +639,53 @@ class PhysioARApp:
                     self.celebration.is_celebrating = False
                     self.celebration.video_paused = False
                     self.celebration_triggered = False
-                    self.menu_active = True
-                    self.speak("Welcome back to AR Physiotherapy. Press a number key to select an exercise.")
+                    self.menu_active = not self.headless
+                    self.speak(WELCOME_BACK_PHRASE, priority=PRIORITY_HIGH)
                     continue
+
+                # New or edited exercise files are swapped in between frames
+                if self.library.poll():
+                    self.refresh_library()
                     
                 # Only grab a new frame if video is not paused
                 if not (self.celebration.is_celebrating and self.celebration.video_paused):
-                    ret, frame = self.cap.read()
+                    ret, captured, self.frame_timestamp = self.source.read()
                     if not ret:
                         print("Failed to grab frame")
                         break
-                    frame = cv2.flip(frame, 1)
-                    frame = cv2.resize(frame, (960, 540))
+                    self.frame_buffers.capture = captured
+                # Resize and mirror into the canvas; while paused this redraws the held frame
+                frame = self.frame_buffers.prepare(self.frame_buffers.capture)
                     
                 # Process the frame
+                paused = self.celebration.is_celebrating and self.celebration.video_paused
+                landmarks = None
                 if self.menu_active:
-                    display_frame = self.display_menu(frame)
+                    # The menu stays on screen while idle, but Holistic only runs again on motion
+                    if not self.idle_monitor.idle or self.idle_monitor.motion_detected(frame):
+                        self.idle_monitor.update(self.recognize_exercise(frame) is not None)
+                    display_frame = self.display_menu(frame) if self.menu_active else frame
+                elif self.idle_monitor.idle and not paused and not self.idle_monitor.motion_detected(frame):
+                    # Nobody around: skip inference and only poll for motion
+                    display_frame = self.draw_standby(frame)
                 else:
                     # If celebration is active and video is paused, we keep using the same frame
-                    display_frame = self.process_frame(frame)[0]
+                    display_frame, landmarks = self.process_frame(frame)
+                    if not paused:
+                        self.idle_monitor.update(landmarks is not None)
                 
-                cv2.imshow('AR Physiotherapy', display_frame)
+                if self.stream:
+                    self.stream.publish(display_frame)
+                if self.recorder and not paused:
+                    extra = {'exercise': self.current_exercise} if not self.menu_active else None
+                    if extra and self.pending_rep_record:
+                        extra['rep_record'] = self.pending_rep_record
+                    if (self.recorder.record(display_frame, self.frame_timestamp, landmarks,
+                                             self.smoothed_score if landmarks is not None else None, extra)
+                            and extra and 'rep_record' in extra):
+                        self.pending_rep_record = None
+                if not self.headless:
+                    cv2.imshow('AR Physiotherapy', display_frame)
             except KeyboardInterrupt:
                 print("Program interrupted by user")
                 break
@@ -649,7 +694,14 @@ class PhysioARApp:
                 continue
                 
             # Process key presses with improved handling
-            key = cv2.waitKey(1) & 0xFF
+            # Pace the loop at display_fps independently of how often the model runs
+            frame_period = self.idle_monitor.poll_interval if self.idle_monitor.idle else 1.0 / self.display_fps
+            remaining_ms = int((frame_period - (time.time() - loop_start)) * 1000)
+            if self.headless:
+                time.sleep(max(0, remaining_ms) / 1000.0)
+                key = self.headless_key()
+            else:
+                key = cv2.waitKey(max(1, remaining_ms)) & 0xFF
             
             # Check if celebration is active for handling special keys
             if self.celebration.is_celebrating and self.celebration.video_paused:
@@ -680,8 +732,10 @@ class PhysioARApp:
                 elif key == ord('v'): 
                     self.silent_mode = not self.silent_mode
                     print(f"Voice feedback: {'OFF' if self.silent_mode else 'ON'}")
-                    if not self.silent_mode:
-                        self.speak("Voice feedback enabled")
+                    if self.silent_mode:
+                        self.speech.clear()
+                    else:
+                        self.speak(VOICE_ENABLED_PHRASE, priority=PRIORITY_HIGH)
                         
                 # Toggle sidebar
                 elif key == ord('s'): 
@@ -692,18 +746,51 @@ class PhysioARApp:
                 elif key == ord('m'):
                     self.menu_active = True
                     print("Returned to main menu")
-                    self.speak("Returned to main menu")
+                    self.speak(MENU_PHRASE, priority=PRIORITY_HIGH, channel="feedback")
                     
-                # Exercise selection via number keys (1-9)
+                # Page through the library
+                elif key in (ord('n'), ord('p')) and self.menu_active:
+                    pages = max(1, -(-len(self.exercises) // self.menu_page_size))
+                    self.menu_page = (self.menu_page + (1 if key == ord('n') else -1)) % pages
+
+                # Start the recognised exercise
+                elif key in (13, 10) and self.menu_active and self.suggested_exercise:
+                    print(f"Selected exercise: {self.suggested_exercise}")
+                    self.load_exercise(self.suggested_exercise)
+
+                # Exercise selection via number keys on the current page
                 elif ord('1') <= key <= ord('9') and self.menu_active:  # Only process number keys when menu is active
-                    exercise_idx = key - ord('1')
-                    if exercise_idx < len(self.exercises):
+                    exercise_idx = self.menu_page * self.menu_page_size + key - ord('1')
+                    if key - ord('1') < self.menu_page_size and exercise_idx < len(self.exercises):
                         exercise_name = list(self.exercises.keys())[exercise_idx]
                         print(f"Selected exercise: {exercise_name}")
                         self.load_exercise(exercise_name)
-        self.cap.release()
-        cv2.destroyAllWindows()
+        print(f"Camera activity: {self.idle_monitor.metrics()}")
+        if self.stream_server:
+            print(f"Preview stream: {self.stream.metrics()}")
+            self.stream_server.stop()
+        if self.recorder:
+            self.recorder.stop()
+            print(f"Recording: {self.recorder.metrics()}")
+        self.source.release()
+        self.speech.stop()
+        self.pipelines.close()
+        if not self.headless:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    app = PhysioARApp()
+    parser = argparse.ArgumentParser(description="AR physiotherapy coach")
+    parser.add_argument("source", nargs="?", help='camera index, video file, image directory/pattern or "synthetic"')
+    parser.add_argument("--headless", action="store_true", help="no local window")
+    parser.add_argument("--stream-port", type=int, help="serve an MJPEG preview on this port")
+    parser.add_argument("--stream-quality", type=int, default=70, help="JPEG quality of the preview (1-100)")
+    parser.add_argument("--stream-width", type=int, help="preview width; height keeps the aspect ratio")
+    parser.add_argument("--record", metavar="DIR", help="record annotated sessions into this directory")
+    parser.add_argument("--auto-select", action="store_true", help="start the exercise recognised from the pose")
+    args = parser.parse_args()
+
+    app = PhysioARApp(source=open_source(args.source, size=(960, 540)) if args.source else None,
+                      headless=args.headless, stream_port=args.stream_port,
+                      stream_quality=args.stream_quality, stream_width=args.stream_width,
+                      record_dir=args.record, auto_select=args.auto_select)
     app.run()
\ No newline at end of file
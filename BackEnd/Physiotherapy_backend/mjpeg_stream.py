@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "frame"
+
+class MjpegBroadcaster:
+    """Encodes each published frame once and hands the same JPEG to every viewer.
+
+    Viewers only ever get the newest frame: a slow client simply skips the
+    frames it missed (counted as dropped), so it never holds up the
+    pipeline or the other viewers. Nothing is encoded while nobody is
+    watching, and encoding is capped at `max_fps`.
+    """
+
+    def __init__(self, quality=70, width=None, max_fps=15):
+        self.quality = quality
+        self.width = width        # Stream width (height keeps the aspect ratio), None for the frame's own size
+        self.max_fps = max_fps
+        self.condition = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.viewers = {}         # id -> per-viewer stats
+        self.next_viewer = 0
+        self.resized = None
+        self.last_encode = 0.0
+        self.closed = False
+        self.stats = {'published': 0, 'encoded': 0, 'skipped': 0, 'bytes': 0}
+
+    def publish(self, frame):
+        """Offer a frame; returns True if it was encoded for the viewers."""
+        self.stats['published'] += 1
+        now = time.time()
+        if not self.viewers or (self.max_fps and now - self.last_encode < 1.0 / self.max_fps):
+            self.stats['skipped'] += 1
+            return False
+        h, w = frame.shape[:2]
+        if self.width and self.width != w:
+            size = (self.width, max(1, h * self.width // w))
+            self.resized = cv2.resize(frame, size, dst=self.resized, interpolation=cv2.INTER_AREA)
+            frame = self.resized
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return False
+        data = encoded.tobytes()
+        self.last_encode = now
+        self.stats['encoded'] += 1
+        self.stats['bytes'] += len(data)
+        with self.condition:
+            self.jpeg = data
+            self.seq += 1
+            self.condition.notify_all()
+        return True
+
+    def add_viewer(self, name=""):
+        with self.condition:
+            self.next_viewer += 1
+            viewer_id = self.next_viewer
+            self.viewers[viewer_id] = {'name': name, 'since': time.time(), 'sent': 0, 'dropped': 0}
+        return viewer_id
+
+    def remove_viewer(self, viewer_id):
+        with self.condition:
+            self.viewers.pop(viewer_id, None)
+
+    def wait_frame(self, last_seq, timeout=1.0):
+        """(seq, jpeg) newer than `last_seq`, or (last_seq, None) on timeout/close."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq != last_seq or self.closed, timeout):
+                return last_seq, None
+            if self.closed:
+                return last_seq, None
+            return self.seq, self.jpeg
+
+    def frames(self, name=""):
+        """Generator of JPEG bytes for one viewer, newest frame only."""
+        viewer_id = self.add_viewer(name)
+        stats = self.viewers[viewer_id]
+        last_seq = 0
+        try:
+            while not self.closed:
+                seq, jpeg = self.wait_frame(last_seq)
+                if jpeg is None:
+                    continue
+                if last_seq:
+                    stats['dropped'] += seq - last_seq - 1
+                last_seq = seq
+                stats['sent'] += 1
+                yield jpeg
+        finally:
+            self.remove_viewer(viewer_id)
+
+    def snapshot(self, timeout=2.0):
+        """One fresh JPEG (None if no frame arrived within `timeout`)."""
+        viewer_id = self.add_viewer("snapshot")
+        try:
+            return self.wait_frame(self.seq, timeout)[1]
+        finally:
+            self.remove_viewer(viewer_id)
+
+    def metrics(self):
+        with self.condition:
+            viewers = [dict(v, since=round(time.time() - v['since'], 1)) for v in self.viewers.values()]
+        return dict(self.stats, viewers=viewers, quality=self.quality, width=self.width, max_fps=self.max_fps)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class MjpegRequestHandler(BaseHTTPRequestHandler):
+    """/stream.mjpg (multipart stream), /snapshot.jpg and /stats."""
+
+    broadcaster = None
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path in ('/', '/stream.mjpg'):
+            self.send_stream()
+        elif path == '/snapshot.jpg':
+            jpeg = self.broadcaster.snapshot()
+            if jpeg is None:
+                self.send_error(503, "No frame available")
+                return
+            self.send_bytes(jpeg, 'image/jpeg')
+        elif path == '/stats':
+            self.send_bytes(json.dumps(self.broadcaster.metrics()).encode(), 'application/json')
+        else:
+            self.send_error(404)
+
+    def send_bytes(self, data, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        try:
+            for jpeg in self.broadcaster.frames(name=self.client_address[0]):
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Viewer went away
+
+    def log_message(self, format, *args):
+        pass  # One line per request would flood the console for long-lived streams
+
+
+class MjpegServer:
+    """Serves a broadcaster over HTTP on a background thread."""
+
+    def __init__(self, broadcaster, host="0.0.0.0", port=8081):
+        handler = type('BoundMjpegRequestHandler', (MjpegRequestHandler,), {'broadcaster': broadcaster})
+        self.broadcaster = broadcaster
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mjpeg-server", daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"Streaming preview on http://{host}:{port}/stream.mjpg")
+        return self.thread
+
+    def stop(self):
+        self.broadcaster.close()
+        self.server.shutdown()
+        self.server.server_close()
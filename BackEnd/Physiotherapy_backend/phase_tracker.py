@@ -0,0 +1,116 @@
+import numpy as np
+
+from pose_engine import landmarks_to_dict
+from trajectory_dtw import normalize_poses
+from variations import MIRROR_INDEX
+
+def exercise_keyframes(exercise):
+    """Ordered keyframes of an EXERCISE_LIBRARY entry as [{"name", "pose", "image"}, ...].
+
+    Keyframe poses only list the joints that differ from `reference_pose`;
+    the returned poses are complete. Exercises without "keyframes" get a
+    single keyframe, the reference pose itself.
+    """
+    base = exercise["reference_pose"]
+    keyframes = exercise.get("keyframes") or [{"name": exercise.get("steps", ["Hold the pose"])[0], "pose": {}}]
+    result = []
+    for keyframe in keyframes:
+        pose = dict(base)
+        pose.update({int(i): p for i, p in keyframe.get("pose", {}).items()})
+        result.append({"name": keyframe.get("name", ""), "pose": pose, "image": keyframe.get("image")})
+    return result
+
+
+class PhaseTracker:
+    """Tracks which keyframe (phase) of an exercise the patient is in.
+
+    Keyframes are precomputed as one normalized (N, K, 3) array. Each frame
+    only the current phase and its `neighbours` on either side are compared
+    (one vectorized distance over a small slice); the phase changes when a
+    neighbour is closer by at least `switch_margin`. If even the best
+    neighbour is further than `relocalize_distance`, every keyframe is
+    checked once to recover, e.g. after the patient left the frame. With
+    `mirrored`, each keyframe is also stacked with its left/right mirror and
+    facing-the-other-way copies, and the closest of those counts.
+    """
+
+    def __init__(self, keyframes, joints, weights=None, neighbours=1, switch_margin=0.05, relocalize_distance=0.8,
+                 mirrored=True):
+        self.keyframes = keyframes
+        self.joints = list(joints)
+        self.neighbours = neighbours
+        self.switch_margin = switch_margin
+        self.relocalize_distance = relocalize_distance
+        poses = np.array([[kf["pose"].get(j, [0, 0, 0]) for j in self.joints] for kf in keyframes], dtype=np.float64)
+        poses = normalize_poses(poses, self.joints)
+        weights = np.ones(len(self.joints)) if weights is None else np.asarray(weights, dtype=np.float64)
+        weights = weights / weights.sum()
+        variants, variant_weights = [poses], [weights]
+        if mirrored:
+            position = {j: k for k, j in enumerate(self.joints)}
+            swap = [position.get(MIRROR_INDEX.get(j, j), k) for k, j in enumerate(self.joints)]
+            variants.append(poses[:, swap])
+            variant_weights.append(weights[swap])
+            if 23 in position and 24 in position:
+                # Normalized poses are centred on the hips, so facing the other way just negates x
+                flip = np.array([-1.0, 1.0, 1.0])
+                variants += [variants[0] * flip, variants[1] * flip]
+                variant_weights += variant_weights[:2]
+        self.poses = np.stack(variants, axis=1)          # (N, V, K, 3)
+        self.weights = np.stack(variant_weights)         # (V, K)
+        self.axis_weights = np.array([1.0, 1.0, 0.5])
+        self.stats = {'frames': 0, 'comparisons': 0, 'relocalized': 0}
+        self.reset()
+
+    @classmethod
+    def from_exercise(cls, exercise, **options):
+        joints = exercise.get("target_joints") or sorted(exercise["reference_pose"])
+        key_points = set(exercise.get("key_alignment_points", []))
+        weights = [2.0 if j in key_points else 1.0 for j in joints]
+        return cls(exercise_keyframes(exercise), joints, weights, **options)
+
+    @classmethod
+    def from_compiled(cls, compiled, **options):
+        """Same as from_exercise, reusing what an ExerciseLibrary compiled at load time."""
+        return cls(compiled.keyframes, compiled.joints, compiled.weights, **options)
+
+    def reset(self):
+        self.phase = 0
+        self.distance = None
+
+    def __len__(self):
+        return len(self.keyframes)
+
+    @property
+    def keyframe(self):
+        return self.keyframes[self.phase]
+
+    def distances(self, frame, lo, hi):
+        """Distance to keyframes lo..hi-1, each taking its closest variant."""
+        diff = self.poses[lo:hi] - frame
+        self.stats['comparisons'] += hi - lo
+        per_joint = np.sqrt((diff * diff * self.axis_weights).sum(axis=3))
+        return (per_joint * self.weights).sum(axis=2).min(axis=1)
+
+    def update(self, landmarks):
+        """Phase index for this frame's landmarks (unchanged if the tracked joints aren't all visible)."""
+        current = landmarks_to_dict(landmarks)
+        if len(self.keyframes) == 1 or not all(j in current for j in self.joints):
+            return self.phase
+        self.stats['frames'] += 1
+        frame = normalize_poses(np.array([current[j] for j in self.joints], dtype=np.float64), self.joints)
+
+        lo = max(0, self.phase - self.neighbours)
+        hi = min(len(self.keyframes), self.phase + self.neighbours + 1)
+        d = self.distances(frame, lo, hi)
+        best = int(np.argmin(d))
+        if d[best] > self.relocalize_distance:
+            lo, hi = 0, len(self.keyframes)
+            d = self.distances(frame, lo, hi)
+            best = int(np.argmin(d))
+            self.stats['relocalized'] += 1
+            self.phase = lo + best
+        elif lo + best != self.phase and d[best] + self.switch_margin < d[self.phase - lo]:
+            self.phase = lo + best
+        self.distance = float(d[self.phase - lo])
+        return self.phase
@@ -0,0 +1,18 @@
+# Landmark sets an exercise can ask for in EXERCISE_LIBRARY["..."]["required_landmarks"]
+POSE = "pose"
+HANDS = "hands"
+FACE = "face"
+
+class PipelineResults:
+    """Holistic-shaped results, so callers don't care which pipeline produced them.
+
+    `hand_landmarks` is the first detected hand (hands-only pipeline).
+    """
+
+    def __init__(self, pose_landmarks=None, left_hand_landmarks=None, right_hand_landmarks=None,
+                 face_landmarks=None, hand_landmarks=None):
+        self.pose_landmarks = pose_landmarks
+        self.left_hand_landmarks = left_hand_landmarks
+        self.right_hand_landmarks = right_hand_landmarks
+        self.face_landmarks = face_landmarks
+        self.hand_landmarks = hand_landmarks
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import numpy as np
+
+from frame_buffers import RgbBuffer
+from pipeline_types import PipelineResults
+
+# Every landmark set a PipelineResults can carry
+LANDMARK_SETS = ("pose_landmarks", "left_hand_landmarks", "right_hand_landmarks", "face_landmarks", "hand_landmarks")
+
+def landmarks_to_dict(landmark_list):
+    """{index: [x, y, z]} for a MediaPipe landmark list (empty dict for None)."""
+    if landmark_list is None:
+        return {}
+    return {i: [lm.x, lm.y, lm.z] for i, lm in enumerate(landmark_list.landmark)}
+
+def landmarks_to_array(landmark_list):
+    """(N, 3) float array of x, y, z for a MediaPipe landmark list (None for None)."""
+    if landmark_list is None:
+        return None
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmark_list.landmark], dtype=np.float64)
+
+
+class InferenceService:
+    """One MediaPipe pipeline shared by every consumer of a camera.
+
+    Front-ends that pace themselves call `process(frame)` directly. Headless
+    consumers `subscribe` a callback `(frame, results, timestamp)` and let
+    `run()` (or `start()` for a background thread) drive the source. ROI
+    cropping, keyframe propagation and idle standby are all optional.
+    Results are always in full-frame normalized coordinates.
+    """
+
+    def __init__(self, pipeline=None, source=None, roi_tracker=None, propagator=None,
+                 idle_monitor=None, max_fps=None):
+        self.pipeline = pipeline
+        self.source = source
+        self.roi_tracker = roi_tracker
+        self.propagator = propagator
+        self.idle_monitor = idle_monitor
+        self.max_fps = max_fps
+        self.rgb = RgbBuffer()
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        self.latest = None   # (frame, results, timestamp) of the last processed frame
+        self.running = False
+        self.thread = None
+
+    def set_pipeline(self, pipeline):
+        if pipeline is not self.pipeline:
+            self.pipeline = pipeline
+            self.reset_tracking()
+
+    def reset_tracking(self):
+        if self.roi_tracker:
+            self.roi_tracker.reset()
+        if self.propagator:
+            self.propagator.reset()
+
+    def primary(self, results):
+        return getattr(results, self.pipeline.primary, None) if results else None
+
+    def secondary(self, results):
+        """{attribute name: landmarks} for the detected sets other than the primary one."""
+        if not results:
+            return {}
+        sets = {name: getattr(results, name, None) for name in LANDMARK_SETS if name != self.pipeline.primary}
+        return {name: landmarks for name, landmarks in sets.items() if landmarks is not None}
+
+    def process(self, frame):
+        """Landmarks for one frame: inferred on keyframes, propagated in between."""
+        propagator = self.propagator
+        if propagator:
+            propagator.prepare(frame)
+            if not propagator.should_infer():
+                results = PipelineResults()
+                setattr(results, self.pipeline.primary, propagator.propagate())
+                for name, landmarks in propagator.extra.items():
+                    setattr(results, name, landmarks)
+                if self.roi_tracker:
+                    self.roi_tracker.update(self.primary(results), None, frame.shape)
+                return results
+
+        roi = None
+        model_input = frame
+        if self.roi_tracker:
+            model_input, roi = self.roi_tracker.crop(frame)
+        image_rgb = self.rgb.convert(model_input)
+
+        if propagator:
+            propagator.begin_inference()
+        try:
+            results = self.pipeline.process(image_rgb)
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            results = None
+
+        if self.roi_tracker:
+            if results:
+                # Map every landmark set back to full-frame coordinates exactly once
+                primary = self.primary(results)
+                extra, seen = [], {id(primary)}
+                for name in ("pose_landmarks", "left_hand_landmarks", "right_hand_landmarks", "face_landmarks"):
+                    landmarks = getattr(results, name, None)
+                    if landmarks is not None and id(landmarks) not in seen:
+                        seen.add(id(landmarks))
+                        extra.append(landmarks)
+                self.roi_tracker.update(primary, roi, frame.shape, extra)
+            else:
+                self.roi_tracker.reset()
+        if propagator:
+            propagator.on_inference(self.primary(results), self.secondary(results))
+        return results
+
+    def subscribe(self, callback):
+        with self.subscribers_lock:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.subscribers_lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def publish(self, frame, results, timestamp):
+        self.latest = (frame, results, timestamp)
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(frame, results, timestamp)
+            except Exception as e:
+                print(f"Error in frame subscriber: {e}")
+
+    def run(self):
+        """Read from the source, process and publish until `stop()` is called."""
+        self.running = True
+        while self.running:
+            loop_start = time.time()
+            ok, frame, timestamp = self.source.read()
+            if not ok:
+                time.sleep(0.01)
+                continue
+
+            if self.idle_monitor:
+                if self.idle_monitor.idle:
+                    if not self.idle_monitor.motion_detected(frame):
+                        time.sleep(self.idle_monitor.poll_interval)
+                        continue
+                    self.reset_tracking()
+
+            results = self.process(frame)
+            if self.idle_monitor:
+                self.idle_monitor.update(self.primary(results) is not None)
+            self.publish(frame, results, timestamp)
+
+            if self.max_fps:
+                time.sleep(max(0.0, 1.0 / self.max_fps - (time.time() - loop_start)))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="inference-service", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+            self.thread = None
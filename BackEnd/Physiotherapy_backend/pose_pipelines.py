@@ -0,0 +1,145 @@
+import mediapipe as mp
+
+from pipeline_types import POSE, HANDS, FACE, PipelineResults
+
+def assign_hands(results, hand_results):
+    """Copy a Hands result into `results`, split by handedness."""
+    if not hand_results.multi_hand_landmarks:
+        return results
+    results.hand_landmarks = hand_results.multi_hand_landmarks[0]
+    # Frames are mirrored before processing, so MediaPipe's handedness matches the patient's side
+    for landmarks, handedness in zip(hand_results.multi_hand_landmarks, hand_results.multi_handedness):
+        if handedness.classification[0].label == "Left":
+            results.left_hand_landmarks = landmarks
+        else:
+            results.right_hand_landmarks = landmarks
+    return results
+
+
+class PoseOnlyPipeline:
+    """Body pose only - no face mesh or hand networks."""
+    kind = "pose"
+    primary = "pose_landmarks"  # Landmark set used for ROI tracking and propagation
+
+    def __init__(self, model_complexity=2, min_detection_confidence=0.5, min_tracking_confidence=0.7):
+        self.pose = mp.solutions.pose.Pose(
+            static_image_mode=False,
+            model_complexity=model_complexity,
+            smooth_landmarks=True,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+
+    def process(self, image_rgb):
+        results = self.pose.process(image_rgb)
+        return PipelineResults(pose_landmarks=results.pose_landmarks)
+
+    def close(self):
+        self.pose.close()
+
+
+class PoseHandsPipeline:
+    """Body pose plus both hands, without the face mesh."""
+    kind = "pose_hands"
+    primary = "pose_landmarks"
+
+    def __init__(self, model_complexity=2):
+        self.pose = PoseOnlyPipeline(model_complexity=model_complexity)
+        self.hands = mp.solutions.hands.Hands(
+            static_image_mode=False,
+            max_num_hands=2,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+
+    def process(self, image_rgb):
+        results = self.pose.process(image_rgb)
+        assign_hands(results, self.hands.process(image_rgb))
+        results.hand_landmarks = None  # Pose pipelines track the body, not a single hand
+        return results
+
+    def close(self):
+        self.pose.close()
+        self.hands.close()
+
+
+class HolisticPipeline:
+    """Full Holistic: pose, face mesh and both hands."""
+    kind = "holistic"
+    primary = "pose_landmarks"
+
+    def __init__(self, model_complexity=2):
+        self.holistic = mp.solutions.holistic.Holistic(
+            static_image_mode=False,
+            model_complexity=model_complexity,  # 2 for better accuracy
+            smooth_landmarks=True,
+            enable_segmentation=True,       # Enable segmentation for better body part isolation
+            min_detection_confidence=0.5,   # Slightly lowered for higher sensitivity
+            min_tracking_confidence=0.7     # Kept the same for smooth tracking
+        )
+
+    def process(self, image_rgb):
+        return self.holistic.process(image_rgb)
+
+    def close(self):
+        self.holistic.close()
+
+
+class HandsOnlyPipeline:
+    """Hands only, for hand-driven tracking such as the wrist rep counter."""
+    kind = "hands"
+    primary = "hand_landmarks"
+
+    def __init__(self, max_num_hands=1, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        self.hands = mp.solutions.hands.Hands(
+            static_image_mode=False,
+            max_num_hands=max_num_hands,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+
+    def process(self, image_rgb):
+        return assign_hands(PipelineResults(), self.hands.process(image_rgb))
+
+    def close(self):
+        self.hands.close()
+
+
+PIPELINES = {
+    PoseOnlyPipeline.kind: PoseOnlyPipeline,
+    PoseHandsPipeline.kind: PoseHandsPipeline,
+    HolisticPipeline.kind: HolisticPipeline,
+}
+
+def pipeline_kind(required_landmarks):
+    """Cheapest pipeline that provides every requested landmark set.
+
+    Exercises that don't declare `required_landmarks` get full Holistic.
+    """
+    if required_landmarks is None:
+        return HolisticPipeline.kind
+    required = set(required_landmarks)
+    if FACE in required:
+        return HolisticPipeline.kind
+    if HANDS in required:
+        return PoseHandsPipeline.kind
+    return PoseOnlyPipeline.kind
+
+
+class PipelineCache:
+    """Builds each pipeline kind once and keeps it across exercise switches."""
+
+    def __init__(self, model_complexity=2):
+        self.model_complexity = model_complexity
+        self.pipelines = {}
+
+    def get(self, kind):
+        if kind not in self.pipelines:
+            print(f"Building {kind} pipeline")
+            self.pipelines[kind] = PIPELINES[kind](model_complexity=self.model_complexity)
+        return self.pipelines[kind]
+
+    def close(self):
+        for pipeline in self.pipelines.values():
+            pipeline.close()
+        self.pipelines = {}
@@ -1,22 +1,24 @@
 import cv2
 import mediapipe as mp
-import numpy as np
+import sys
 import time
+from frame_sources import CameraSource, open_source
+from pose_engine import InferenceService
+from pose_pipelines import PoseOnlyPipeline
+from scorers import LegRaiseScorer
 
 class PoseRecorder:
-    def __init__(self):
+    def __init__(self, source=None):
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
+        self.engine = InferenceService(pipeline=PoseOnlyPipeline(
             model_complexity=1,
-            smooth_landmarks=True,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
-        )
+        ))
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
 
-        self.cap = cv2.VideoCapture(0)
+        self.source = source or CameraSource(0, size=(960, 540), mirror=True)
 
         # Adjusted for more accurate detection
         self.similarity_threshold = 75.0
@@ -47,13 +49,13 @@ class PoseRecorder:
             27: [0.70, 0.35, 0],    # Left ankle (raised)
             28: [0.65, 0.90, 0],    # Right ankle (supporting)
         }
+        self.scorer = LegRaiseScorer(self.reference_pose, self.key_points)
 
     def process_frame(self, frame):
-        image_rgb = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image_rgb)
-        image = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        results = self.engine.process(frame)
+        image = frame  # Drawn on in place; the source reuses its buffer every read
 
-        if results.pose_landmarks:
+        if results and results.pose_landmarks:
             self.mp_drawing.draw_landmarks(
                 image, results.pose_landmarks, self.mp_pose.POSE_CONNECTIONS,
                 landmark_drawing_spec=self.mp_drawing_styles.get_default_pose_landmarks_style()
@@ -62,7 +64,7 @@ class PoseRecorder:
             # Draw reference pose visualization
             self.draw_reference_pose(image)
             
-        return image, results.pose_landmarks
+        return image, results.pose_landmarks if results else None
 
     def draw_reference_pose(self, image):
         h, w, _ = image.shape
@@ -102,100 +104,8 @@ class PoseRecorder:
         cv2.putText(image, "Target Pose", (w - 180, 70),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
 
-    def calculate_similarity(self, landmarks):
-        if not landmarks:
-            return 0, {}
-            
-        # Extract current landmarks
-        current = {i: [landmarks.landmark[i].x, landmarks.landmark[i].y, landmarks.landmark[i].z] 
-                  for i in range(33) if i < len(landmarks.landmark)}
-        
-        # Check if we have all the necessary landmarks
-        if not all(k in current for k in self.key_points):
-            return 0, {"issue": "position_camera"}
-            
-        # Check for leg raise position
-        left_hip = current[23]
-        left_knee = current[25]
-        left_ankle = current[27]
-        right_hip = current[24]
-        right_knee = current[26]
-        right_ankle = current[28]
-        
-        # Check if either leg is raised
-        left_leg_raised = left_knee[1] < left_hip[1] - 0.05  # knee is higher than hip
-        right_leg_raised = right_knee[1] < right_hip[1] - 0.05
-        
-        # Check for leg straightness
-        leg_extended = False
-        feedback = {}
-        
-        if left_leg_raised:
-            # Check if left leg is straight (knee and ankle aligned)
-            knee_ankle_aligned = abs(left_knee[0] - left_ankle[0]) < 0.1
-            hip_knee_aligned = abs(left_hip[0] - left_knee[0]) < 0.1
-            leg_extended = knee_ankle_aligned and hip_knee_aligned
-            feedback["leg"] = "left"
-            if not knee_ankle_aligned or not hip_knee_aligned:
-                feedback["issue"] = "straighten_leg"
-        elif right_leg_raised:
-            # Check if right leg is straight
-            knee_ankle_aligned = abs(right_knee[0] - right_ankle[0]) < 0.1
-            hip_knee_aligned = abs(right_hip[0] - right_knee[0]) < 0.1
-            leg_extended = knee_ankle_aligned and hip_knee_aligned
-            feedback["leg"] = "right"
-            if not knee_ankle_aligned or not hip_knee_aligned:
-                feedback["issue"] = "straighten_leg"
-        else:
-            feedback["issue"] = "raise_leg"
-        
-        # Calculate overall similarity score - check all relevant joints
-        total_distance = 0
-        point_count = 0
-        
-        # If left leg is raised, use the left leg reference points
-        if left_leg_raised:
-            reference_points = {
-                23: self.reference_pose[23],  # Left hip
-                25: self.reference_pose[25],  # Left knee
-                27: self.reference_pose[27],  # Left ankle
-            }
-        # If right leg is raised, mirror the reference points
-        elif right_leg_raised:
-            reference_points = {
-                24: self.reference_pose[23],  # Right hip (using left hip reference)
-                26: self.reference_pose[25],  # Right knee (using left knee reference)
-                28: self.reference_pose[27],  # Right ankle (using left ankle reference)
-            }
-        else:
-            # No leg raised, use minimal points
-            reference_points = {
-                23: self.reference_pose[23],
-                24: self.reference_pose[24],
-            }
-            
-        # Calculate distance for these points
-        for idx, ref in reference_points.items():
-            if idx in current:
-                cur = current[idx]
-                dist = np.sqrt((ref[0] - cur[0])**2 + (ref[1] - cur[1])**2)
-                total_distance += dist
-                point_count += 1
-                
-        if point_count == 0:
-            base_similarity = 0
-        else:
-            base_similarity = max(0, min(100, 100 * (1 - total_distance / point_count * 5)))
-            
-        # Bonus for correct leg positioning
-        if leg_extended and (left_leg_raised or right_leg_raised):
-            similarity = min(100, base_similarity + 15)  # Bonus for correct form
-        elif left_leg_raised or right_leg_raised:
-            similarity = min(100, base_similarity + 5)   # Some bonus just for raising leg
-        else:
-            similarity = base_similarity
-            
-        return similarity, feedback
+    def calculate_similarity(self, landmarks, frame_shape=None):
+        return self.scorer.score(landmarks, frame_shape)
 
     def draw_progress_bar(self, image, value, y_pos):
         w = image.shape[1]
@@ -228,13 +138,11 @@ class PoseRecorder:
         print("❌ Press ESC to exit.")
 
         while True:
-            ret, frame = self.cap.read()
+            ret, frame, _ = self.source.read()
             if not ret:
                 print("❌ Failed to grab frame.")
                 break
 
-            frame = cv2.flip(frame, 1)
-            frame = cv2.resize(frame, (960, 540))
             processed_image, landmarks = self.process_frame(frame)
 
             # Create header bar
@@ -248,7 +156,7 @@ class PoseRecorder:
                 cv2.circle(processed_image, (processed_image.shape[1] - 100 + i*30, 30), 10, color, -1)
 
             if landmarks:
-                similarity, feedback = self.calculate_similarity(landmarks)
+                similarity, feedback = self.calculate_similarity(landmarks, processed_image.shape)
                 
                 # Display progress bar
                 self.draw_progress_bar(processed_image, similarity, 90)
@@ -327,8 +235,9 @@ class PoseRecorder:
             if cv2.waitKey(1) & 0xFF == 27:
                 break
 
-        self.cap.release()
+        self.source.release()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    PoseRecorder().run()
\ No newline at end of file
+    # Optional source: camera index, video file, image directory/pattern or "synthetic"
+    PoseRecorder(open_source(sys.argv[1], size=(960, 540), mirror=True) if len(sys.argv) > 1 else None).run()
\ No newline at end of file
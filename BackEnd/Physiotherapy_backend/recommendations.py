@@ -0,0 +1,100 @@
+import csv
+import hashlib
+import json
+import sys
+
+from exercise_library import exercise_slug
+
+EXERCISES_COLUMN = "Recommended physiotherapy Exercises"
+
+def library_link(name, library):
+    """The EXERCISE_LIBRARY entry an exercise name refers to (matched ignoring case and spacing), or None."""
+    for library_name, exercise in library.items():
+        if exercise_slug(library_name) == exercise_slug(name):
+            return {'name': library_name, 'difficulty': exercise.get("difficulty"),
+                    'steps': list(exercise.get("steps", []))}
+    return None
+
+
+class CachedJson:
+    """A response body serialized once, with its ETag."""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+
+class RecommendationIndex:
+    """Surgery -> exercise plans and exercise -> surgeries, built once from dataset.csv.
+
+    Rows are deduplicated and strings interned while parsing, so the
+    ~11,000-line file collapses to a handful of plans. Every response the
+    API can give is serialized up front (`CachedJson`), so requests are a
+    dictionary lookup. Lookups ignore case and spacing.
+    """
+
+    def __init__(self, rows=(), library=None):
+        library = library or {}
+        self.stats = {'rows': 0, 'duplicates': 0, 'invalid': 0}
+        seen = set()
+        self.plans = {}        # surgery -> [plan, ...]
+        self.surgeries_for = {}  # exercise -> [surgery, ...]
+        self.row_counts = {}     # surgery -> rows mentioning it, duplicates included (popularity)
+        for row in rows:
+            self.stats['rows'] += 1
+            surgery = sys.intern(row.get("Surgery", "").strip())
+            self.row_counts[surgery] = self.row_counts.get(surgery, 0) + 1
+            key = tuple(row.get(column, "") for column in ("Surgery", EXERCISES_COLUMN, "Exercise Type",
+                                                           "Intensity", "Frequency", "Purpose"))
+            if key in seen:
+                self.stats['duplicates'] += 1
+                continue
+            seen.add(key)
+            try:
+                exercises = [sys.intern(name.strip()) for name in json.loads(key[1])]
+            except (TypeError, ValueError):
+                self.stats['invalid'] += 1
+                continue
+            self.plans.setdefault(surgery, []).append({
+                'exercises': exercises,
+                'type': sys.intern(key[2]), 'intensity': sys.intern(key[3]),
+                'frequency': sys.intern(key[4]), 'purpose': sys.intern(key[5]),
+            })
+            for exercise in exercises:
+                surgeries = self.surgeries_for.setdefault(exercise, [])
+                if surgery not in surgeries:
+                    surgeries.append(surgery)
+        self.links = {name: library_link(name, library) for name in self.surgeries_for}
+
+        # Serialized responses
+        self.surgery_list = CachedJson({'success': True, 'surgeries': sorted(self.plans)})
+        self.exercise_list = CachedJson({'success': True, 'exercises': [
+            {'name': name, 'library': self.links[name]['name'] if self.links[name] else None}
+            for name in sorted(self.surgeries_for)]})
+        self.by_surgery = {}
+        for surgery, plans in self.plans.items():
+            self.by_surgery[exercise_slug(surgery)] = CachedJson({'success': True, 'surgery': surgery, 'plans': [
+                dict(plan, exercises=[{'name': name, 'library': self.links[name]} for name in plan['exercises']])
+                for plan in plans]})
+        self.by_exercise = {}
+        for exercise, surgeries in self.surgeries_for.items():
+            self.by_exercise[exercise_slug(exercise)] = CachedJson({
+                'success': True, 'exercise': exercise, 'library': self.links[exercise],
+                'surgeries': sorted(surgeries)})
+        self.stats.update(surgeries=len(self.plans), exercises=len(self.surgeries_for),
+                          plans=sum(len(plans) for plans in self.plans.values()))
+
+    @classmethod
+    def from_csv(cls, path, library=None):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                return cls(csv.DictReader(f), library)
+        except OSError as e:
+            print(f"Error loading recommendations from {path}: {e}")
+            return cls((), library)
+
+    def surgery(self, name):
+        return self.by_surgery.get(exercise_slug(name))
+
+    def exercise(self, name):
+        return self.by_exercise.get(exercise_slug(name))
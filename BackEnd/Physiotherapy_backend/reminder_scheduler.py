@@ -0,0 +1,208 @@
+import datetime
+import heapq
+import itertools
+import math
+import threading
+import time
+
+REPEAT_SECONDS = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400}
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO 8601 string (the app sends dateObj as JSON, e.g. ...T08:00:00.000Z)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+def repeat_interval(value):
+    """Seconds between occurrences: "hourly"/"daily"/"weekly", {"every_minutes": n}, or None (one-off)."""
+    if isinstance(value, str):
+        return REPEAT_SECONDS.get(value.lower())
+    if isinstance(value, dict):
+        minutes = value.get("every_minutes")
+        if isinstance(minutes, (int, float)) and minutes > 0:
+            return minutes * 60.0
+    return None
+
+
+class Reminder:
+    """A one-off or recurring reminder. A recurring one is its rule, never a list of occurrences."""
+
+    def __init__(self, reminder_id, data, first_due, interval=None, until=None):
+        self.id = reminder_id
+        self.data = data
+        self.first_due = first_due
+        self.interval = interval
+        self.until = until
+
+    @classmethod
+    def from_data(cls, reminder_id, data):
+        """From a stored reminder ("dateObj" or "due", optional "repeat" and "until"); None if it has no usable time."""
+        if not isinstance(data, dict) or data.get("checked"):
+            return None
+        due = parse_time(data.get("due", data.get("dateObj")))
+        if due is None:
+            return None
+        return cls(reminder_id, data, due, repeat_interval(data.get("repeat")), parse_time(data.get("until")))
+
+    def next_at_or_after(self, t):
+        """First occurrence at or after `t` (arithmetic, O(1)), or None when there is none."""
+        if t <= self.first_due:
+            due = self.first_due
+        elif self.interval:
+            due = self.first_due + math.ceil((t - self.first_due) / self.interval) * self.interval
+        else:
+            return None
+        return due if self.until is None or due <= self.until else None
+
+
+class ReminderScheduler:
+    """Fires due reminders to subscribers, backed by a min-heap of next occurrences.
+
+    The heap holds exactly one entry per live reminder, its next
+    occurrence: a recurring reminder pushes its following occurrence when
+    it fires. Replacing a reminder bumps its version, and the stale heap
+    entry is dropped lazily when it surfaces. After a stall (suspend, a
+    late wake-up) a recurring reminder fires once, with the number of
+    occurrences it missed, and carries on from the next one after now.
+
+    `due_within(seconds)` walks only the part of the heap that is inside
+    the window; a node later than the horizon cuts off its whole subtree.
+    Its cost therefore follows the number of results rather than the
+    total number of reminders. Recurring reminders are expanded only
+    inside the window.
+
+    `start()` runs a thread that sleeps until the earliest due time. It is
+    woken early when a sooner reminder is added.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.heap = []           # (due, seq, reminder id, version)
+        self.reminders = {}      # id -> (Reminder, version)
+        self.versions = itertools.count()
+        self.seq = itertools.count()
+        self.subscribers = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def subscribe(self, callback):
+        """`callback(reminder_id, data, due, missed)` is called for every reminder that fires."""
+        self.subscribers.append(callback)
+
+    def add(self, reminder_id, data, now=None):
+        """Schedule (or reschedule) a reminder from its stored data; False if it has nothing left to fire."""
+        reminder = Reminder.from_data(reminder_id, data)
+        now = self.clock() if now is None else now
+        with self.condition:
+            self.reminders.pop(reminder_id, None)
+            due = reminder.next_at_or_after(now) if reminder else None
+            if due is None:
+                return False
+            version = next(self.versions)
+            self.reminders[reminder_id] = (reminder, version)
+            earliest = self.heap[0][0] if self.heap else math.inf
+            heapq.heappush(self.heap, (due, next(self.seq), reminder_id, version))
+            if due < earliest:
+                self.condition.notify()
+            return True
+
+    def load(self, reminders, now=None):
+        """Schedule every reminder of an {id: data} mapping (e.g. the Firebase snapshot); returns how many."""
+        return sum(self.add(reminder_id, data, now) for reminder_id, data in (reminders or {}).items())
+
+    def live(self, entry):
+        scheduled = self.reminders.get(entry[2])
+        return scheduled is not None and scheduled[1] == entry[3]
+
+    def fire_due(self, now=None):
+        """Pop and fire everything due by `now`; returns [(reminder id, data, due, missed occurrences)]."""
+        now = self.clock() if now is None else now
+        fired = []
+        with self.condition:
+            while self.heap and self.heap[0][0] <= now:
+                entry = heapq.heappop(self.heap)
+                if not self.live(entry):
+                    continue
+                reminder, version = self.reminders[entry[2]]
+                due = entry[0]
+                missed = 0
+                following = None
+                if reminder.interval:
+                    # Occurrences that also passed while we weren't running are counted, not replayed
+                    last = now if reminder.until is None else min(now, reminder.until)
+                    missed = max(0, int((last - due) // reminder.interval))
+                    following = reminder.next_at_or_after(max(now, due) + 1e-6)
+                fired.append((reminder.id, reminder.data, due, missed))
+                if following is None:
+                    del self.reminders[reminder.id]
+                else:
+                    heapq.heappush(self.heap, (following, next(self.seq), reminder.id, version))
+        for reminder_id, data, due, missed in fired:
+            for callback in self.subscribers:
+                try:
+                    callback(reminder_id, data, due, missed)
+                except Exception as e:
+                    print(f"Error in reminder subscriber: {e}")
+        return fired
+
+    def due_within(self, seconds, now=None):
+        """Occurrences due in the next `seconds`, soonest first, as [{id, due, reminder}]."""
+        now = self.clock() if now is None else now
+        horizon = now + seconds
+        found = []
+        with self.condition:
+            stack = [0] if self.heap else []
+            while stack:
+                i = stack.pop()
+                entry = self.heap[i]
+                if entry[0] > horizon:
+                    continue   # Heap order: nothing below is sooner
+                if self.live(entry):
+                    reminder = self.reminders[entry[2]][0]
+                    due = entry[0]
+                    while due is not None and due <= horizon:
+                        found.append((due, reminder.id, reminder.data))
+                        due = reminder.next_at_or_after(due + 1e-6) if reminder.interval else None
+                stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(self.heap))
+        found.sort(key=lambda item: item[0])
+        return [{'id': reminder_id, 'due': due, 'reminder': data} for due, reminder_id, data in found]
+
+    def next_due(self):
+        with self.condition:
+            while self.heap and not self.live(self.heap[0]):
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def start(self, max_sleep=60.0):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, args=(max_sleep,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self, max_sleep):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                due = self.next_due()
+                wait = max_sleep if due is None else min(max_sleep, max(0.0, due - self.clock()))
+                if wait > 0:
+                    self.condition.wait(wait)
+                if not self.running:
+                    return
+            self.fire_due()
@@ -0,0 +1,119 @@
+import numpy as np
+
+class RunningStats:
+    """Welford mean/variance with min and max, element-wise over a fixed-size vector.
+
+    NaN entries (joints that weren't visible) are skipped per element, so
+    each channel keeps its own count.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self.count = np.zeros(self.size)
+        self.mean = np.zeros(self.size)
+        self.m2 = np.zeros(self.size)
+        self.min = np.full(self.size, np.inf)
+        self.max = np.full(self.size, -np.inf)
+
+    def add(self, x):
+        valid = ~np.isnan(x)
+        self.count += valid
+        delta = np.where(valid, x - self.mean, 0.0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += delta * np.where(valid, x - self.mean, 0.0)
+        np.fmin(self.min, x, out=self.min)
+        np.fmax(self.max, x, out=self.max)
+
+    @property
+    def std(self):
+        with np.errstate(invalid='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / np.maximum(self.count - 1, 1)), np.nan)
+
+
+def rounded(value, digits=2):
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value, digits)
+
+
+class RepKinematics:
+    """Per-repetition range of motion, velocity and hold stability, in constant memory.
+
+    `update(values, timestamp, holding)` takes one frame's measurements
+    (e.g. the feature layer's joint angles) and only updates running
+    statistics; no frame history is kept. `finish_rep()` is called when the
+    rep detector counts a repetition and returns a compact record for the
+    channel that moved the most: peak range of motion, mean and peak speed,
+    time under tension (time spent holding) and hold jitter (standard
+    deviation while holding).
+    """
+
+    def __init__(self, names, units="deg"):
+        self.names = list(names)
+        self.units = units
+        n = len(self.names)
+        self.values = RunningStats(n)
+        self.speed = RunningStats(n)
+        self.hold = RunningStats(n)
+        self.previous = np.full(n, np.nan)
+        self.reps = 0
+        self.reset()
+
+    def reset(self):
+        """Start over (new session); the rep count goes back to zero."""
+        self.reps = 0
+        self.start_rep(None)
+
+    def start_rep(self, timestamp):
+        self.values.reset()
+        self.speed.reset()
+        self.hold.reset()
+        self.previous[:] = np.nan
+        self.previous_time = None
+        self.rep_start = timestamp
+        self.tension = 0.0
+        self.was_holding = False
+
+    def update(self, values, timestamp, holding=False):
+        values = np.asarray(values, dtype=np.float64)
+        if self.rep_start is None:
+            self.rep_start = timestamp
+        self.values.add(values)
+        if self.previous_time is not None:
+            dt = timestamp - self.previous_time
+            if dt > 0:
+                self.speed.add(np.abs(values - self.previous) / dt)
+                if holding and self.was_holding:
+                    self.tension += dt
+        if holding:
+            self.hold.add(values)
+        self.previous[:] = values
+        self.previous_time = timestamp
+        self.was_holding = holding
+
+    def finish_rep(self, timestamp, **extra):
+        """Record for the repetition that just ended; the next one starts at `timestamp`."""
+        self.reps += 1
+        with np.errstate(invalid='ignore'):
+            rom = self.values.max - self.values.min
+        moved = np.where(np.isfinite(rom), rom, -1.0)
+        main = int(np.argmax(moved)) if len(moved) else None
+        record = {'rep': self.reps,
+                  'duration': rounded(timestamp - self.rep_start) if self.rep_start is not None else None}
+        if main is not None:
+            record.update({
+                'channel': self.names[main],
+                'units': self.units,
+                'rom': rounded(rom[main], 1),
+                'min': rounded(self.values.min[main], 1),
+                'max': rounded(self.values.max[main], 1),
+                'mean_speed': rounded(self.speed.mean[main]) if self.speed.count[main] else None,
+                'peak_speed': rounded(self.speed.max[main]),
+                'time_under_tension': round(self.tension, 2),
+                'hold_jitter': rounded(self.hold.std[main]),
+            })
+        record.update(extra)
+        self.start_rep(timestamp)
+        return record
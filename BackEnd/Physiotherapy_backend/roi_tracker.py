@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+class RoiTracker:
+    """Crops the next frame around where the landmarks were in the last one.
+
+    Inference then runs on the (optionally downscaled) crop, and `update`
+    maps the resulting landmarks back to full-frame normalized coordinates
+    in place, so scoring and drawing code never sees the crop. When the
+    person is lost for `lost_after` frames the tracker falls back to the
+    full frame until a detection comes back.
+
+    The box is held still while the landmarks (plus `hold_margin` of their
+    size) stay inside it and still fill at least `min_fill` of its area.
+    MediaPipe's video-mode tracking and landmark smoothing work in input
+    image coordinates, so a crop that moved every frame would look like
+    landmark motion to them; a fixed crop only moves when the patient
+    nears its edge or it has become much too large.
+    """
+
+    def __init__(self, padding=0.3, min_visibility=0.5, input_size=None, lost_after=2, min_points=4,
+                 hold_margin=None, min_fill=0.3):
+        self.padding = padding                # Extra margin on each side, as a fraction of the box size
+        self.hold_margin = padding / 3 if hold_margin is None else hold_margin
+        self.min_fill = min_fill
+        self.min_visibility = min_visibility  # Landmarks below this visibility don't shape the box (0 for hands)
+        self.input_size = input_size          # Longest side of the crop handed to the model (None = no resize)
+        self.lost_after = lost_after
+        self.min_points = min_points
+        self.box = None                       # (x0, y0, x1, y1) normalized to the full frame
+        self.misses = 0
+
+    def reset(self):
+        self.box = None
+        self.misses = 0
+
+    def crop(self, image):
+        """Return (model_input, roi). `roi` is (x0, y0, x1, y1) in pixels, or None for the full frame."""
+        if self.box is None:
+            return image, None
+        h, w = image.shape[:2]
+        x0, y0, x1, y1 = self.box
+        x0, x1 = int(x0 * w), int(np.ceil(x1 * w))
+        y0, y1 = int(y0 * h), int(np.ceil(y1 * h))
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return image, None
+        roi = (x0, y0, x1, y1)
+        crop = image[y0:y1, x0:x1]
+        if self.input_size:
+            # Uniform scale only, so normalized crop coordinates stay undistorted
+            scale = self.input_size / max(x1 - x0, y1 - y0)
+            if scale < 1.0:
+                crop = cv2.resize(crop, (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale))),
+                                  interpolation=cv2.INTER_AREA)
+        return crop, roi
+
+    def update(self, landmarks, roi, image_shape, extra_landmarks=()):
+        """Map landmark lists from crop to full-frame coordinates and track the next box.
+
+        `landmarks` (e.g. pose) drives the box; `extra_landmarks` (hands, face)
+        are only remapped. Lists may be None when nothing was detected.
+        """
+        if roi is not None:
+            h, w = image_shape[:2]
+            x0, y0, x1, y1 = roi
+            for landmark_list in (landmarks,) + tuple(extra_landmarks):
+                if landmark_list is not None:
+                    self.map_to_frame(landmark_list, x0, y0, x1 - x0, y1 - y0, w, h)
+
+        if landmarks is None:
+            self.misses += 1
+            if self.misses >= self.lost_after:
+                self.box = None
+            return
+
+        points = np.array([(lm.x, lm.y) for lm in landmarks.landmark
+                           if self.min_visibility <= 0 or lm.visibility >= self.min_visibility])
+        if len(points) < self.min_points:
+            self.misses += 1
+            if self.misses >= self.lost_after:
+                self.box = None
+            return
+
+        self.misses = 0
+        (bx0, by0), (bx1, by1) = points.min(axis=0), points.max(axis=0)
+        if self.box is not None and self.holds(bx0, by0, bx1, by1):
+            return
+        pad_x = (bx1 - bx0) * self.padding
+        pad_y = (by1 - by0) * self.padding
+        box = np.clip([bx0 - pad_x, by0 - pad_y, bx1 + pad_x, by1 + pad_y], 0.0, 1.0)
+        self.box = tuple(float(v) for v in box)
+
+    def holds(self, bx0, by0, bx1, by1):
+        """Whether the current box can stay put for landmarks spanning (bx0, by0)-(bx1, by1)."""
+        x0, y0, x1, y1 = self.box
+        mx, my = (bx1 - bx0) * self.hold_margin, (by1 - by0) * self.hold_margin
+        # Margins are only needed on sides the box can still grow towards (not at the frame edge)
+        inside = ((bx0 - mx >= x0 or x0 <= 0.0) and (by0 - my >= y0 or y0 <= 0.0) and
+                  (bx1 + mx <= x1 or x1 >= 1.0) and (by1 + my <= y1 or y1 >= 1.0))
+        fill = (bx1 - bx0) * (by1 - by0) / max((x1 - x0) * (y1 - y0), 1e-9)
+        return inside and fill >= self.min_fill
+
+    @staticmethod
+    def map_to_frame(landmark_list, x0, y0, crop_w, crop_h, frame_w, frame_h):
+        """Convert crop-normalized landmarks to full-frame normalized coordinates (in place)."""
+        sx, sy = crop_w / frame_w, crop_h / frame_h
+        ox, oy = x0 / frame_w, y0 / frame_h
+        for lm in landmark_list.landmark:
+            lm.x = ox + lm.x * sx
+            lm.y = oy + lm.y * sy
+            lm.z = lm.z * sx  # MediaPipe z uses the same scale as x
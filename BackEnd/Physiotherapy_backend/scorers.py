@@ -0,0 +1,552 @@
+import time
+
+import numpy as np
+
+from feedback_rules import BACKWARD, DIRECTIONS, FORWARD, HIGHER, LEFT, LOWER, RIGHT, joint_name
+from joint_features import HAND_ANGLES, HAND_SEGMENTS, POSE_ANGLES, FeatureLayer, FeatureSet, align_pose
+from pose_engine import landmarks_to_dict
+from trajectory_dtw import StreamingSubsequenceDTW, normalize_poses, sample_keyframes
+from variations import MIRROR_INDEX, VariationSet, compile_variations, swap_sides
+
+class Scorer:
+    """Common interface for everything that turns landmarks into a score.
+
+    `score(landmarks, frame_shape, timestamp)` returns `(score, feedback)`
+    where score is 0-100 and feedback is a scorer-specific dict.
+    """
+
+    def score(self, landmarks, frame_shape=None, timestamp=None):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class AlignmentScorer(Scorer):
+    """Weighted 3D distance to a reference pose (the AR app's accuracy score).
+
+    The live pose is first moved and scaled onto the reference's hip centre
+    and torso length, so the score depends on the patient's posture rather
+    than where they stand or how far from the camera. Feedback maps joint names to the direction the joint should move;
+    `misaligned` holds the same as [(landmark index, direction code), ...].
+    """
+
+    def __init__(self, reference_pose=None):
+        self.reference_pose = reference_pose
+        self.side_swapped = False       # Reference is the left/right mirror of the authored pose
+        self.misaligned = []
+        # Body part weights (higher = more importance in the accuracy calculation)
+        self.leg_sensitivity = 4.5      # Decreased for easier leg movement matching
+        self.torso_sensitivity = 4.0    # Decreased for more forgiving torso stability
+        self.arm_sensitivity = 3.5      # Decreased for easier arm positioning
+
+    def joint_weight(self, idx):
+        """Importance of one joint (as authored, i.e. before any left/right mirroring)."""
+        # Body part indices for different sensitivity levels
+        # Legs (higher sensitivity) - most important for straight leg raises
+        leg_indices = [23, 24, 25, 26, 27, 28, 29, 30, 31, 32]
+        # Torso (medium sensitivity)
+        torso_indices = [11, 12, 13, 14, 23, 24]
+        # Arms (normal sensitivity)
+        arm_indices = [15, 16, 17, 18, 19, 20, 21, 22]
+        
+        # Specific key joints for straight leg raises (based on user-provided coordinates)
+        key_straight_leg_joints = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+
+        # Apply appropriate weights based on body part with stricter thresholds
+        if idx in leg_indices:
+            weight = self.leg_sensitivity * 1.5  # Increased weight for legs
+            # Give extra importance to the raised leg (left leg in our reference)
+            if idx in [25, 27]:  # Left knee and ankle (raised leg)
+                weight *= 1.5  # 50% more importance for key raised leg joints
+        elif idx in torso_indices:
+            weight = self.torso_sensitivity * 1.3  # Increased weight for torso
+        elif idx in arm_indices:
+            weight = self.arm_sensitivity * 1.2  # Increased weight for arms
+        else:
+            weight = 1.2
+        
+        # Give extra importance to all key joints for straight leg raises
+        if idx in key_straight_leg_joints:
+            weight *= 1.35  # 35% boost for all key joints
+        return weight
+
+    def score(self, detected_landmarks, frame_shape=None, timestamp=None):
+        self.misaligned = misaligned = []
+        if not self.reference_pose:
+            return 0, {}
+        
+        misaligned_joints = {}
+        total_distance = 0
+        total_weight = 0
+        
+        # Ensure we have valid landmarks before processing
+        if not detected_landmarks or not detected_landmarks.landmark:
+            print("Warning: No valid landmarks detected")
+            return 0, {}
+            
+        # Extract current landmarks with error handling
+        try:
+            current_landmarks = align_pose(landmarks_to_dict(detected_landmarks), self.reference_pose)
+        except Exception as e:
+            print(f"Error extracting landmarks: {e}")
+            return 0, {}
+        
+        # Calculate the position differences with appropriate weighting
+        for idx, ref_pos in self.reference_pose.items():
+            if idx in current_landmarks:
+                cur = current_landmarks[idx]
+                
+                # Full 3D Euclidean distance calculation (using all x, y, z coordinates)
+                # Note: Z-coordinate is depth from camera (important for 3D accuracy)
+                dist_3d = np.sqrt((ref_pos[0] - cur[0])**2 + 
+                                  (ref_pos[1] - cur[1])**2 + 
+                                  (ref_pos[2] - cur[2])**2 * 0.7)  # Z-coordinate weighted at 70%
+                
+                # Also calculate 2D distance for directional feedback
+                dist_2d = np.sqrt((ref_pos[0] - cur[0])**2 + (ref_pos[1] - cur[1])**2)
+                
+                # Use the 3D distance for accuracy calculation
+                dist = dist_3d * 0.35  # Make matching slightly easier (65% more forgiving)
+                
+                # A mirrored reference weights each joint like its authored counterpart
+                weight = self.joint_weight(MIRROR_INDEX.get(idx, idx) if self.side_swapped else idx)
+                
+                total_distance += weight * dist
+                total_weight += weight
+                
+                # Track misalignments for feedback (using appropriate threshold)
+                # More specific feedback for straight leg raises
+                if dist_2d > 0.06:  # Slightly more forgiving threshold
+                    # Enhanced 3D directional feedback
+                    if abs(ref_pos[2] - cur[2]) > 0.1:  # Significant depth difference
+                        if ref_pos[2] < cur[2]:
+                            direction = FORWARD
+                        else:
+                            direction = BACKWARD
+                    elif ref_pos[1] < cur[1]:
+                        direction = HIGHER
+                    elif ref_pos[1] > cur[1]:
+                        direction = LOWER
+                    elif ref_pos[0] < cur[0]:
+                        direction = RIGHT
+                    else:
+                        direction = LEFT
+                    
+                    misaligned.append((idx, direction))
+                    misaligned_joints[joint_name(idx)] = DIRECTIONS[direction]
+        
+        if total_weight == 0:
+            print("Warning: No matching landmarks found between reference and current pose")
+            return 40, {}  # Return a baseline score of 40% instead of 0
+            
+        avg_distance = total_distance / total_weight
+        
+        # Convert to a similarity percentage (inversely related to distance)
+        # Using a stricter scale factor for more challenge
+        similarity = max(0, min(100, 100 * (1 - avg_distance * 2.3)))  # More forgiving scale
+        
+        # No baseline minimum score - make users work from 0%
+        similarity = max(similarity, 0)
+        
+        # Cap at 100% without any boost
+        similarity = min(similarity, 100)
+        
+        return similarity, misaligned_joints
+
+
+def misaligned_directions(joints, diff, compared, threshold=0.06):
+    """[(landmark index, direction code)] for joints more than `threshold` off in 2D.
+
+    `diff` is reference minus current, shape (K, 3); the direction rules
+    are AlignmentScorer's: depth first, then up/down, then left/right.
+    """
+    far = compared & (np.hypot(diff[:, 0], diff[:, 1]) > threshold)
+    codes = np.select([np.abs(diff[:, 2]) > 0.1, diff[:, 1] < 0, diff[:, 1] > 0, diff[:, 0] < 0],
+                      [np.where(diff[:, 2] < 0, FORWARD, BACKWARD), HIGHER, LOWER, RIGHT], LEFT)
+    return [(joints[k], codes[k].item()) for k in np.flatnonzero(far)]
+
+
+class VariationScorer(Scorer):
+    """AlignmentScorer over every variation of the reference at once.
+
+    The exercise's declared variations, their automatic left/right mirrors
+    and (optionally) the same poses facing the other way are compiled into
+    one VariationSet; each frame scores all of them in a single batched
+    distance, and the score and feedback of the best match come from that
+    same batch.
+    `variation` names it and `variation_scores` holds every variation's
+    score.
+    """
+
+    def __init__(self, reference_pose=None, variation_names=None, variation_poses=None, mirror_facing=True):
+        self.alignment = AlignmentScorer()
+        self.variation_names = variation_names
+        self.variation_poses = variation_poses
+        self.mirror_facing = mirror_facing
+        self.compiled = {}  # id(pose) -> (pose, VariationSet), so keyframes are only compiled once
+        self.variation = None
+        self.variation_scores = {}
+        self.set_reference(reference_pose)
+
+    @classmethod
+    def from_exercise(cls, exercise, reference_pose=None, **options):
+        return cls(reference_pose or exercise["reference_pose"], exercise.get("variations"),
+                   exercise.get("variation_poses"), **options)
+
+    def set_reference(self, reference_pose):
+        self.reference_pose = reference_pose
+        self.alignment.reference_pose = reference_pose
+        self.alignment.side_swapped = False
+        if reference_pose is None:
+            self.variations = None
+            return
+        cached = self.compiled.get(id(reference_pose))
+        if cached is None or cached[0] is not reference_pose:
+            variations = compile_variations(reference_pose, self.variation_names, self.variation_poses,
+                                            self.mirror_facing)
+            cached = (reference_pose, VariationSet(variations, self.alignment.joint_weight))
+            self.compiled[id(reference_pose)] = cached
+        self.variations = cached[1]
+
+    @property
+    def misaligned(self):
+        return self.alignment.misaligned
+
+    def score(self, landmarks, frame_shape=None, timestamp=None):
+        if self.variations is None or not landmarks or not landmarks.landmark:
+            return self.alignment.score(landmarks, frame_shape, timestamp)
+        # Variations are mirrors/flips about the hips, so they share the reference's body frame
+        mean, diff, compared = self.variations.compare(align_pose(landmarks_to_dict(landmarks), self.reference_pose))
+        best = int(np.argmin(mean))
+        # Same scale as AlignmentScorer: 0.35 distance factor, 2.3 similarity factor
+        scores = np.clip(100 * (1 - mean * 0.35 * 2.3), 0, 100)
+        self.variation_scores = {name: round(float(s), 1) for name, s in zip(self.variations.names, scores)}
+        self.variation = self.variations.names[best]
+        self.alignment.reference_pose = self.variations.poses[best]
+        self.alignment.side_swapped = self.variations.swapped[best]
+        if not np.isfinite(mean[best]):
+            self.alignment.misaligned = []
+            return 40, {}  # No joints in common, same baseline as AlignmentScorer
+        self.alignment.misaligned = misaligned = misaligned_directions(self.variations.joints, diff[best],
+                                                                       compared[best])
+        return float(scores[best]), {joint_name(idx): DIRECTIONS[code] for idx, code in misaligned}
+
+
+class LegRaiseScorer(Scorer):
+    """Straight leg raise check from the pose recorder: which leg is raised,
+    whether it is straight, and distance to the (mirrored) reference leg.
+
+    Raised and straight are judged from hip and knee angles, and the leg
+    distance is measured after aligning the pose onto the reference's hips
+    and torso length, so neither depends on where the patient stands or how
+    far from the camera.
+    """
+
+    def __init__(self, reference_pose, key_points, raised_hip_angle=150.0, straight_knee_angle=155.0):
+        self.reference_pose = reference_pose
+        self.key_points = key_points
+        self.raised_hip_angle = raised_hip_angle        # Hip angle below this = leg raised (180 = standing)
+        self.straight_knee_angle = straight_knee_angle  # Knee angle above this = leg straight
+        angles = {name: POSE_ANGLES[name] for name in ("left_hip", "right_hip", "left_knee", "right_knee")}
+        self.features = FeatureLayer(FeatureSet(angles, {}))
+
+    def score(self, landmarks, frame_shape=None, timestamp=None):
+        if not landmarks:
+            return 0, {}
+            
+        # Extract current landmarks
+        current = landmarks_to_dict(landmarks)
+        
+        # Check if we have all the necessary landmarks
+        if not all(k in current for k in self.key_points):
+            return 0, {"issue": "position_camera"}
+            
+        # Hip and knee angles for this frame, computed once
+        features = self.features.update(landmarks, frame_shape)
+        left_hip_angle = features.angle("left_hip")
+        right_hip_angle = features.angle("right_hip")
+        
+        # Check if either leg is raised (the more flexed hip is the raised leg)
+        left_leg_raised = left_hip_angle < self.raised_hip_angle and left_hip_angle <= right_hip_angle
+        right_leg_raised = right_hip_angle < self.raised_hip_angle and not left_leg_raised
+        
+        # Check for leg straightness
+        leg_extended = False
+        feedback = {}
+        
+        if left_leg_raised or right_leg_raised:
+            side = "left" if left_leg_raised else "right"
+            leg_extended = features.angle(f"{side}_knee") >= self.straight_knee_angle
+            feedback["leg"] = side
+            if not leg_extended:
+                feedback["issue"] = "straighten_leg"
+        else:
+            feedback["issue"] = "raise_leg"
+        
+        # Calculate overall similarity score - check all relevant joints
+        total_distance = 0
+        point_count = 0
+        
+        # If left leg is raised, use the left leg reference points
+        if left_leg_raised:
+            reference_points = {
+                23: self.reference_pose[23],  # Left hip
+                25: self.reference_pose[25],  # Left knee
+                27: self.reference_pose[27],  # Left ankle
+            }
+        # If right leg is raised, mirror the reference points onto the right side
+        elif right_leg_raised:
+            reference_points = swap_sides({i: self.reference_pose[i] for i in (23, 25, 27)})
+        else:
+            # No leg raised, use minimal points
+            reference_points = {
+                23: self.reference_pose[23],
+                24: self.reference_pose[24],
+            }
+            
+        # Calculate distance for these points, in the reference's body frame
+        current = align_pose(current, self.reference_pose)
+        for idx, ref in reference_points.items():
+            if idx in current:
+                cur = current[idx]
+                dist = np.sqrt((ref[0] - cur[0])**2 + (ref[1] - cur[1])**2)
+                total_distance += dist
+                point_count += 1
+                
+        if point_count == 0:
+            base_similarity = 0
+        else:
+            base_similarity = max(0, min(100, 100 * (1 - total_distance / point_count * 5)))
+            
+        # Bonus for correct leg positioning
+        if leg_extended and (left_leg_raised or right_leg_raised):
+            similarity = min(100, base_similarity + 15)  # Bonus for correct form
+        elif left_leg_raised or right_leg_raised:
+            similarity = min(100, base_similarity + 5)   # Some bonus just for raising leg
+        else:
+            similarity = base_similarity
+            
+        return similarity, feedback
+
+
+class LenientPoseScorer(Scorer):
+    """Forgiving 2D distance score with a base score and smoothing (confetti recorder)."""
+
+    def __init__(self, reference_pose):
+        self.reference_pose = reference_pose
+        self.last_similarity = 0             # Store last similarity for smoother transitions
+
+    def reset(self):
+        self.last_similarity = 0
+
+    def score(self, landmarks, frame_shape=None, timestamp=None):
+        """
+        Calculates a similarity score (0 to 100) by comparing the detected pose
+        to the reference pose using the Euclidean distance of the x,y coordinates.
+        Modified to be much more responsive and lenient.
+        """
+        if not landmarks:
+            return max(0, self.last_similarity - 5), {}  # Gradual decrease if no landmarks
+            
+        # Base score just for having landmarks detected
+        base_score = 30
+        
+        # Calculate distances for available landmarks
+        total_distance = 0
+        count = 0
+        current = landmarks_to_dict(landmarks)
+        
+        # Only check a subset of key points that are likely to be visible
+        visible_points = {}
+        for idx in self.reference_pose.keys():
+            if idx in current and current[idx][2] > -0.5:  # Check z-value for visibility
+                visible_points[idx] = current[idx]
+        
+        # If we have at least some visible points, calculate similarity
+        if visible_points:
+            for idx, ref in self.reference_pose.items():
+                if idx in visible_points:
+                    cur = visible_points[idx]
+                    # Much more forgiving distance calculation
+                    dist = np.sqrt((ref[0] - cur[0])**2 + (ref[1] - cur[1])**2) * 0.5  # Apply 0.5 multiplier to make it easier
+                    total_distance += dist
+                    count += 1
+                    
+            if count > 0:
+                avg_distance = total_distance / count
+                # Make the curve much more forgiving - even large distances will give decent scores
+                raw_similarity = max(0, min(100, 100 * (1 - avg_distance * 2)))
+                # Add base score and cap at 100
+                similarity = min(100, base_score + raw_similarity * 0.7)
+            else:
+                similarity = base_score
+        else:
+            similarity = base_score * 0.5  # Partial credit just for having some landmarks
+            
+        # Smooth transitions (weighted average with previous value)
+        smoothed_similarity = 0.7 * similarity + 0.3 * self.last_similarity
+        self.last_similarity = smoothed_similarity
+            
+        return smoothed_similarity, {}
+
+
+class WristRepScorer(Scorer):
+    """Counts up/down wrist oscillations as repetitions (the API server's tracker).
+
+    Score is the vertical wrist range over the recent window relative to
+    `min_range`, measured in palm lengths (wrist to middle knuckle) so it
+    doesn't matter how close the hand is to the camera; feedback["rep"] is
+    True on the frame a repetition is counted.
+    """
+
+    def __init__(self, cooldown=0.5, history=15, window=10, min_range=0.7, min_direction_changes=2):
+        self.cooldown = cooldown                  # Seconds between counting movements
+        self.history = history
+        self.window = window
+        self.min_range = min_range                # Palm lengths
+        self.min_direction_changes = min_direction_changes
+        self.features = FeatureLayer(FeatureSet(HAND_ANGLES, HAND_SEGMENTS))
+        self.reset()
+
+    def reset(self):
+        self.last_positions = []
+        self.last_movement_time = 0
+        self.palm = None                          # Smoothed palm length in pixels
+        self.wrist_height = None
+
+    def score(self, landmarks, frame_shape=None, timestamp=None):
+        if landmarks is None:
+            return 0, {"rep": False}
+        wrist = landmarks.landmark[0]  # HandLandmark.WRIST
+        h, w = frame_shape[:2]
+        x = int(wrist.x * w)
+        y = int(wrist.y * h)
+        _, palm, _ = self.features.update(landmarks, frame_shape).segment("palm")
+        if not np.isnan(palm):
+            palm *= h  # Frame-height units to pixels
+            self.palm = palm if self.palm is None else 0.8 * self.palm + 0.2 * palm
+        min_range = self.min_range * (self.palm or 70.0)
+        self.wrist_height = -y / (self.palm or 70.0)  # Palm lengths, up is positive
+        
+        # Track positions
+        self.last_positions.append((x, y))
+        if len(self.last_positions) > self.history:
+            self.last_positions.pop(0)
+        
+        # Movement detection logic
+        current_time = timestamp or time.time()
+        y_positions = [pos[1] for pos in self.last_positions[-self.window:]]
+        range_y = max(y_positions) - min(y_positions)
+        score = min(100, 100 * range_y / min_range)
+        if (len(self.last_positions) >= self.window and 
+            current_time - self.last_movement_time > self.cooldown):
+            
+            direction_changes = 0
+            for i in range(2, len(y_positions)):
+                prev_diff = y_positions[i-1] - y_positions[i-2]
+                curr_diff = y_positions[i] - y_positions[i-1]
+                if (prev_diff > 0 and curr_diff < 0) or (prev_diff < 0 and curr_diff > 0):
+                    direction_changes += 1
+            
+            if range_y > min_range and direction_changes >= self.min_direction_changes:
+                self.last_movement_time = current_time
+                self.last_positions = []
+                return score, {"rep": True}
+        return score, {"rep": False}
+
+
+class TrajectoryScorer(Scorer):
+    """Scores whole repetitions against a reference trajectory with streaming DTW.
+
+    Frames are sampled at `rate` Hz (the reference's rate), normalized to
+    the hips and torso length, and fed to a StreamingSubsequenceDTW. Score
+    is the live similarity to the closest point of the reference.
+    Feedback: "rep" is True on the frame a repetition is recognised, with
+    "rep_score" (0-100, how closely the whole movement followed the
+    reference), "tempo" (duration relative to the reference), "reps" and
+    "progress" (0-1 through the reference).
+
+    With `mirror` the reference's left/right mirror is matched too, one
+    DTW per side, so a repetition done with the other leg counts the same.
+    `dtw` is the side closest to the live pose and `mirrored` says which.
+    """
+
+    def __init__(self, keyframes, joints, rate=10.0, base_pose=None, weights=None, scale=2.0, mirror=True,
+                 **dtw_options):
+        self.joints = list(joints)
+        self.rate = rate
+        self.scale = scale
+        sides = [(keyframes, base_pose, weights)]
+        if mirror:
+            # Each joint keeps the weight of its counterpart on the authored side
+            weight_of = dict(zip(self.joints, weights)) if weights is not None else {}
+            sides.append(([dict(k, pose=swap_sides(k["pose"])) for k in keyframes],
+                          swap_sides(base_pose) if base_pose else None,
+                          [weight_of.get(MIRROR_INDEX.get(j, j), weight_of[j]) for j in self.joints]
+                          if weights is not None else None))
+        self.dtws = []
+        for side_keyframes, side_base, side_weights in sides:
+            reference = normalize_poses(sample_keyframes(side_keyframes, self.joints, rate, side_base), self.joints)
+            self.dtws.append(StreamingSubsequenceDTW(reference, side_weights, **dtw_options))
+        self.reset()
+
+    @classmethod
+    def from_exercise(cls, exercise, **options):
+        """Scorer for an EXERCISE_LIBRARY entry with a "reference_trajectory", else None."""
+        if not exercise.get("reference_trajectory"):
+            return None
+        joints = exercise.get("target_joints") or sorted(exercise["reference_pose"])
+        key_points = set(exercise.get("key_alignment_points", []))
+        weights = [2.0 if j in key_points else 1.0 for j in joints]
+        return cls(exercise["reference_trajectory"], joints, base_pose=exercise["reference_pose"],
+                   weights=weights, **options)
+
+    def reset(self):
+        for dtw in self.dtws:
+            dtw.reset()
+        self.dtw = self.dtws[0]
+        self.mirrored = False
+        self.next_sample = None
+        self.reps = 0
+        self.last_rep_score = None
+        self.last_tempo = None
+        self.last_score = 0
+
+    def feedback(self, rep):
+        return {"rep": rep, "rep_score": self.last_rep_score, "tempo": self.last_tempo,
+                "reps": self.reps, "progress": self.dtw.progress()}
+
+    def score(self, landmarks, frame_shape=None, timestamp=None):
+        timestamp = timestamp or time.time()
+        if self.next_sample is not None and timestamp < self.next_sample:
+            return self.last_score, self.feedback(False)
+        period = 1.0 / self.rate
+        # Stay on the sampling grid, but don't try to catch up after a gap
+        if self.next_sample is None or timestamp - self.next_sample > period:
+            self.next_sample = timestamp + period
+        else:
+            self.next_sample += period
+
+        current = landmarks_to_dict(landmarks)
+        if not all(j in current for j in self.joints):
+            return 0, self.feedback(False)
+        frame = normalize_poses(np.array([current[j] for j in self.joints], dtype=np.float64), self.joints)
+        matches = [dtw.step(frame) for dtw in self.dtws]
+        closest = min(range(len(self.dtws)), key=lambda s: self.dtws[s].last_distance.min())
+        self.dtw = self.dtws[closest]
+        self.mirrored = closest == 1
+        self.last_score = max(0.0, 100 * (1 - float(self.dtw.last_distance.min()) * self.scale))
+        found = [s for s, match in enumerate(matches) if match is not None]
+        if not found:
+            return self.last_score, self.feedback(False)
+        side = min(found, key=lambda s: matches[s][0])
+        mean_cost, start, end = matches[side]
+        # One repetition, whichever side it matched: the other side starts over
+        for s, dtw in enumerate(self.dtws):
+            if s != side:
+                dtw.reset()
+        self.reps += 1
+        self.last_rep_score = round(max(0.0, 100 * (1 - mean_cost * self.scale)), 1)
+        self.last_tempo = round((end - start + 1) / self.dtws[side].length, 2)
+        return self.last_score, self.feedback(True)
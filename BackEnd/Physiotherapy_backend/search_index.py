@@ -0,0 +1,188 @@
+import math
+import re
+import time
+from collections import defaultdict
+
+# Result kinds, in the order they rank when nothing else separates them
+SURGERY, EXERCISE, PURPOSE = "surgery", "exercise", "purpose"
+KIND_WEIGHT = {SURGERY: 3.0, EXERCISE: 2.0, PURPOSE: 1.0}
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def trigrams(token, closed=True):
+    """Character trigrams of a padded token; `closed=False` leaves out the end (for partly typed words)."""
+    padded = f"  {token} " if closed else f"  {token}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrieNode:
+    __slots__ = ("children", "docs", "doc_set")
+
+    def __init__(self):
+        self.children = {}
+        self.docs = []       # Every document with a word starting here, best ranked first
+        self.doc_set = None
+
+
+class SearchIndex:
+    """Typeahead search over surgeries, exercises and purposes.
+
+    Built once: every word of every document goes into a prefix trie whose
+    nodes list their documents already in rank order (kind, then how often
+    the dataset mentions it), and every distinct word into trigram
+    postings. A query walks the trie for each word (the last one may be
+    partly typed) and intersects the sets; when that finds fewer than `k`
+    results, words that share enough trigrams with the query words fill in,
+    which tolerates typos.
+    """
+
+    def __init__(self, documents, fuzzy_threshold=0.5):
+        # documents: [(kind, name, target, popularity)]
+        weights = [KIND_WEIGHT.get(kind, 0.0) + math.log1p(popularity) for kind, _, _, popularity in documents]
+        order = sorted(range(len(documents)), key=lambda d: (-weights[d], documents[d][1]))
+        self.documents = [documents[d] for d in order]   # Document id = rank
+        self.fuzzy_threshold = fuzzy_threshold
+        self.root = TrieNode()
+        self.word_docs = defaultdict(list)
+        for doc, (_, name, _, _) in enumerate(self.documents):
+            for word in dict.fromkeys(tokenize(name)):
+                self.word_docs[word].append(doc)
+                node = self.root
+                for char in word:
+                    node = node.children.setdefault(char, TrieNode())
+                    if not node.docs or node.docs[-1] != doc:
+                        node.docs.append(doc)
+        self.freeze(self.root)
+        self.words = list(self.word_docs)
+        self.postings = defaultdict(list)
+        for w, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.postings[gram].append(w)
+
+    def freeze(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            node.docs = tuple(node.docs)
+            node.doc_set = frozenset(node.docs)
+            stack.extend(node.children.values())
+
+    @classmethod
+    def from_sources(cls, recommendations, library=None, **options):
+        """Surgeries, exercises and plan purposes from a RecommendationIndex plus exercise library names."""
+        documents = []
+        for surgery, plans in recommendations.plans.items():
+            rows = recommendations.row_counts.get(surgery, 0)
+            documents.append((SURGERY, surgery, surgery, rows))
+            for plan in plans:
+                documents.append((PURPOSE, plan['purpose'], surgery, rows))
+        names = set(recommendations.surgeries_for)
+        for exercise, surgeries in recommendations.surgeries_for.items():
+            documents.append((EXERCISE, exercise, exercise,
+                              sum(recommendations.row_counts.get(s, 0) for s in surgeries)))
+        for name in library or {}:
+            if name not in names:
+                documents.append((EXERCISE, name, name, 0))
+        return cls(documents, **options)
+
+    def find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def fuzzy_words(self, word):
+        """{word index: similarity} for indexed words sharing enough trigrams with a (possibly partial) word."""
+        grams = trigrams(word, closed=False)
+        counts = defaultdict(int)
+        for gram in grams:
+            for w in self.postings.get(gram, ()):
+                counts[w] += 1
+        return {w: n / len(grams) for w, n in counts.items() if n / len(grams) >= self.fuzzy_threshold}
+
+    def search(self, query, k=8):
+        """Top `k` matches as [{kind, name, target, match}], match being "prefix" or "fuzzy"."""
+        words = tokenize(query)
+        if not words or k <= 0:
+            return []
+        nodes = [self.find(word) for word in words]
+        results = []
+        if all(nodes):
+            # Walk the smallest list (already in rank order) and keep what every other word matches too
+            nodes.sort(key=lambda node: len(node.docs))
+            for doc in nodes[0].docs:
+                if all(doc in node.doc_set for node in nodes[1:]):
+                    results.append((doc, "prefix"))
+                    if len(results) == k:
+                        break
+        if len(results) < k:
+            results += self.fuzzy_search(words, k - len(results), {doc for doc, _ in results})
+        return [{'kind': self.documents[doc][0], 'name': self.documents[doc][1],
+                 'target': self.documents[doc][2], 'match': match} for doc, match in results]
+
+    def fuzzy_search(self, words, k, exclude):
+        """Documents where every query word matches by prefix or by trigrams, best total similarity first."""
+        totals = None
+        for word in words:
+            scores = {}
+            node = self.find(word)
+            for doc in node.docs if node else ():
+                scores[doc] = 1.0
+            if len(word) >= 3:
+                for w, similarity in self.fuzzy_words(word).items():
+                    for doc in self.word_docs[self.words[w]]:
+                        if similarity > scores.get(doc, 0.0):
+                            scores[doc] = similarity
+            if totals is None:
+                totals = scores
+            else:
+                totals = {doc: total + scores[doc] for doc, total in totals.items() if doc in scores}
+            if not totals:
+                return []
+        ranked = sorted((doc for doc in totals if doc not in exclude), key=lambda doc: (-totals[doc], doc))
+        return [(doc, "fuzzy") for doc in ranked[:k]]
+
+
+def benchmark(index, queries, k=8, repeat=5):
+    """Latency of `index.search` over `queries` in microseconds (mean, p50, p99, max)."""
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, k)
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return {'queries': len(timings), 'mean_us': round(sum(timings) / len(timings), 1),
+            'p50_us': round(timings[len(timings) // 2], 1), 'p99_us': round(timings[int(len(timings) * 0.99)], 1),
+            'max_us': round(timings[-1], 1)}
+
+def keystroke_queries(names):
+    """Every prefix of every name (as typed), plus each name with one letter dropped (a typo)."""
+    queries = []
+    for name in names:
+        queries += [name[:n] for n in range(1, len(name) + 1)]
+        queries += [name[:n] + name[n + 1:] for n in range(1, len(name), 3)]
+    return queries
+
+
+if __name__ == "__main__":
+    # Micro-benchmark over the full dataset: python search_index.py [path/to/dataset.csv]
+    import os
+    import sys
+    from exercise_data import EXERCISE_LIBRARY
+    from recommendations import RecommendationIndex
+
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', '..', 'FrontEnd', 'healthApp', 'assets', 'dataset.csv')
+    started = time.perf_counter()
+    recommendations = RecommendationIndex.from_csv(sys.argv[1] if len(sys.argv) > 1 else default, EXERCISE_LIBRARY)
+    index = SearchIndex.from_sources(recommendations, EXERCISE_LIBRARY)
+    print(f"Indexed {len(index.documents)} documents from {recommendations.stats['rows']} rows "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    queries = keystroke_queries([name for _, name, _, _ in index.documents])
+    print(benchmark(index, queries))
+    for query in ("knee", "heel sl", "stright leg", "rotater cuf"):
+        print(query, "->", [result['name'] for result in index.search(query, 3)])
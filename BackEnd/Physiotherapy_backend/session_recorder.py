@@ -0,0 +1,178 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+def landmarks_to_rows(landmarks, digits=4):
+    """Plain [[x, y, z, visibility], ...] lists for a landmark list or {index: [x, y, z]} dict."""
+    if landmarks is None:
+        return None
+    if isinstance(landmarks, dict):
+        return {str(i): [round(v, digits) for v in point] for i, point in landmarks.items()}
+    return [[round(lm.x, digits), round(lm.y, digits), round(lm.z, digits),
+             round(getattr(lm, 'visibility', 0.0), digits)] for lm in landmarks.landmark]
+
+
+class SessionRecorder:
+    """Records a session to video on a background encoder thread.
+
+    `record()` never blocks the caller: the frame is copied into one of a
+    fixed pool of buffers and queued; when the queue or the pool is full
+    the frame is dropped and counted instead. The encoder thread writes
+    the video, starts a new segment once the current one exceeds
+    `max_seconds` or `max_bytes`, and writes one JSON line per frame
+    (timestamp, frame index, landmarks, score) into a sidecar file next to
+    each segment.
+    """
+
+    def __init__(self, directory="recordings", fps=15.0, fourcc="mp4v", extension=".mp4",
+                 max_seconds=300.0, max_bytes=200 * 1024 * 1024, queue_size=30):
+        self.directory = directory
+        self.fps = fps
+        self.fourcc = fourcc
+        self.extension = extension
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.pool = []            # Free frame buffers
+        self.pool_shape = None
+        self.pool_size = queue_size + 2
+        self.pool_lock = threading.Lock()
+        self.session = None
+        self.thread = None
+        self.last_accepted = 0.0
+        self.writer = None
+        self.sidecar = None
+        self.segment = 0
+        self.segment_path = None
+        self.segment_start = None
+        self.segment_frames = 0
+        self.frame_size = None
+        self.segments = []
+        self.stats = {'recorded': 0, 'dropped': 0, 'skipped': 0}
+
+    @property
+    def active(self):
+        return self.thread is not None
+
+    def start(self, session_name=None):
+        if self.active:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.session = session_name or time.strftime("session_%Y%m%d_%H%M%S")
+        self.segment = 0
+        self.thread = threading.Thread(target=self.run, name="session-recorder", daemon=True)
+        self.thread.start()
+        print(f"Recording to {os.path.join(self.directory, self.session)}*")
+
+    def record(self, frame, timestamp, landmarks=None, score=None, extra=None):
+        """Queue a frame (raw or annotated) with its sidecar data; returns False if it was dropped."""
+        if not self.active:
+            return False
+        # Frames beyond the recording rate are skipped before any copying (with some slack for jitter)
+        if self.fps and timestamp - self.last_accepted < 0.9 / self.fps:
+            self.stats['skipped'] += 1
+            return False
+        buffer = self.take_buffer(frame.shape)
+        if buffer is None:
+            self.stats['dropped'] += 1
+            return False
+        np.copyto(buffer, frame)
+        # Landmark lists may be updated in place later (propagation), so they are copied out now
+        item = (buffer, timestamp, landmarks_to_rows(landmarks), score, extra)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.give_buffer(buffer)
+            self.stats['dropped'] += 1
+            return False
+        self.last_accepted = timestamp
+        return True
+
+    def take_buffer(self, shape):
+        with self.pool_lock:
+            if shape != self.pool_shape:
+                # Resolution changed: buffers of the old shape are simply not returned to the pool
+                self.pool_shape = shape
+                self.pool = [np.empty(shape, dtype=np.uint8) for _ in range(self.pool_size)]
+            return self.pool.pop() if self.pool else None
+
+    def give_buffer(self, buffer):
+        with self.pool_lock:
+            if buffer.shape == self.pool_shape:
+                self.pool.append(buffer)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            buffer, timestamp, landmarks, score, extra = item
+            try:
+                self.write(buffer, timestamp, landmarks, score, extra)
+            except Exception as e:
+                print(f"Error recording frame: {e}")
+            finally:
+                self.give_buffer(buffer)
+        self.close_segment()
+
+    def write(self, frame, timestamp, landmarks, score, extra):
+        if self.writer is None or self.should_rotate(timestamp):
+            self.open_segment(frame, timestamp)
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size)
+        self.writer.write(frame)
+        record = {'t': round(timestamp, 4), 'frame': self.segment_frames}
+        if score is not None:
+            record['score'] = round(float(score), 2)
+        if landmarks is not None:
+            record['landmarks'] = landmarks
+        if extra:
+            record.update(extra)
+        self.sidecar.write(json.dumps(record) + "\n")
+        self.segment_frames += 1
+        self.stats['recorded'] += 1
+
+    def should_rotate(self, timestamp):
+        if self.max_seconds and timestamp - self.segment_start >= self.max_seconds:
+            return True
+        # Checking the file size every second of video is plenty
+        if self.max_bytes and self.segment_frames % max(1, int(self.fps or 30)) == 0:
+            return os.path.exists(self.segment_path) and os.path.getsize(self.segment_path) >= self.max_bytes
+        return False
+
+    def open_segment(self, frame, timestamp):
+        self.close_segment()
+        self.segment += 1
+        base = os.path.join(self.directory, f"{self.session}_{self.segment:03d}")
+        self.segment_path = base + self.extension
+        self.frame_size = (frame.shape[1], frame.shape[0])
+        self.writer = cv2.VideoWriter(self.segment_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                      self.fps or 30.0, self.frame_size)
+        self.sidecar = open(base + ".jsonl", "w")
+        self.segment_start = timestamp
+        self.segment_frames = 0
+        self.segments.append(self.segment_path)
+
+    def close_segment(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.sidecar is not None:
+            self.sidecar.close()
+            self.sidecar = None
+
+    def stop(self):
+        """Finish writing everything already queued, then close the files."""
+        if not self.active:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def metrics(self):
+        return dict(self.stats, queued=self.queue.qsize(), segments=list(self.segments))
@@ -0,0 +1,320 @@
+import multiprocessing
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from frame_buffers import RgbBuffer
+
+Landmark = namedtuple("Landmark", "x y z visibility")
+
+class LandmarkList:
+    """Minimal stand-in for a MediaPipe landmark list built from a shared array."""
+
+    def __init__(self, array):
+        self.landmark = [Landmark(*map(float, row)) for row in array]
+
+
+def landmark_rows(landmark_list):
+    """(N, 4) float32 array of x, y, z, visibility."""
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmark_list.landmark], dtype=np.float32)
+
+
+class FrameRing:
+    """Fixed ring of frame slots in one `multiprocessing.shared_memory` block.
+
+    Layout: latest sequence number, then per-slot sequence numbers and
+    timestamps, then the frames. A slot's sequence number is -1 while it
+    is being written; readers take a view straight into shared memory and
+    call `still_valid` afterwards to make sure the writer hasn't lapped
+    them (seqlock style), so frames are never pickled or copied out.
+    """
+
+    def __init__(self, shape, slots, name=None, create=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        self.meta_bytes = 8 * (1 + 2 * slots)
+        self.shm = shared_memory.SharedMemory(name=name, create=create,
+                                              size=self.meta_bytes + slots * frame_bytes)
+        buf = self.shm.buf
+        self.latest = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self.slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8)
+        self.slot_time = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 + 8 * slots)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=self.meta_bytes)
+        if create:
+            self.latest[0] = 0
+            self.slot_seq[:] = 0
+
+    @property
+    def spec(self):
+        """Picklable description for attaching from another process."""
+        return (self.shm.name, self.shape, self.slots)
+
+    @classmethod
+    def attach(cls, name, shape, slots):
+        return cls(shape, slots, name=name)
+
+    def write(self, frame, timestamp):
+        """Copy (or resize) one frame into the next slot and publish it."""
+        seq = int(self.latest[0]) + 1
+        slot = seq % self.slots
+        self.slot_seq[slot] = -1
+        target = self.frames[slot]
+        if frame.shape == self.shape:
+            np.copyto(target, frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=target)
+        self.slot_time[slot] = timestamp
+        self.slot_seq[slot] = seq
+        self.latest[0] = seq
+        return seq
+
+    def read(self, seq):
+        """(view, timestamp) for frame `seq`, or None if it has been overwritten."""
+        slot = seq % self.slots
+        if self.slot_seq[slot] != seq:
+            return None
+        return self.frames[slot], float(self.slot_time[slot])
+
+    def still_valid(self, seq):
+        return self.slot_seq[seq % self.slots] == seq
+
+    def close(self):
+        # Drop the numpy views before closing the mapping
+        self.latest = self.slot_seq = self.slot_time = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class LandmarkBoard:
+    """Latest landmarks in a small shared array, guarded by a version counter.
+
+    Writers bump `version` to odd, write, then bump it to even; readers
+    retry until they see the same even version before and after copying.
+    Only results for newer frames than the one already on the board are
+    accepted, so several workers can publish in any order. A writer that
+    died mid-publish leaves the version odd: reads give up after
+    `max_retries` and the next publish starts from an even version again.
+    """
+
+    def __init__(self, max_landmarks, name=None, create=False):
+        self.max_landmarks = max_landmarks
+        size = 8 * 4 + 8 * 2 + 4 * 4 * max_landmarks
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        buf = self.shm.buf
+        # version, frame_seq, count, publishes
+        self.header = np.ndarray((4,), dtype=np.int64, buffer=buf, offset=0)
+        # frame timestamp, inference latency
+        self.times = np.ndarray((2,), dtype=np.float64, buffer=buf, offset=32)
+        self.rows = np.ndarray((max_landmarks, 4), dtype=np.float32, buffer=buf, offset=48)
+        if create:
+            self.header[:] = 0
+            self.times[:] = 0
+
+    @property
+    def spec(self):
+        return (self.shm.name, self.max_landmarks)
+
+    @classmethod
+    def attach(cls, name, max_landmarks):
+        return cls(max_landmarks, name=name)
+
+    def publish(self, frame_seq, timestamp, rows, latency, lock, timeout=1.0):
+        # Bounded wait: a worker killed while holding the lock never releases it
+        if not lock.acquire(timeout=timeout):
+            return False
+        try:
+            if frame_seq <= self.header[1]:
+                return False
+            if self.header[0] % 2:
+                self.header[0] += 1   # Left odd by a writer that died mid-publish
+            self.header[0] += 1
+            count = 0 if rows is None else min(len(rows), self.max_landmarks)
+            if count:
+                self.rows[:count] = rows[:count]
+            self.header[1] = frame_seq
+            self.header[2] = count
+            self.header[3] += 1
+            self.times[0] = timestamp
+            self.times[1] = latency
+            self.header[0] += 1
+        finally:
+            lock.release()
+        return True
+
+    def read(self, max_retries=1000):
+        """(frame_seq, timestamp, latency, rows copy or None), or None if no consistent copy could be made."""
+        for _ in range(max_retries):
+            version = int(self.header[0])
+            if version % 2:
+                time.sleep(0)
+                continue
+            frame_seq, count = int(self.header[1]), int(self.header[2])
+            timestamp, latency = float(self.times[0]), float(self.times[1])
+            rows = self.rows[:count].copy() if count else None
+            if int(self.header[0]) == version:
+                return frame_seq, timestamp, latency, rows
+        return None
+
+    def close(self):
+        self.header = self.times = self.rows = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def capture_loop(ring_spec, source_factory, source_kwargs, stop_event, max_fps):
+    """Capture process: read the camera and write frames into the ring."""
+    ring = FrameRing.attach(*ring_spec)
+    source = source_factory(**source_kwargs)
+    try:
+        while not stop_event.is_set():
+            loop_start = time.time()
+            ok, frame, timestamp = source.read()
+            if not ok:
+                time.sleep(0.01)
+                continue
+            ring.write(frame, timestamp)
+            if max_fps:
+                time.sleep(max(0.0, 1.0 / max_fps - (time.time() - loop_start)))
+    finally:
+        source.release()
+        ring.close()
+
+
+def inference_loop(index, workers, ring_spec, board_spec, pipeline_factory, pipeline_kwargs, lock, stop_event):
+    """Inference worker: take the newest frame assigned to this worker, publish its landmarks."""
+    ring = FrameRing.attach(*ring_spec)
+    board = LandmarkBoard.attach(*board_spec)
+    pipeline = pipeline_factory(**pipeline_kwargs)
+    rgb = RgbBuffer()
+    last_seq = 0
+    try:
+        while not stop_event.is_set():
+            latest = int(ring.latest[0])
+            # Newest frame whose sequence number belongs to this worker
+            seq = latest - ((latest - index) % workers)
+            if seq <= last_seq:
+                time.sleep(0.002)
+                continue
+            entry = ring.read(seq)
+            if entry is None:
+                last_seq = seq
+                continue
+            frame, timestamp = entry
+            image_rgb = rgb.convert(frame)  # Reads the shared slot directly
+            if not ring.still_valid(seq):
+                last_seq = seq  # Capture lapped us mid-read; skip to a newer frame
+                continue
+            started = time.time()
+            try:
+                results = pipeline.process(image_rgb)
+            except Exception as e:
+                print(f"Error processing frame in worker {index}: {e}")
+                results = None
+            landmarks = getattr(results, pipeline.primary, None) if results else None
+            board.publish(seq, timestamp, landmark_rows(landmarks) if landmarks is not None else None,
+                          time.time() - started, lock)
+            last_seq = seq
+    finally:
+        pipeline.close()
+        board.close()
+        ring.close()
+
+
+class MultiprocessInferenceBackend:
+    """Capture in one process, MediaPipe in `workers` processes, results in shared memory.
+
+    Frames go through a `FrameRing` and landmarks come back through a
+    `LandmarkBoard`, so nothing is pickled per frame. Factories must be
+    picklable (module-level classes or functions) since the pipeline and
+    camera are built inside the child processes. Children are spawned by
+    default, so they re-import the parent's main module: keep its
+    import-time code free of side effects.
+    """
+
+    def __init__(self, pipeline_factory, pipeline_kwargs=None, source_factory=None, source_kwargs=None,
+                 frame_size=(640, 480), slots=4, workers=2, max_landmarks=33, max_fps=None, context="spawn"):
+        if source_factory is None:
+            from frame_sources import CameraSource
+            source_factory = CameraSource
+        self.pipeline_factory = pipeline_factory
+        self.pipeline_kwargs = pipeline_kwargs or {}
+        self.source_factory = source_factory
+        self.source_kwargs = source_kwargs or {'index': 0, 'size': frame_size}
+        self.frame_shape = (frame_size[1], frame_size[0], 3)
+        self.slots = slots
+        self.workers = workers
+        self.max_landmarks = max_landmarks
+        self.max_fps = max_fps
+        self.ctx = multiprocessing.get_context(context)
+        self.ring = None
+        self.board = None
+        self.processes = []
+        self.stop_event = None
+        self.last_read = (0, 0.0, 0.0, None)
+
+    def read_board(self):
+        """The board's contents, or the last good read if a dead writer left it mid-publish."""
+        entry = self.board.read()
+        if entry is not None:
+            self.last_read = entry
+        return self.last_read
+
+    def start(self):
+        self.ring = FrameRing(self.frame_shape, self.slots, create=True)
+        self.board = LandmarkBoard(self.max_landmarks, create=True)
+        self.stop_event = self.ctx.Event()
+        lock = self.ctx.Lock()
+        self.processes = [self.ctx.Process(
+            target=capture_loop, name="frame-capture", daemon=True,
+            args=(self.ring.spec, self.source_factory, self.source_kwargs, self.stop_event, self.max_fps))]
+        for index in range(self.workers):
+            self.processes.append(self.ctx.Process(
+                target=inference_loop, name=f"inference-{index}", daemon=True,
+                args=(index, self.workers, self.ring.spec, self.board.spec, self.pipeline_factory,
+                      self.pipeline_kwargs, lock, self.stop_event)))
+        for process in self.processes:
+            process.start()
+
+    def latest_landmarks(self):
+        """(frame_seq, timestamp, LandmarkList or None) for the newest processed frame."""
+        frame_seq, timestamp, _, rows = self.read_board()
+        return frame_seq, timestamp, LandmarkList(rows) if rows is not None else None
+
+    def latest_frame(self):
+        """(seq, view, timestamp) of the newest captured frame; the view is only valid briefly."""
+        seq = int(self.ring.latest[0])
+        entry = self.ring.read(seq) if seq else None
+        if entry is None:
+            return seq, None, 0.0
+        return seq, entry[0], entry[1]
+
+    def stats(self):
+        frame_seq, _, latency, _ = self.read_board()
+        return {
+            'captured': int(self.ring.latest[0]),
+            'processed': int(self.board.header[3]),
+            'latest_processed_frame': frame_seq,
+            'inference_latency': round(latency, 4),
+        }
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        for shared in (self.ring, self.board):
+            if shared is not None:
+                shared.close()
+                shared.unlink()
+        self.ring = self.board = None
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+# Lower number = spoken first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class NullSpeechBackend:
+    """Backend that produces no sound; records what would have been spoken (for tests/headless runs)."""
+
+    def __init__(self):
+        self.spoken = []
+        self.rendered = []
+
+    def render(self, text):
+        self.rendered.append(text)
+        return text
+
+    def play(self, audio):
+        self.spoken.append(audio)
+
+    def say(self, text):
+        self.spoken.append(text)
+
+
+class Pyttsx3Backend:
+    """pyttsx3 speech. Prerendered phrases are saved as WAV files and played
+    with `simpleaudio` when it is installed; otherwise every phrase is
+    synthesized live."""
+
+    def __init__(self, rate=150, cache_dir=None):
+        import pyttsx3
+        self.engine = pyttsx3.init()
+        self.engine.setProperty('rate', rate)
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "physio_tts_cache")
+        try:
+            import simpleaudio
+            self.player = simpleaudio
+        except ImportError:
+            self.player = None
+            print("Warning: simpleaudio is not installed; speech cache disabled, every phrase is synthesized live")
+
+    def render(self, text):
+        if self.player is None:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, hashlib.sha1(text.encode("utf-8")).hexdigest() + ".wav")
+        if not os.path.exists(path):
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+        try:
+            return self.player.WaveObject.from_wave_file(path)
+        except Exception as e:
+            print(f"Could not load cached speech for '{text}': {e}")
+            return None
+
+    def play(self, audio):
+        audio.play().wait_done()
+
+    def say(self, text):
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+
+class SpeechQueue:
+    """Single long-lived speech worker fed by a small bounded priority queue.
+
+    - Messages older than their `max_age` when they reach the front are dropped.
+    - A message queued again while still waiting is coalesced with the queued one.
+    - A message with a `channel` replaces anything still queued on that channel,
+      so a new correction supersedes the previous, now out-of-date one.
+    - When the queue is full the least important (then oldest) message is dropped.
+    """
+
+    def __init__(self, backend, max_size=4, max_age=4.0):
+        self.backend = backend
+        self.max_size = max_size
+        self.max_age = max_age
+        self.pending = []          # Entries: [priority, seq, created, max_age, channel, text]
+        self.seq = 0
+        self.cache = {}            # text -> prerendered audio
+        self.to_render = []
+        self.condition = threading.Condition()
+        self.running = False
+        self.worker = None
+        self.stats = {'spoken': 0, 'cached_plays': 0, 'coalesced': 0,
+                      'superseded': 0, 'dropped_stale': 0, 'dropped_full': 0}
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.worker = threading.Thread(target=self._run, name="speech-worker", daemon=True)
+        self.worker.start()
+
+    def stop(self, timeout=2.0):
+        with self.condition:
+            self.running = False
+            self.pending = []
+            self.condition.notify()
+        if self.worker is not None:
+            self.worker.join(timeout)
+            self.worker = None
+
+    def prerender(self, phrases):
+        """Synthesize fixed phrases once (on the worker thread) and keep the audio."""
+        with self.condition:
+            for text in phrases:
+                if text not in self.cache and text not in self.to_render:
+                    self.to_render.append(text)
+            self.condition.notify()
+
+    def say(self, text, priority=PRIORITY_NORMAL, max_age=None, channel=None):
+        """Queue `text`. Returns False if it was coalesced or dropped."""
+        now = time.time()
+        with self.condition:
+            for entry in self.pending:
+                if entry[5] == text:
+                    # Same phrase already waiting: refresh it instead of queueing twice
+                    entry[0] = min(entry[0], priority)
+                    entry[2] = now
+                    self.stats['coalesced'] += 1
+                    return False
+            if channel is not None:
+                kept = [e for e in self.pending if e[4] != channel]
+                self.stats['superseded'] += len(self.pending) - len(kept)
+                self.pending = kept
+            if len(self.pending) >= self.max_size:
+                worst = max(self.pending, key=lambda e: (e[0], -e[1]))
+                if worst[0] < priority:
+                    self.stats['dropped_full'] += 1
+                    return False
+                self.pending.remove(worst)
+                self.stats['dropped_full'] += 1
+            self.seq += 1
+            self.pending.append([priority, self.seq, now,
+                                 self.max_age if max_age is None else max_age, channel, text])
+            self.condition.notify()
+            return True
+
+    def clear(self):
+        with self.condition:
+            self.pending = []
+
+    def _next(self):
+        """Pop the most important fresh message, discarding stale ones. Caller holds the lock."""
+        now = time.time()
+        fresh = []
+        for entry in self.pending:
+            if now - entry[2] > entry[3]:
+                self.stats['dropped_stale'] += 1
+            else:
+                fresh.append(entry)
+        self.pending = fresh
+        if not fresh:
+            return None
+        best = min(fresh, key=lambda e: (e[0], e[1]))
+        self.pending.remove(best)
+        return best[5]
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending and not self.to_render:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                render_text = self.to_render.pop(0) if self.to_render and not self.pending else None
+                text = None if render_text else self._next()
+            try:
+                if render_text is not None:
+                    self.cache[render_text] = self.backend.render(render_text)
+                elif text is not None:
+                    audio = self.cache.get(text)
+                    if audio is not None:
+                        self.backend.play(audio)
+                        self.stats['cached_plays'] += 1
+                    else:
+                        self.backend.say(text)
+                    self.stats['spoken'] += 1
+            except Exception as e:
+                print(f"Speech error: {e}")
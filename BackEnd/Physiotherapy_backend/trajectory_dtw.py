@@ -0,0 +1,139 @@
+import numpy as np
+
+def sample_keyframes(keyframes, joints, rate=10.0, base_pose=None):
+    """Resample [{"time": s, "pose": {index: [x, y, z]}}, ...] to a (T, len(joints), 3) array at `rate` Hz.
+
+    Poses are linearly interpolated between keyframes. Joints missing from
+    a keyframe are taken from `base_pose`, or from the previous keyframe
+    when there is no base pose.
+    """
+    times = [float(k["time"]) for k in keyframes]
+    base = {int(i): p for i, p in (base_pose or {}).items()}
+    poses = []
+    for k in keyframes:
+        pose = dict(base)
+        pose.update({int(i): p for i, p in k["pose"].items()})
+        poses.append(np.array([pose.get(j, [0, 0, 0]) for j in joints], dtype=np.float64))
+        if not base_pose:
+            base = pose
+    poses = np.array(poses)
+    samples = np.arange(times[0], times[-1] + 1e-9, 1.0 / rate)
+    flat = poses.reshape(len(poses), -1)
+    resampled = np.stack([np.interp(samples, times, flat[:, c]) for c in range(flat.shape[1])], axis=1)
+    return resampled.reshape(len(samples), len(joints), 3)
+
+
+def normalize_poses(poses, joints):
+    """Centre on the hips and scale by torso length when those joints are tracked.
+
+    Works on (..., len(joints), 3) arrays so one call handles a single
+    frame or a whole reference.
+    """
+    index = {j: n for n, j in enumerate(joints)}
+    if 23 in index and 24 in index:
+        hips = (poses[..., index[23], :] + poses[..., index[24], :]) / 2
+        poses = poses - hips[..., None, :]
+        if 11 in index and 12 in index:
+            shoulders = (poses[..., index[11], :] + poses[..., index[12], :]) / 2
+            torso = np.linalg.norm(shoulders[..., :2], axis=-1)
+            poses = poses / np.maximum(torso, 1e-3)[..., None, None]
+    return poses
+
+
+class StreamingSubsequenceDTW:
+    """Online open-begin/open-end DTW of a live stream against one reference.
+
+    Each `step(frame)` adds one query sample and updates a single column of
+    the cost matrix, so memory stays O(len(reference)) however long the
+    session runs. Reference progress per step is limited to 0, 1 or 2
+    samples (a slope constraint), which removes the horizontal dependency
+    and lets the whole column be computed with vectorized numpy. Advancing
+    two samples counts the distance twice, so skipping part of the
+    reference is never cheaper than performing it. Stalling costs
+    `stall_penalty`, and paths longer than `max_stretch` times the
+    reference are cut off. A complete path whose mean cost is under
+    `match_threshold` becomes a candidate; it is reported SPRING-style once
+    no overlapping path past the middle of the reference has a lower
+    cumulative cost (paths still in the first half belong to the next
+    repetition rather than competing for this one).
+    """
+
+    def __init__(self, reference, weights=None, stall_penalty=0.02, max_stretch=2.5, match_threshold=0.35):
+        self.reference = np.asarray(reference, dtype=np.float64)   # (T, K, 3)
+        self.length = len(self.reference)
+        k = self.reference.shape[1]
+        self.weights = np.ones(k) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.weights = self.weights / self.weights.sum()
+        self.axis_weights = np.array([1.0, 1.0, 0.5])  # Depth is the noisiest axis
+        self.stall_penalty = stall_penalty
+        self.max_length = int(np.ceil(self.length * max_stretch))
+        self.match_threshold = match_threshold
+        self.second_half = np.arange(self.length) >= self.length // 2
+        self.reset()
+
+    def reset(self):
+        n = self.length
+        self.cost = np.full(n, np.inf)
+        self.steps = np.zeros(n, dtype=np.int64)   # Path length (query samples) ending in each cell
+        self.weight = np.zeros(n)                  # Sum of step weights, for the mean cost
+        self.start = np.zeros(n, dtype=np.int64)   # Query index where each cell's path began
+        self.t = 0
+        self.candidate = None                      # (cumulative cost, mean cost, start, end)
+        self.last_distance = None
+
+    def distances(self, frame):
+        """Weighted distance from one (K, 3) frame to every reference sample, shape (T,)."""
+        diff = self.reference - frame[None, :, :]
+        per_joint = np.sqrt((diff * diff * self.axis_weights).sum(axis=2))
+        return per_joint @ self.weights
+
+    def step(self, frame):
+        """Add one query sample; returns a completed match (cost, start, end) or None."""
+        d = self.distances(np.asarray(frame, dtype=np.float64))
+        self.last_distance = d
+        t = self.t
+        prev_cost, prev_steps, prev_start, prev_weight = self.cost, self.steps, self.start, self.weight
+
+        # Candidates: stay (j), advance one (j-1) or advance two (j-2); a new path may start at j=0
+        stay = prev_cost + self.stall_penalty + d
+        one = np.concatenate(([0.0], prev_cost[:-1])) + d
+        two = np.concatenate(([np.inf, np.inf], prev_cost[:-2])) + 2 * d
+        options = np.stack([stay, one, two])
+        choice = options.argmin(axis=0)
+        cost = options[choice, np.arange(self.length)]
+
+        source = np.arange(self.length) - choice
+        from_new = source < 0
+        source = np.clip(source, 0, None)
+        steps = np.where(from_new, 1, prev_steps[source] + 1)
+        start = np.where(from_new, t, prev_start[source])
+        weight = np.where(from_new, 1.0, prev_weight[source] + np.maximum(choice, 1))
+
+        cost[steps > self.max_length] = np.inf
+        self.cost, self.steps, self.start, self.weight = cost, steps, start, weight
+        self.t = t + 1
+        return self.check_match()
+
+    def check_match(self):
+        """(mean cost, start, end) of a finished match, or None."""
+        total = self.cost[-1]
+        mean = total / max(1.0, self.weight[-1])
+        if mean <= self.match_threshold and (self.candidate is None or total < self.candidate[0]):
+            self.candidate = (float(total), float(mean), int(self.start[-1]), self.t - 1)
+        if self.candidate is None:
+            return None
+        total, mean, start, end = self.candidate
+        # Cumulative costs only grow, so an overlapping path already above the candidate can't beat it
+        overlapping = self.start <= end
+        if np.any(overlapping & self.second_half & (self.cost < total)):
+            return None
+        self.candidate = None
+        self.cost[overlapping] = np.inf
+        return mean, start, end
+
+    def progress(self):
+        """Fraction of the reference the best ongoing path has reached (0 when nothing is tracked)."""
+        normalized = self.cost / np.maximum(self.weight, 1.0)
+        if not np.isfinite(normalized).any():
+            return 0.0
+        return float(np.argmin(normalized)) / max(1, self.length - 1)
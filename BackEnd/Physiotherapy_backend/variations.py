@@ -0,0 +1,105 @@
+import numpy as np
+
+# Left/right landmark pairs of the MediaPipe pose model
+POSE_MIRROR_PAIRS = [(1, 4), (2, 5), (3, 6), (7, 8), (9, 10), (11, 12), (13, 14), (15, 16), (17, 18),
+                     (19, 20), (21, 22), (23, 24), (25, 26), (27, 28), (29, 30), (31, 32)]
+MIRROR_INDEX = {}
+for _left, _right in POSE_MIRROR_PAIRS:
+    MIRROR_INDEX[_left] = _right
+    MIRROR_INDEX[_right] = _left
+
+def swap_sides(pose):
+    """Same position done with the other side of the body: left and right landmarks trade places."""
+    return {MIRROR_INDEX.get(int(i), int(i)): p for i, p in pose.items()}
+
+def flip_facing(pose):
+    """Same position facing the other way: x reflected about the hips (or the frame centre)."""
+    if 23 in pose and 24 in pose:
+        centre = (pose[23][0] + pose[24][0]) / 2
+    else:
+        centre = 0.5
+    return {i: [2 * centre - p[0], p[1], p[2]] for i, p in pose.items()}
+
+def swap_side_name(name):
+    swapped = name.replace("left", "\0").replace("right", "left").replace("\0", "right")
+    return swapped if swapped != name else name + " (mirrored)"
+
+def compile_variations(reference_pose, names=None, variation_poses=None, mirror_facing=True):
+    """[(name, pose, side_swapped)] for every variation of a pose.
+
+    The first name labels `reference_pose`. Other names come from
+    `variation_poses` (joints overriding the reference) or, when they are
+    the left/right counterpart of an existing variation, are mirrored
+    automatically. Every variation also gets its left/right mirror and,
+    with `mirror_facing`, a copy facing the other way.
+    """
+    names = list(names or ["default"])
+    variation_poses = variation_poses or {}
+    compiled = {names[0]: (reference_pose, False)}
+    for name in names[1:]:
+        if name in variation_poses:
+            pose = dict(reference_pose)
+            pose.update({int(i): p for i, p in variation_poses[name].items()})
+            compiled[name] = (pose, False)
+    for name, (pose, swapped) in list(compiled.items()):
+        mirrored = swap_side_name(name)
+        if mirrored not in compiled:
+            compiled[mirrored] = (swap_sides(pose), not swapped)
+    if mirror_facing:
+        for name, (pose, swapped) in list(compiled.items()):
+            compiled[name + " (facing other way)"] = (flip_facing(pose), swapped)
+    return [(name, pose, swapped) for name, (pose, swapped) in compiled.items()]
+
+
+class VariationSet:
+    """Every variation of one pose stacked into a (V, K, 3) array, scored in one batch.
+
+    `weights` is a (V, K) array so side-specific emphasis (e.g. the raised
+    leg) follows the mirrored joints.
+    """
+
+    def __init__(self, variations, joint_weight=None):
+        self.names = [name for name, _, _ in variations]
+        self.poses = [pose for _, pose, _ in variations]
+        self.swapped = [swapped for _, _, swapped in variations]
+        self.joints = sorted(set().union(*[pose.keys() for pose in self.poses]))
+        self.reference = np.zeros((len(self.poses), len(self.joints), 3))
+        self.present = np.zeros((len(self.poses), len(self.joints)), dtype=bool)
+        self.weights = np.zeros((len(self.poses), len(self.joints)))
+        for v, (pose, swapped) in enumerate(zip(self.poses, self.swapped)):
+            for k, j in enumerate(self.joints):
+                if j in pose:
+                    self.reference[v, k] = pose[j][:3]
+                    self.present[v, k] = True
+                    # Weight as the joint's counterpart in the unmirrored pose
+                    base_joint = MIRROR_INDEX.get(j, j) if swapped else j
+                    self.weights[v, k] = joint_weight(base_joint) if joint_weight else 1.0
+        self.axis_weights = np.array([1.0, 1.0, 0.7])
+
+    def __len__(self):
+        return len(self.names)
+
+    def compare(self, current):
+        """`current` ({index: [x, y, z]}) against every variation.
+
+        Returns the weighted mean 3D distances, shape (V,), the reference
+        minus current offsets, shape (V, K, 3), and which joints were
+        compared, shape (V, K).
+        """
+        frame = np.zeros((len(self.joints), 3))
+        visible = np.zeros(len(self.joints), dtype=bool)
+        for k, j in enumerate(self.joints):
+            if j in current:
+                frame[k] = current[j][:3]
+                visible[k] = True
+        diff = self.reference - frame[None, :, :]
+        distances = np.sqrt((diff * diff * self.axis_weights).sum(axis=2))
+        compared = self.present & visible[None, :]
+        weights = self.weights * compared
+        total = weights.sum(axis=1)
+        mean = np.where(total > 0, (distances * weights).sum(axis=1) / np.maximum(total, 1e-9), np.inf)
+        return mean, diff, compared
+
+    def mean_distances(self, current):
+        """Weighted mean 3D distance of `current` to every variation, shape (V,)."""
+        return self.compare(current)[0]
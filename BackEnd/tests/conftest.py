@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules import each other by name, as main.py and combined_app.py do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Physiotherapy_backend'))
@@ -0,0 +1,43 @@
+import time
+
+from batch_ask import BatchAsker, FakeModel
+
+def asker(model, max_workers=8):
+    return BatchAsker(lambda query: {'response': model.generate_content("PROMPT\n" + query).text,
+                                     'answered_by': 'model'}, max_workers=max_workers)
+
+def test_duplicates_are_asked_once():
+    model = FakeModel(delay=0.01)
+    results = asker(model).run(["Knee pain?", "knee  PAIN?", "Swelling?"])
+    assert model.calls == 2
+    assert [item['index'] for item in results] == [0, 1, 2]
+    assert results[0]['response'] == results[1]['response']
+    assert results[1]['query'] == "knee  PAIN?"
+
+def test_failures_are_reported_per_item():
+    model = FakeModel(delay=0.01, fail_on="bad")
+    results = asker(model).run(["good question", "bad question"])
+    assert 'error' not in results[0] and results[0]['response'] == "[fake answer] good question"
+    assert "bad question" in results[1]['error'] and 'response' not in results[1]
+
+def test_unfinished_questions_time_out():
+    model = FakeModel(delay=0.5)
+    started = time.perf_counter()
+    results = asker(model).run(["slow one", "slow two"], timeout=0.1)
+    assert time.perf_counter() - started < 0.4
+    assert all(item['error'] == "Timed out after 0.1s" for item in results)
+
+def test_wall_time_follows_the_slowest_question():
+    model = FakeModel(delay=0.2)
+    queries = [f"question {n}" for n in range(30)]
+    started = time.perf_counter()
+    results = asker(model, max_workers=32).run(queries)
+    elapsed = time.perf_counter() - started
+    assert model.calls == 30 and all('response' in item for item in results)
+    # Sequentially this would take 30 x 0.2 = 6 s
+    assert elapsed < 0.6, elapsed
+
+def test_stream_yields_every_item_as_it_finishes():
+    model = FakeModel(delay=0.01)
+    items = list(asker(model).stream(["a?", "b?", "A?"]))
+    assert sorted(item['index'] for item in items) == [0, 1, 2]
@@ -0,0 +1,50 @@
+from chat_sessions import ChatSessions, estimate_tokens
+
+def test_old_turns_are_trimmed_into_the_summary():
+    store = ChatSessions(history_tokens=30, summary_tokens=20, turn_tokens=25)
+    session = store.get(now=0)
+    for n in range(4):
+        store.add(session, 'user', f"Question {n} about my knee? More detail follows here.")
+        store.add(session, 'assistant', f"Answer {n}.")
+    assert session.tokens <= 30
+    assert sum(tokens for _, _, tokens in session.turns) == session.tokens
+    assert session.summary and session.summary_tokens <= 20
+    # The newest gists are kept
+    assert session.summary[-1].startswith("Question")
+    context = session.context()
+    assert context.startswith("Earlier the patient asked about: ")
+    assert context.endswith("Assistant: Answer 3.")
+
+def test_long_turns_are_clipped():
+    store = ChatSessions(turn_tokens=10)
+    session = store.get(now=0)
+    store.add(session, 'user', "x" * 1000)
+    role, text, tokens = session.turns[0]
+    assert text.endswith("...") and tokens == estimate_tokens(text) <= 10
+
+def test_idle_sessions_expire():
+    store = ChatSessions(ttl=60)
+    first = store.get(now=0)
+    second = store.get(now=50)
+    assert store.get(first.id, now=55) is first
+    # Unknown or expired ids get a fresh session
+    assert store.get(second.id, now=200) is not second
+    assert store.get(first.id, now=200) is not first
+    assert store.stats()['evicted'] == {'expired': 2, 'capacity': 0}
+
+def test_least_recently_used_sessions_are_evicted():
+    store = ChatSessions(max_sessions=2)
+    a, b = store.get(now=0), store.get(now=1)
+    store.get(a.id, now=2)
+    store.get(now=3)
+    assert b.id not in store.sessions and a.id in store.sessions
+    assert store.stats() == {'sessions': 2, 'chars': 0, 'evicted': {'expired': 0, 'capacity': 1}}
+
+def test_memory_cap_keeps_the_session_in_use():
+    store = ChatSessions(max_chars=100, turn_tokens=1000, history_tokens=1000)
+    old, current = store.get(now=0), store.get(now=1)
+    store.add(old, 'user', "a" * 60)
+    store.add(current, 'user', "b" * 150)
+    assert list(store.sessions) == [current.id]
+    assert store.stats()['chars'] == 150
+    assert store.end(current.id) and store.stats()['chars'] == 0
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from exercise_data import EXERCISE_LIBRARY
+from exercise_index import REST_POSES, ExerciseIndex, ExerciseRecognizer
+from phase_tracker import exercise_keyframes
+from variations import swap_sides
+
+def landmarks_from(pose, noise=0.0, rng=None):
+    points = [[0.5, 0.5, 0.0]] * 33
+    for idx, p in pose.items():
+        points[idx] = np.add(p, rng.normal(0, noise, 3) * [1, 1, 0.5]) if noise else p
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z, visibility=1.0) for x, y, z in points])
+
+def suggestion_for(pose, frames=30, noise=0.02):
+    recognizer = ExerciseRecognizer(ExerciseIndex(EXERCISE_LIBRARY), time_budget=1.0)
+    rng = np.random.default_rng(0)
+    for _ in range(frames):
+        suggestion = recognizer.update(landmarks_from(pose, noise, rng))
+    return suggestion
+
+def test_start_keyframe_shared_with_standing_is_a_rest_keyframe():
+    index = ExerciseIndex(EXERCISE_LIBRARY)
+    assert index.rest_keyframes == {("Straight Leg Raises", 0)}
+    assert index.nearest(REST_POSES["standing, facing the camera"])[:2] == (None, None)
+
+def test_standing_suggests_nothing():
+    for pose in REST_POSES.values():
+        assert suggestion_for(pose) == (None, 0.0)
+    start = exercise_keyframes(EXERCISE_LIBRARY["Straight Leg Raises"])[0]["pose"]
+    assert suggestion_for(start)[0] is None
+
+def test_raised_leg_is_recognised_on_either_side():
+    raised = exercise_keyframes(EXERCISE_LIBRARY["Straight Leg Raises"])[2]["pose"]
+    for pose in (raised, swap_sides(raised)):
+        name, share = suggestion_for(pose)
+        assert name == "Straight Leg Raises" and share >= 0.9
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import landmark_propagator
+from landmark_propagator import LandmarkPropagator
+
+WIDTH, HEIGHT = 320, 240
+STEP = 4  # Pixels the texture moves per frame
+
+def textured_frame(shift, texture):
+    """The texture translated `shift` pixels to the right, as a BGR frame."""
+    frame = np.roll(texture, shift, axis=1)
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+def landmarks_at(points):
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x / WIDTH, y=y / HEIGHT, z=0.0, visibility=1.0)
+                                     for x, y in points])
+
+
+def random_texture():
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (HEIGHT, WIDTH), dtype=np.uint8), (5, 5), 0)
+
+def test_propagation_follows_moving_texture(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(landmark_propagator.time, "time", lambda: clock.now)
+    texture = random_texture()
+    start = np.array([[100.0, 80.0], [160.0, 120.0], [200.0, 160.0]])
+
+    propagator = LandmarkPropagator(inference_interval=100, motion_threshold=255.0)
+    propagator.prepare(textured_frame(0, texture))
+    propagator.on_inference(landmarks_at(start))
+
+    errors = []
+    for frame in range(1, 10):
+        clock.now += 1 / 30
+        propagator.prepare(textured_frame(frame * STEP, texture))
+        result = propagator.propagate()
+        tracked = np.array([(lm.x * WIDTH, lm.y * HEIGHT) for lm in result.landmark])
+        errors.append(np.abs(tracked[:, 0] - (start[:, 0] + frame * STEP)).max())
+    # Flow measures one frame of motion per frame; it must not be added on top of the prediction
+    assert max(errors) < 2.0, errors
+
+def test_other_landmark_sets_are_propagated_too(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(landmark_propagator.time, "time", lambda: clock.now)
+    texture = random_texture()
+    pose = landmarks_at([[100.0, 80.0], [160.0, 120.0]])
+    hand = landmarks_at([[220.0, 100.0], [230.0, 110.0]])
+    for lm in hand.landmark:
+        lm.visibility = 0.0  # Hand landmarks have no visibility
+
+    propagator = LandmarkPropagator(inference_interval=100, motion_threshold=255.0)
+    propagator.prepare(textured_frame(0, texture))
+    # Hands-only results list the same hand under two names
+    propagator.on_inference(pose, {"left_hand_landmarks": hand, "hand_landmarks": hand})
+    for frame in range(1, 4):
+        clock.now += 1 / 30
+        propagator.prepare(textured_frame(frame * STEP, texture))
+        propagator.propagate()
+    propagated = propagator.extra["left_hand_landmarks"]
+    assert propagator.extra["hand_landmarks"] is propagated and propagated is not hand
+    tracked = np.array([lm.x * WIDTH for lm in propagated.landmark])
+    assert np.abs(tracked - (np.array([220.0, 230.0]) + 3 * STEP)).max() < 2.0
+    # The model's own landmarks are left as they were
+    assert hand.landmark[0].x * WIDTH == 220.0
@@ -0,0 +1,60 @@
+from reminder_scheduler import ReminderScheduler
+
+DAY = 86400
+START = 1_700_000_000.0
+
+def scheduler():
+    return ReminderScheduler(clock=lambda: START)
+
+def test_stalled_daily_reminder_fires_once_with_missed_count():
+    reminders = scheduler()
+    calls = []
+    reminders.subscribe(lambda *args: calls.append(args))
+    data = {"title": "Leg raises", "due": START, "repeat": "daily"}
+    reminders.add("r1", data, now=START)
+    fired = reminders.fire_due(now=START + 2.5 * DAY)
+    assert fired == [("r1", data, START, 2)]
+    assert calls == fired
+    assert reminders.next_due() == START + 3 * DAY
+    assert reminders.fire_due(now=START + 2.9 * DAY) == []
+
+def test_missed_count_stops_at_until():
+    reminders = scheduler()
+    reminders.add("r1", {"due": START, "repeat": "daily", "until": START + 3 * DAY}, now=START)
+    [(_, _, due, missed)] = reminders.fire_due(now=START + 10 * DAY)
+    assert (due, missed) == (START, 3)
+    assert reminders.next_due() is None
+
+def test_due_within_expands_recurring_reminders_inside_the_window():
+    reminders = scheduler()
+    reminders.add("hourly", {"due": START + 600, "repeat": "hourly"}, now=START)
+    reminders.add("every-20", {"due": START, "repeat": {"every_minutes": 20}}, now=START)
+    reminders.add("later", {"due": START + DAY}, now=START)
+    upcoming = reminders.due_within(2 * 3600, now=START)
+    assert [(item['id'], item['due'] - START) for item in upcoming] == [
+        ("every-20", 0), ("hourly", 600), ("every-20", 1200), ("every-20", 2400), ("every-20", 3600),
+        ("hourly", 4200), ("every-20", 4800), ("every-20", 6000), ("every-20", 7200)]
+    # Only the next occurrence of each reminder is stored
+    assert len(reminders.heap) == 3
+
+def test_re_adding_a_reminder_cancels_its_old_time():
+    reminders = scheduler()
+    reminders.add("r1", {"due": START + 100}, now=START)
+    reminders.add("r1", {"due": START + 200}, now=START)
+    assert reminders.due_within(300, now=START) == [{'id': "r1", 'due': START + 200, 'reminder': {"due": START + 200}}]
+    assert reminders.fire_due(now=START + 150) == []
+    assert reminders.fire_due(now=START + 250) == [("r1", {"due": START + 200}, START + 200, 0)]
+    assert reminders.next_due() is None
+
+def test_checking_a_reminder_cancels_it():
+    reminders = scheduler()
+    assert reminders.add("r1", {"due": START + 100, "repeat": "daily"}, now=START)
+    assert not reminders.add("r1", {"due": START + 100, "repeat": "daily", "checked": True}, now=START)
+    assert reminders.due_within(DAY, now=START) == []
+    assert reminders.fire_due(now=START + 2 * DAY) == []
+    assert reminders.next_due() is None
+
+def test_past_one_off_reminder_is_not_scheduled():
+    reminders = scheduler()
+    assert not reminders.add("r1", {"dateObj": "2023-11-14T08:00:00.000Z"})
+    assert reminders.load({"a": {"due": START + 60}, "b": {"title": "no time"}}) == 1
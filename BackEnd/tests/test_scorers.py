@@ -0,0 +1,76 @@
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from exercise_data import EXERCISE_LIBRARY
+from exercise_library import int_keys
+from scorers import AlignmentScorer, TrajectoryScorer, VariationScorer
+from trajectory_dtw import sample_keyframes
+from variations import swap_sides
+
+EXERCISES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Physiotherapy_backend', 'exercises')
+
+def straight_leg_raise():
+    with open(os.path.join(EXERCISES, 'straight_leg_raises.json')) as f:
+        exercise = json.load(f)['straight_leg_raises']
+    exercise['reference_pose'] = int_keys(exercise['reference_pose'])
+    return exercise
+
+def landmarks_from(pose, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    points = [[0.5, 0.5, 0.0]] * 33
+    for idx, p in pose.items():
+        points[idx] = np.add(p[:3], rng.normal(0, noise, 3))
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z, visibility=1.0) for x, y, z in points])
+
+def test_batched_score_matches_alignment_scorer_on_the_best_variation():
+    reference = straight_leg_raise()['reference_pose']
+    scorer = VariationScorer(reference)
+    for seed in range(20):
+        landmarks = landmarks_from(swap_sides(reference), noise=0.05, seed=seed)
+        score, feedback = scorer.score(landmarks)
+        assert scorer.alignment.side_swapped
+        check = AlignmentScorer(scorer.alignment.reference_pose)
+        check.side_swapped = True
+        expected_score, expected_feedback = check.score(landmarks)
+        assert abs(score - expected_score) < 1e-6
+        assert feedback == expected_feedback
+        assert sorted(scorer.misaligned) == sorted(check.misaligned)
+
+def test_exact_pose_scores_full_marks_without_feedback():
+    reference = straight_leg_raise()['reference_pose']
+    scorer = VariationScorer(reference)
+    score, feedback = scorer.score(landmarks_from(reference))
+    assert score == 100 and feedback == {} and scorer.misaligned == []
+    assert scorer.variation == scorer.variations.names[0]
+
+def repetitions(exercise, mirrored, reps=2):
+    """Poses at 10 Hz: rest, then `reps` repetitions of the reference trajectory each followed by rest."""
+    keyframes, base = exercise["reference_trajectory"], exercise["reference_pose"]
+    if mirrored:
+        keyframes = [dict(k, pose=swap_sides(k["pose"])) for k in keyframes]
+        base = swap_sides(base)
+    rep = sample_keyframes(keyframes, range(33), 10.0, {**{j: [0.5, 0.5, 0.0] for j in range(33)}, **base})
+    rest = np.repeat(rep[:1], 10, axis=0)
+    return np.concatenate([rest] + [rep, rest] * reps)
+
+def counted_reps(scorer, poses):
+    counted = []
+    for t, pose in enumerate(poses):
+        landmarks = SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z, visibility=1.0) for x, y, z in pose])
+        _, feedback = scorer.score(landmarks, timestamp=100 + t / 10)
+        if feedback["rep"]:
+            counted.append((feedback["rep_score"], scorer.mirrored))
+    return counted
+
+def test_repetitions_count_with_either_leg():
+    exercise = EXERCISE_LIBRARY["Straight Leg Raises"]
+    scorer = TrajectoryScorer.from_exercise(exercise)
+    assert counted_reps(scorer, repetitions(exercise, mirrored=False)) == [(100.0, False)] * 2
+    scorer.reset()
+    assert counted_reps(scorer, repetitions(exercise, mirrored=True)) == [(100.0, True)] * 2
+    # The authored side alone misses the other leg
+    authored_only = TrajectoryScorer.from_exercise(exercise, mirror=False)
+    assert counted_reps(authored_only, repetitions(exercise, mirrored=True)) == []